@@ -38,6 +38,7 @@ from nonebot import load_plugin, load_all_plugins, get_plugin_config
 from .consts import log
 from .config import Config
 from .uniseg import At as At
+from .trie import command_trie
 from . import pattern as pattern
 from .uniseg import File as File
 from .uniseg import Text as Text
@@ -90,6 +91,9 @@ from .matcher import funcommand as funcommand
 from .matcher import on_alconna as on_alconna
 from .typings import ImageOrUrl as ImageOrUrl
 from .params import match_value as match_value
+from .uniseg import SendLimiter as SendLimiter
+from .uniseg import TokenBucket as TokenBucket
+from .uniseg import UploadCache as UploadCache
 from .uniseg import image_fetch as image_fetch
 from .pattern import select_last as select_last
 from .params import AlconnaMatch as AlconnaMatch
@@ -99,7 +103,9 @@ from .model import CommandResult as CommandResult
 from .pattern import select_first as select_first
 from .params import AlcExecResult as AlcExecResult
 from .params import AlconnaResult as AlconnaResult
+from .uniseg import DownloadCache as DownloadCache
 from .uniseg import MessageTarget as MessageTarget
+from .uniseg import TargetFetcher as TargetFetcher
 from .typings import Strikethrough as Strikethrough
 from .consts import ALCONNA_RESULT as ALCONNA_RESULT
 from .params import AlconnaContext as AlconnaContext
@@ -108,19 +114,39 @@ from .uniseg import SupportAdapter as SupportAdapter
 from .uniseg import apply_filehost as apply_filehost
 from .uniseg import custom_handler as custom_handler
 from .matcher import AlconnaMatcher as AlconnaMatcher
+from .metrics import CommandMetrics as CommandMetrics
 from .consts import ALCONNA_ARG_KEY as ALCONNA_ARG_KEY
+from .uniseg import BroadcastResult as BroadcastResult
+from .uniseg import ScheduledAction as ScheduledAction
 from .uniseg import SerializeFailed as SerializeFailed
 from .uniseg import custom_register as custom_register
 from .extension import load_from_path as load_from_path
+from .metrics import command_metrics as command_metrics
+from .consts import apply_log_sample as apply_log_sample
 from .uniseg import UniversalMessage as UniversalMessage
 from .uniseg import UniversalSegment as UniversalSegment
+from .uniseg import action_scheduler as action_scheduler
+from .metrics import ExtensionMetrics as ExtensionMetrics
 from .params import AlconnaExecResult as AlconnaExecResult
+from .uniseg import MemoryUploadCache as MemoryUploadCache
+from .uniseg import SqliteUploadCache as SqliteUploadCache
+from .metrics import extension_metrics as extension_metrics
+from .metrics import render_prometheus as render_prometheus
 from .params import AlconnaDuplication as AlconnaDuplication
+from .rule import set_command_metrics as set_command_metrics
 from .uniseg import apply_media_to_url as apply_media_to_url
+from .uniseg import apply_send_limiter as apply_send_limiter
+from .uniseg import apply_upload_cache as apply_upload_cache
 from .consts import ALCONNA_EXEC_RESULT as ALCONNA_EXEC_RESULT
 from .uniseg import apply_fetch_targets as apply_fetch_targets
+from .completion import completion_metrics as completion_metrics
 from .uniseg import SupportAdapterModule as SupportAdapterModule
+from .uniseg import apply_download_cache as apply_download_cache
 from .extension import add_global_extension as add_global_extension
+from .extension import set_extension_metrics as set_extension_metrics
+from .extension import set_extension_profiler as set_extension_profiler
+from .uniseg import apply_action_persistence as apply_action_persistence
+from .uniseg import apply_export_concurrency as apply_export_concurrency
 
 __version__ = "0.45.0"
 
@@ -150,6 +176,25 @@ with contextlib.suppress(ValueError, LookupError):
         patch_saa()
     if _config.alconna_apply_fetch_targets:
         apply_fetch_targets()
+    TargetFetcher.concurrency = max(1, _config.alconna_fetch_targets_concurrency)
+    if _config.alconna_export_concurrency > 1:
+        apply_export_concurrency(_config.alconna_export_concurrency)
+    if _config.alconna_send_rate_limits or _config.alconna_send_bot_rate_limits:
+        apply_send_limiter(_config.alconna_send_rate_limits, _config.alconna_send_bot_rate_limits)
+    if _config.alconna_persist_scheduled_recall:
+        apply_action_persistence()
+    if _config.alconna_upload_cache == "memory":
+        apply_upload_cache(MemoryUploadCache(ttl=_config.alconna_upload_cache_ttl))
+    elif _config.alconna_upload_cache == "sqlite":
+        apply_upload_cache(SqliteUploadCache("data/alconna/upload_cache.db", ttl=_config.alconna_upload_cache_ttl))
+    if _config.alconna_parse_log_sample < 1:
+        apply_log_sample(_config.alconna_parse_log_sample)
+    if _config.alconna_extension_metrics:
+        set_extension_metrics(extension_metrics)
+    if _config.alconna_command_metrics:
+        set_command_metrics(command_metrics)
+    if not _config.alconna_command_prefilter:
+        command_trie.prefilter_enabled = False
 
 
 def load_builtin_plugin(name: str):
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+from hashlib import sha256
+from itertools import count
 from contextvars import ContextVar
 from typing_extensions import Self
-from typing import TYPE_CHECKING, Any, Union, Literal, Iterable
+from typing import TYPE_CHECKING, Any, Union, Literal, Hashable, Iterable
 
 from tarina import lang
 from nonebot.adapters import Message
@@ -10,9 +12,61 @@ from arclet.alconna import NullMessage
 from nepattern import MatchMode, BasePattern, MatchFailed
 from arclet.alconna.argv import Argv, argv_config, set_default_argv_type
 
+from .uniseg.segment import Media
 from .uniseg import Text, Segment, UniMessage
 
 argv_ctx: ContextVar[MessageArgv] = ContextVar("argv_ctx")
+_CONTEXT_OPENERS = {"bracket": "{", "parentheses": "$("}
+
+
+_UNCACHEABLE = object()
+_uncacheable_tokens = count(-1, -1)
+
+
+def _segment_key(unit: str | Segment) -> Hashable:
+    if unit.__class__ is str:
+        return unit
+    if isinstance(unit, Text):
+        return "Text", unit.text, tuple((scale, tuple(style)) for scale, style in unit.styles.items())
+    if isinstance(unit, Media):
+        # 媒体段以 id/url/path 标识; 仅有原始数据时才计算其摘要, 且不会对原始数据进行 repr
+        raw = unit.raw
+        if unit.id or unit.url or unit.path or raw is None:
+            ident = None
+        elif isinstance(raw, bytes):
+            # 摘要不会像 hash 那样碰撞, 可安全地作为缓存键
+            ident = sha256(raw).digest()
+        else:
+            # 流无法在不消耗其内容的情况下标识, 而 id 会在对象回收后被复用
+            return _UNCACHEABLE
+        return unit.__class__.__name__, unit.id, unit.url, str(unit.path or ""), unit.name, ident
+    return unit.__class__.__name__, repr(unit)
+
+
+def structural_key(data: Iterable[str | Segment]) -> tuple | None:
+    """依据文本内容与消息段的标识 (类型与 id/url 等) 计算消息的结构键
+
+    结构键相同的消息会得到相同的解析结果, 但其中消息段的 origin 等其他数据可能不同;
+    消息含有以流为数据的媒体段时无法标识, 返回 None
+    """
+    keys = []
+    for unit in data:
+        if (key := _segment_key(unit)) is _UNCACHEABLE:
+            return None
+        keys.append(key)
+    return tuple(keys)
+
+
+def structural_token(data: Iterable[str | Segment]) -> int | None:
+    """结构键的哈希值, 用作 Argv 的 token; 可能碰撞, 需要精确比较时请使用 `structural_key`"""
+    if (key := structural_key(data)) is None:
+        return None
+    return hash(key)
+
+
+def context_dependent(style: str | None, text: str) -> bool:
+    """判断消息是否包含上下文插值, 这类消息的解析结果依赖于上下文而不能被缓存"""
+    return bool(style) and _CONTEXT_OPENERS[style] in text  # type: ignore
 
 
 def _default_builder(self: MessageArgv, data: UniMessage[Segment]):
@@ -29,7 +83,10 @@ class MessageArgv(Argv[UniMessage]):
 
     @staticmethod
     def generate_token(data: list) -> int:
-        return hash("".join(i.__class__.__name__ + i.__repr__() for i in data))
+        # 无法标识的消息不会经过 build/addon 进入缓存, 此处仅为其他调用方提供一个不会重复的 token
+        if (token := structural_token(data)) is None:
+            return next(_uncacheable_tokens)
+        return token
 
     def enter(self, ctx: dict[str, Any] | None = None) -> Self:
         super().enter(ctx)
@@ -88,10 +145,23 @@ class MessageArgv(Argv[UniMessage]):
         if self.ndata < 1:
             raise NullMessage(lang.require("argv", "null_message").format(target=data))
         self.bak_data = self.raw_data.copy()
-        if self.message_cache:
-            self.token = self.generate_token(self.raw_data)
+        self.message_cache = self.namespace.enable_message_cache and not context_dependent(
+            self.context_style, styles["msg"]
+        )
+        self._update_token()
         return self
 
+    def _update_token(self):
+        if not self.message_cache:
+            return
+        # Alconna 按 token 复用整个解析结果, 含消息段时会把上一条消息的 origin 等数据交给处理器
+        if any(unit.__class__ is not str for unit in self.raw_data):
+            self.message_cache = False
+        elif (token := structural_token(self.raw_data)) is None:
+            self.message_cache = False
+        else:
+            self.token = token
+
     def addon(self, data: Iterable[str | Segment], merge_str: bool = True) -> Self:
         """添加命令元素
 
@@ -121,8 +191,7 @@ class MessageArgv(Argv[UniMessage]):
                 self.raw_data.append(text)
                 self.ndata += 1
         self.bak_data = self.raw_data.copy()
-        if self.message_cache:
-            self.token = self.generate_token(self.raw_data)
+        self._update_token()
         return self
 
 
@@ -47,7 +47,7 @@ class ReplyRecordExtension(Extension):
             msg = event.get_message()
         except ValueError:
             return
-        uni_msg = UniMessage.generate_without_reply(message=msg, bot=bot)
+        uni_msg = UniMessage.generate_without_reply(message=msg, event=event, bot=bot)
         if not (reply := await reply_fetch(event, bot)):
             return uni_msg
         msg_id = UniMessage.get_message_id(event, bot)
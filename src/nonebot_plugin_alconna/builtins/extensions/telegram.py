@@ -30,6 +30,7 @@ class TelegramSlashExtension(Extension):
 
     SCOPE: ClassVar[BotCommandScope] = BotCommandScopeDefault()
     LANGUAGE_CODE: ClassVar[Optional[str]] = None
+    static_validate = True
 
     @classmethod
     def set_scope(cls, scope: BotCommandScope) -> None:
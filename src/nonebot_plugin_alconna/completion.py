@@ -0,0 +1,164 @@
+import asyncio
+from itertools import count
+from weakref import WeakSet
+from collections import OrderedDict
+from heapq import heappop, heappush
+from typing import Any, Dict, List, Tuple, Optional
+
+from arclet.alconna import CompSession
+
+SessionKey = Tuple[str, str]
+
+
+class _Timer:
+    """所有补全会话共用的空闲超时定时器
+
+    会话的截止时间存放在一个最小堆中, 任意时刻只有一个 `call_at` 句柄指向最早的截止时间;
+    会话续期时只压入新的条目, 过期的旧条目在弹出时被丢弃
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, CompletionSession]] = []
+        self._counter = count()
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def schedule(self, session: "CompletionSession"):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # 事件循环更换后旧的句柄与条目已无意义
+            self._heap.clear()
+            self._handle = None
+            self._loop = loop
+        heappush(self._heap, (session.deadline, next(self._counter), session))
+        self._arm()
+
+    def _arm(self):
+        if not self._heap or not self._loop:
+            return
+        deadline = self._heap[0][0]
+        if self._handle and self._handle.when() <= deadline:
+            return
+        if self._handle:
+            self._handle.cancel()
+        self._handle = self._loop.call_at(deadline, self._fire)
+
+    def _fire(self):
+        self._handle = None
+        now = self._loop.time()  # type: ignore
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, session = heappop(self._heap)
+            if not session.closed and session.deadline == deadline:
+                session.store._expire(session)
+        self._arm()
+
+    def __len__(self):
+        return len(self._heap)
+
+
+_timer = _Timer()
+
+
+class CompletionSession:
+    """一个进行中的补全会话"""
+
+    __slots__ = ("key", "interface", "future", "deadline", "closed", "store")
+
+    def __init__(self, store: "CompletionStore", key: SessionKey, interface: CompSession):
+        self.store = store
+        self.key = key
+        self.interface = interface
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.deadline = 0.0
+        self.closed = False
+
+    def reset(self):
+        """为下一次输入准备新的 future, 并刷新空闲超时"""
+        self.future = asyncio.get_running_loop().create_future()
+        self.store.touch(self)
+
+    def _abort(self):
+        if not self.future.done():
+            self.future.set_exception(asyncio.TimeoutError())
+
+
+class CompletionStore:
+    """单个命令的补全会话存储
+
+    参数:
+        max_sessions: 同时存在的会话数上限, 超出时淘汰最久未活动的会话
+        ttl: 会话的空闲超时 (秒)
+    """
+
+    def __init__(self, max_sessions: int = 256, ttl: float = 60):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: OrderedDict[SessionKey, CompletionSession] = OrderedDict()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        _stores.add(self)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, key: SessionKey) -> Optional[CompletionSession]:
+        return self._sessions.get(key)
+
+    def open(self, key: SessionKey, interface: CompSession) -> CompletionSession:
+        """开启一个会话; 同一键下已有的会话会被中止"""
+        if (old := self._sessions.get(key)) is not None:
+            old._abort()
+            self.close(old)
+        while len(self._sessions) >= self.max_sessions:
+            _, oldest = next(iter(self._sessions.items()))
+            oldest._abort()
+            self.close(oldest)
+            self.evicted += 1
+        session = self._sessions[key] = CompletionSession(self, key, interface)
+        self.created += 1
+        self.touch(session)
+        return session
+
+    def touch(self, session: CompletionSession):
+        """刷新会话的空闲超时"""
+        if session.closed:
+            return
+        session.deadline = asyncio.get_running_loop().time() + self.ttl
+        if self._sessions.get(session.key) is session:
+            self._sessions.move_to_end(session.key)
+        _timer.schedule(session)
+
+    def close(self, session: CompletionSession):
+        """结束会话并释放其资源"""
+        if session.closed:
+            return
+        session.closed = True
+        session.interface.exit()
+        if not session.future.done():
+            session.future.cancel()
+        if self._sessions.get(session.key) is session:
+            del self._sessions[session.key]
+
+    def _expire(self, session: CompletionSession):
+        if self._sessions.get(session.key) is session:
+            del self._sessions[session.key]
+        self.expired += 1
+        session._abort()
+
+    @property
+    def metrics(self) -> Dict[str, int]:
+        """会话统计: live 为当前会话数, created/expired/evicted 为累计开启、超时与因超出上限被淘汰的会话数"""
+        return {"live": len(self), "created": self.created, "expired": self.expired, "evicted": self.evicted}
+
+
+_stores: "WeakSet[CompletionStore]" = WeakSet()
+
+
+def completion_metrics() -> Dict[str, Any]:
+    """汇总所有命令的补全会话统计"""
+    result = {"live": 0, "created": 0, "expired": 0, "evicted": 0}
+    for store in list(_stores):
+        for name, value in store.metrics.items():
+            result[name] += value
+    return result
@@ -1,4 +1,4 @@
-from typing import List, Literal, Optional
+from typing import Dict, List, Tuple, Literal, Optional
 
 from pydantic import Field, BaseModel
 
@@ -35,3 +35,42 @@ class Config(BaseModel):
 
     alconna_apply_fetch_targets: bool = False
     """是否启动时拉取一次发送对象列表"""
+
+    alconna_fetch_targets_concurrency: int = 4
+    """拉取发送对象列表时每个 bot 同时进行的请求数量上限"""
+
+    alconna_export_concurrency: int = 1
+    """每个 bot 并发导出消息段的数量上限, 为 1 时即逐个导出"""
+
+    alconna_send_rate_limits: Dict[str, Tuple[float, int]] = Field(default_factory=dict)
+    """各适配器下向每个发送对象发送消息的限速, 键为适配器名称, 值为 (每秒消息数, 突发数量)"""
+
+    alconna_send_bot_rate_limits: Dict[str, Tuple[float, int]] = Field(default_factory=dict)
+    """各适配器下每个 bot 发送消息的总限速, 格式同 alconna_send_rate_limits"""
+
+    alconna_persist_scheduled_recall: bool = False
+    """是否在关闭时保存尚未执行的延时撤回 (data/alconna/scheduled_actions.json), 并在下次启动时恢复"""
+
+    alconna_upload_cache: Optional[Literal["memory", "sqlite"]] = Field(default=None)
+    """是否启用上传结果缓存，None 为关闭，memory 为内存缓存，sqlite 为本地数据库缓存 (data/alconna/upload_cache.db)
+
+    启用后也会记录发送结果中平台返回的资源标识 (如 Telegram 的 file_id) 以供复用
+    """
+
+    alconna_upload_cache_ttl: int = 86400
+    """上传结果缓存的有效期 (秒)"""
+
+    alconna_parse_log_sample: float = 1.0
+    """命令解析日志的采样比例, 如 0.01 表示每 100 条解析日志输出 1 条"""
+
+    alconna_extension_metrics: bool = False
+    """是否统计各扩展钩子的调用次数、异常次数与耗时分布, 结果见 `extension_metrics.snapshot()`"""
+
+    alconna_command_metrics: bool = False
+    """是否统计各命令的匹配次数与解析耗时, 结果见 `command_metrics.snapshot()` 或 `render_prometheus()`"""
+
+    alconna_command_prefilter: bool = True
+    """是否在转换消息前依据原始消息的首段文本预先排除不可能匹配的命令"""
+
+    alconna_parse_cache_size: int = 32
+    """每个命令缓存的解析结果数量, 相同结构的消息将直接复用解析结果; 为 0 时关闭"""
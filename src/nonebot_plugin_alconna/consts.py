@@ -1,8 +1,9 @@
 from pathlib import Path
-from typing import Literal
+from typing import Union, Literal, Callable, Optional
 
 from tarina import lang
 from nonebot.utils import logger_wrapper
+from nonebot.log import logger, logger_id
 
 lang.load(Path(__file__).parent / "i18n")
 ALCONNA_RESULT: Literal["_alc_result"] = "_alc_result"
@@ -10,4 +11,72 @@ ALCONNA_EXEC_RESULT: Literal["_alc_exec_result"] = "_alc_exec_result"
 ALCONNA_ARG_KEY: Literal["_alc_arg_{key}"] = "_alc_arg_{key}"
 ALCONNA_EXTENSION: Literal["_alc_extension"] = "_alc_extension"
 
-log = logger_wrapper("Plugin-Alconna")
+_log = logger_wrapper("Plugin-Alconna")
+_sample_rate = 1.0
+_sample_credit = 0.0
+
+
+def log_enabled(level: str) -> bool:
+    """判断某个等级的日志是否会被任一日志处理器输出; 无法判断时返回 True"""
+    try:
+        levelno = logger.level(level).no
+        core = logger._core  # type: ignore
+        if levelno < core.min_level:
+            return False
+        for handler_id, handler in core.handlers.items():
+            threshold = handler.levelno
+            if handler_id == logger_id:
+                # NoneBot 默认处理器的过滤器按 config.log_level 过滤
+                configured = core.extra.get("nonebot_log_level", "INFO")
+                threshold = max(threshold, logger.level(configured).no if isinstance(configured, str) else configured)
+            if levelno >= threshold:
+                return True
+    except (AttributeError, TypeError, ValueError):
+        return True
+    return False
+
+
+def apply_log_sample(rate: float):
+    """设置采样日志的输出比例
+
+    参数:
+        rate: 0 到 1 之间的比例, 如 0.01 表示每 100 条采样日志输出 1 条
+    """
+    global _sample_rate, _sample_credit
+
+    _sample_rate = min(max(rate, 0.0), 1.0)
+    _sample_credit = 0.0
+
+
+def _sampled() -> bool:
+    global _sample_credit
+
+    if _sample_rate >= 1.0:
+        return True
+    _sample_credit += _sample_rate
+    if _sample_credit >= 1.0:
+        _sample_credit -= 1.0
+        return True
+    return False
+
+
+def log(
+    level: str,
+    message: Union[str, Callable[[], str]],
+    exception: Optional[Exception] = None,
+    sample: bool = False,
+):
+    """输出插件日志
+
+    参数:
+        level: 日志等级
+        message: 日志信息; 传入无参函数时仅在该等级的日志会被输出时才调用它构造信息
+        exception: 异常信息
+        sample: 是否按 `apply_log_sample` 设置的比例采样输出
+    """
+    if callable(message) or sample:
+        if not log_enabled(level) or (sample and not _sampled()):
+            return
+        if callable(message):
+            message = message()
+    _log(level, message, exception)
@@ -4,11 +4,13 @@ import re
 import asyncio
 import functools
 import importlib as imp
-from weakref import finalize
+from time import perf_counter
 from dataclasses import dataclass
+from contextlib import nullcontext
 from typing_extensions import Self
+from weakref import WeakSet, finalize
 from abc import ABCMeta, abstractmethod
-from typing import TYPE_CHECKING, Any, Union, Generic, Literal, TypeVar
+from typing import TYPE_CHECKING, Any, Union, Generic, Literal, TypeVar, Callable, ClassVar
 
 from tarina import lang
 from nonebot.typing import T_State
@@ -16,6 +18,7 @@ from arclet.alconna import Alconna, Arparma
 from nonebot.compat import PydanticUndefined
 from nonebot.adapters import Bot, Event, Message
 
+from .metrics import ExtensionMetrics
 from .uniseg import UniMessage, FallbackMessage
 
 OutputType = Literal["help", "shortcut", "completion", "error"]
@@ -37,10 +40,20 @@ class Interface(Generic[TE]):
 
 class Extension(metaclass=ABCMeta):
     _overrides: dict[str, bool]
+    _static: bool
+
+    static_validate: ClassVar[bool] = False
+    """`validate` 的结果是否仅取决于适配器与事件类型
+
+    为 True 时执行器会按 (适配器名称, 事件类型) 缓存筛选结果, 不再对每个事件调用 `validate`;
+    未重写 `validate` 的扩展总是视为 True
+    """
 
     def __init_subclass__(cls, **kwargs):
+        cls._static = cls.static_validate or cls.validate == Extension.validate
         cls._overrides = {
             "output_converter": cls.output_converter != Extension.output_converter,
+            "message_provider": cls.message_provider != Extension.message_provider,
             "send_wrapper": cls.send_wrapper != Extension.send_wrapper,
             "receive_wrapper": cls.receive_wrapper != Extension.receive_wrapper,
             "permission_check": cls.permission_check != Extension.permission_check,
@@ -131,10 +144,63 @@ class DefaultExtension(Extension):
 
 
 _callbacks = set()
+_executors: WeakSet[ExtensionExecutor] = WeakSet()
+
+HOOKS = ("output_converter", "receive_wrapper", "permission_check", "context_provider", "parse_wrapper", "send_wrapper")
+Profiler = Callable[[str, str, float], None]
+"""钩子耗时回调, 参数依次为命令路径、钩子名称与耗时 (秒)"""
+_NULL = nullcontext()
+_EMPTY_HOOKS: dict[str, list[Callable[..., Any]]] = {name: [] for name in (*HOOKS, "message_provider")}
+
+
+def _build_hooks(context: list[Extension], path: str) -> dict[str, list[Callable[..., Any]]]:
+    hooks = {name: [getattr(ext, name) for ext in context if ext._overrides[name]] for name in HOOKS}
+    hooks["message_provider"] = [ext.message_provider for ext in context]
+    if (metrics := ExtensionExecutor.metrics) is not None:
+        hooks = {name: [_instrument(metrics, path, name, hook) for hook in funcs] for name, funcs in hooks.items()}
+    return hooks
+
+
+def _transparent(context: list[Extension]) -> bool:
+    return not any(ext._overrides["message_provider"] or ext._overrides["receive_wrapper"] for ext in context)
+
+
+def _instrument(metrics: ExtensionMetrics, path: str, name: str, hook: Callable[..., Any]):
+    extension = hook.__self__.id
+
+    @functools.wraps(hook)
+    async def wrapper(*args):
+        start = perf_counter()
+        try:
+            res = await hook(*args)
+        except Exception:
+            metrics.record(path, extension, name, perf_counter() - start, True)
+            raise
+        metrics.record(path, extension, name, perf_counter() - start)
+        return res
+
+    return wrapper
+
+
+class _Timing:
+    __slots__ = ("profiler", "path", "hook", "start")
+
+    def __init__(self, profiler: Profiler, path: str, hook: str):
+        self.profiler = profiler
+        self.path = path
+        self.hook = hook
+
+    def __enter__(self):
+        self.start = perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler(self.path, self.hook, perf_counter() - self.start)
 
 
 class ExtensionExecutor:
     globals: list[type[Extension] | Extension] = [DefaultExtension()]
+    profiler: ClassVar[Profiler | None] = None
+    metrics: ClassVar[ExtensionMetrics | None] = None
     _rule: AlconnaRule
 
     def __init__(
@@ -167,8 +233,15 @@ class ExtensionExecutor:
         ]
         self.context: list[Extension] = []
         self._rule = rule
+        self._hooks = _EMPTY_HOOKS
+        self._selected: dict[tuple[str, type[Event]], tuple[list[tuple[Extension, bool]], dict | None, bool]] = {}
+        self._catchers: list[Extension] = []
+        self.transparent = True
+        """当前选中的扩展是否都不会改写规则收到的消息, 为 True 时才允许在转换消息前预先排除"""
+        self._invalidate()
 
         _callbacks.add(self._callback)
+        _executors.add(self)
 
         finalize(self, _callbacks.remove, self._callback)
 
@@ -182,35 +255,71 @@ class ExtensionExecutor:
                 continue
             self.extensions.append(_ext)
             _ext.post_init(self._rule.command)
+        self._invalidate()
+
+    def _invalidate(self):
+        self._selected.clear()
+        self._catchers = [ext for ext in self.extensions if ext._overrides["catch"]]
 
     def __exit__(self, exc_type, exc_value, traceback):
+        self.clear()
+
+    def clear(self):
+        """清空当前选中的扩展"""
         self.context.clear()
+        self._hooks = _EMPTY_HOOKS
 
     def select(self, bot: Bot, event: Event) -> Self:
-        self.context = [ext for ext in self.extensions if ext.validate(bot, event)]
-        self.context.sort(key=lambda ext: ext.priority)
+        key = (bot.adapter.get_name(), event.__class__)
+        if (cached := self._selected.get(key)) is None:
+            cached = self._selected[key] = self._prepare(bot, event)
+        selected, hooks, transparent = cached
+        if hooks is None:
+            self.context = [ext for ext, dynamic in selected if not dynamic or ext.validate(bot, event)]
+            self._hooks = _build_hooks(self.context, self._rule.command.path)
+            self.transparent = _transparent(self.context)
+        else:
+            self.context = [ext for ext, _ in selected]
+            self._hooks = hooks
+            self.transparent = transparent
         return self
 
+    def _prepare(self, bot: Bot, event: Event) -> tuple[list[tuple[Extension, bool]], dict | None, bool]:
+        """按优先级排列可用的扩展, 并标记出仍需对每个事件调用 `validate` 的扩展
+
+        所有扩展均为静态时, 各钩子的分发表也一并预先计算
+        """
+        selected = [(ext, not ext._static) for ext in self.extensions if not ext._static or ext.validate(bot, event)]
+        selected.sort(key=lambda item: item[0].priority)
+        if any(dynamic for _, dynamic in selected):
+            return selected, None, False
+        context = [ext for ext, _ in selected]
+        return selected, _build_hooks(context, self._rule.command.path), _transparent(context)
+
+    def _profile(self, hook: str):
+        if (profiler := ExtensionExecutor.profiler) is None:
+            return _NULL
+        return _Timing(profiler, self._rule.command.path, hook)
+
     async def output_converter(self, output_type: OutputType, content: str) -> Message | UniMessage:
-        exc = None
-        for ext in self.context:
-            if not ext._overrides["output_converter"]:
-                continue
-            try:
-                return await ext.output_converter(output_type, content)
-            except Exception as e:
-                exc = e
-        if not exc:
+        if not (hooks := self._hooks["output_converter"]):
             return FallbackMessage()
+        exc = None
+        with self._profile("output_converter"):
+            for hook in hooks:
+                try:
+                    return await hook(output_type, content)
+                except Exception as e:
+                    exc = e
         raise exc  # type: ignore
 
     async def message_provider(
         self, event: Event, state: T_State, bot: Bot, use_origin: bool = False
     ) -> Message | UniMessage | None:
         exc = None
-        for ext in self.context:
+        for hook in self._hooks["message_provider"]:
             try:
-                if (msg := await ext.message_provider(event, state, bot, use_origin)) is not None:
+                if (msg := await hook(event, state, bot, use_origin)) is not None:
                     return msg
             except Exception as e:
                 exc = e
@@ -220,61 +329,83 @@ class ExtensionExecutor:
         return None
 
     async def receive_wrapper(self, bot: Bot, event: Event, receive: TM) -> TM:
+        if not (hooks := self._hooks["receive_wrapper"]):
+            return receive
         res = receive
-        for ext in self.context:
-            if ext._overrides["receive_wrapper"]:
-                res = await ext.receive_wrapper(bot, event, self._rule.command, res)
+        with self._profile("receive_wrapper"):
+            for hook in hooks:
+                res = await hook(bot, event, self._rule.command, res)
         return res
 
     async def permission_check(self, bot: Bot, event: Event) -> bool:
-        for ext in self.context:
-            if ext._overrides["permission_check"]:
-                if await ext.permission_check(bot, event, self._rule.command) is False:
+        if not (hooks := self._hooks["permission_check"]):
+            return True
+        with self._profile("permission_check"):
+            for hook in hooks:
+                if await hook(bot, event, self._rule.command) is False:
                     return False
-                continue
         return True
 
     async def context_provider(self, event: Event, bot: Bot, state: T_State) -> dict[str, Any]:
         ctx = {}
-        for ext in self.context:
-            if ext._overrides["context_provider"]:
-                ctx = await ext.context_provider(ctx, event, bot, state)
+        if hooks := self._hooks["context_provider"]:
+            with self._profile("context_provider"):
+                for hook in hooks:
+                    ctx = await hook(ctx, event, bot, state)
         ctx["event"] = event
         # ctx["bot"] = bot
         return ctx
 
     async def parse_wrapper(self, bot: Bot, state: T_State, event: Event, res: Arparma) -> None:
-        await asyncio.gather(
-            *(ext.parse_wrapper(bot, state, event, res) for ext in self.context if ext._overrides["parse_wrapper"])
-        )
+        if not (hooks := self._hooks["parse_wrapper"]):
+            return
+        with self._profile("parse_wrapper"):
+            await asyncio.gather(*(hook(bot, state, event, res) for hook in hooks))
 
     async def send_wrapper(self, bot: Bot, event: Event, send: TM) -> TM:
+        if not (hooks := self._hooks["send_wrapper"]):
+            return send
         res = send
-        for ext in self.context:
-            if ext._overrides["send_wrapper"]:
-                res = await ext.send_wrapper(bot, event, res)
+        with self._profile("send_wrapper"):
+            for hook in hooks:
+                res = await hook(bot, event, res)
         return res
 
     def before_catch(self, name: str, annotation: Any, default: Any) -> bool:
-        for ext in self.extensions:
-            if ext._overrides["catch"]:
-                if ext.before_catch(name, annotation, default):
-                    return True
-                continue
-        return False
+        return any(ext.before_catch(name, annotation, default) for ext in self._catchers)
 
     async def catch(self, event: Event, state: T_State, name: str, annotation: Any, default: Any):
-        for ext in self.extensions:
-            if ext._overrides["catch"]:
-                res = await ext.catch(Interface(event, state, name, annotation, default))
-                if res is None:
-                    continue
-                return res
+        for ext in self._catchers:
+            res = await ext.catch(Interface(event, state, name, annotation, default))
+            if res is None:
+                continue
+            return res
         return PydanticUndefined
 
     def post_init(self) -> None:
         for ext in self.extensions:
             ext.post_init(self._rule.command)
+        self._invalidate()
+
+
+def set_extension_profiler(profiler: Profiler | None) -> None:
+    """设置扩展钩子的耗时回调, 为 None 时关闭统计
+
+    参数:
+        profiler: 以命令路径、钩子名称与耗时 (秒) 调用的回调
+    """
+    ExtensionExecutor.profiler = profiler
+
+
+def set_extension_metrics(metrics: ExtensionMetrics | None) -> None:
+    """设置统计各扩展钩子调用的 ExtensionMetrics, 为 None 时关闭统计
+
+    参数:
+        metrics: 统计对象, 如 `extension_metrics`
+    """
+    ExtensionExecutor.metrics = metrics
+    for executor in list(_executors):
+        executor._invalidate()
 
 
 def add_global_extension(*ext: type[Extension] | Extension) -> None:
@@ -0,0 +1,99 @@
+from itertools import count
+from typing import Any, Dict, Type, Tuple, Callable, Optional, Awaitable
+
+from nonebot.rule import Rule
+from nonebot.typing import T_State
+from nonebot.utils import escape_tag
+from nonebot.adapters import Bot, Event
+from nonebot.plugin.on import on_message
+from nonebot.exception import SkippedException
+from nonebot.matcher import Matcher, matchers, current_event
+
+from .consts import log
+
+WaiterKey = Tuple[str, str, str]
+WaiterCallback = Callable[[Bot, Event, T_State], Awaitable[bool]]
+"""等待回调, 返回 True 表示该事件已被消费, 将阻止事件继续传播"""
+
+
+def session_key(bot: Bot, event: Event) -> Optional[WaiterKey]:
+    """默认的等待键: (适配器名, bot.self_id, 会话 id)"""
+    try:
+        return bot.adapter.get_name(), bot.self_id, event.get_session_id()
+    except (ValueError, NotImplementedError):
+        return None
+
+
+class WaiterHub:
+    """所有等待中的会话共用的分发中心
+
+    只注册一个常驻的 priority=0 的消息响应器, 按等待键将事件分发给对应的等待回调,
+    避免每次等待都创建并销毁一个临时响应器
+
+    参数:
+        key_func: 从事件计算等待键的函数, 默认为 `session_key`
+    """
+
+    def __init__(self, key_func: Callable[[Bot, Event], Optional[WaiterKey]] = session_key):
+        self.key_func = key_func
+        self._counter = count()
+        self._keyed: Dict[WaiterKey, Dict[int, Tuple[WaiterCallback, Any]]] = {}
+        self._global: Dict[int, Tuple[WaiterCallback, Any]] = {}
+        self._matcher: Optional[Type[Matcher]] = None
+
+    def __len__(self):
+        return len(self._global) + sum(len(entries) for entries in self._keyed.values())
+
+    def register(self, callback: WaiterCallback, key: Optional[WaiterKey] = None) -> Callable[[], None]:
+        """注册一个等待回调
+
+        参数:
+            callback: 等待回调
+            key: 等待键, 为 None 时该回调会收到所有消息事件
+
+        返回:
+            用于注销该回调的函数
+        """
+        self._ensure_matcher()
+        index = next(self._counter)
+        source = current_event.get(None)
+        entries = self._global if key is None else self._keyed.setdefault(key, {})
+        entries[index] = (callback, source)
+
+        def remove():
+            entries.pop(index, None)
+            if key is not None and not entries and self._keyed.get(key) is entries:
+                del self._keyed[key]
+
+        return remove
+
+    def _ensure_matcher(self):
+        if self._matcher is None or self._matcher not in matchers.get(self._matcher.priority, []):
+            self._matcher = on_message(priority=0, block=False, rule=Rule(self._check), handlers=[self._handle])
+
+    def _check(self, bot: Bot, event: Event) -> bool:
+        if self._global:
+            return True
+        return bool(self._keyed) and self.key_func(bot, event) in self._keyed
+
+    async def _handle(self, matcher: Matcher, bot: Bot, event: Event, state: T_State):
+        key = self.key_func(bot, event) if self._keyed else None
+        entries = [*self._keyed.get(key, {}).values(), *self._global.values()] if key else [*self._global.values()]
+        for callback, source in entries:
+            # 注册时正在处理的事件不应触发该等待
+            if source is event:
+                continue
+            try:
+                consumed = await callback(bot, event, state)
+            except SkippedException:
+                # 参数类型不匹配等情况, 与独立响应器一样静默跳过
+                continue
+            except Exception as e:
+                log("ERROR", escape_tag(f"Waiter callback {callback!r} raised an exception"), e)
+                continue
+            if consumed:
+                matcher.stop_propagation()
+                return
+
+
+waiter_hub = WaiterHub()
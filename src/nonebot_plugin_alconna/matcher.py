@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import asyncio
 import weakref
+import contextlib
 from weakref import ref
 from types import FunctionType
 from typing_extensions import Self
@@ -37,8 +38,8 @@ from arclet.alconna.typing import ShortcutRegWrapper
 from tarina import lang, is_awaitable, run_always_await
 from _weakref import _remove_dead_weakref  # type: ignore
 from arclet.alconna.tools import AlconnaFormat, AlconnaString
+from nonebot.plugin.on import store_matcher, get_matcher_source
 from arclet.alconna.tools.construct import FuncMounter, MountConfig
-from nonebot.plugin.on import on_message, store_matcher, get_matcher_source
 from arclet.alconna import Arg, Args, Alconna, ShortcutArgs, command_manager
 from nonebot.exception import PausedException, FinishedException, RejectedException
 from nonebot.internal.adapter import Bot, Event, Message, MessageSegment, MessageTemplate
@@ -49,6 +50,8 @@ from .rule import alconna
 from .typings import MReturn
 from .model import CompConfig
 from .pattern import patterns
+from .uniseg.limiter import throttle
+from .hub import WaiterCallback, waiter_hub
 from .uniseg import Text, Segment, UniMessage
 from .uniseg.template import UniMessageTemplate
 from .extension import Extension, ExtensionExecutor
@@ -59,10 +62,10 @@ from .params import (
     Check,
     AlconnaParam,
     AlcExecResult,
+    DispatchTable,
     ExtensionParam,
     assign,
     _seminal,
-    _Dispatch,
     merge_path,
 )
 
@@ -141,15 +144,22 @@ class WaiterIterator(Generic[R, T]):
 
 class Waiter(Generic[R]):
     future: asyncio.Future
-    handler: _DependentCallable[R]
+    handler: WaiterCallback
 
-    def __init__(self, handler: _DependentCallable[R], params: tuple, parameterless: Iterable[Any] | None = None):
+    def __init__(
+        self,
+        handler: _DependentCallable[R],
+        params: tuple,
+        parameterless: Iterable[Any] | None = None,
+        session: bool = False,
+    ):
         self.future = asyncio.Future()
+        self.session = session
         _handler = Dependent[Any].parse(call=handler, parameterless=parameterless, allow_types=params)
 
-        async def wrapper(matcher: Matcher, bot: Bot, event: Event, state: T_State):
+        async def wrapper(bot: Bot, event: Event, state: T_State) -> bool:
             if self.future.done():
-                matcher.skip()
+                return False
             result = await _handler(
                 matcher=self,
                 bot=bot,
@@ -158,9 +168,8 @@ class Waiter(Generic[R]):
             )
             if result is not None and not self.future.done():
                 self.future.set_result(result)
-                matcher.stop_propagation()
-                await matcher.finish()
-            matcher.skip()
+                return True
+            return False
 
         self.handler = wrapper
 
@@ -185,23 +194,32 @@ class Waiter(Generic[R]):
     async def wait(self, *, timeout: float = 120) -> R | None: ...
 
     async def wait(self, *, default: R | T | None = None, timeout: float = 120) -> R | T | None:
-        matcher = on_message(priority=0, block=False, handlers=[self.handler])
+        key = None
+        # 无法确定当前会话时 (如不在事件处理流程中) 退回为全局等待
+        if self.session:
+            with contextlib.suppress(LookupError):
+                key = waiter_hub.key_func(current_bot.get(), current_event.get())
+        remove = waiter_hub.register(self.handler, key)
         try:
             return await asyncio.wait_for(self.future, timeout)
         except asyncio.TimeoutError:
             return default
         finally:
             self.future = asyncio.Future()
-            try:
-                matcher.destroy()
-            except (IndexError, ValueError):
-                pass
+            remove()
+
+
+async def _run_dispatch(matcher: AlconnaMatcher, bot: Bot, event: Event, state: T_State):
+    # 作为父级响应器的最后一个处理函数运行, 此时扩展上下文尚未被清空, 分支的异常也会作为父级处理函数的异常抛出
+    await matcher._dispatch_table.run(matcher, bot, event, state)  # type: ignore
 
 
 class AlconnaMatcher(Matcher):
     command: ClassVar[Alconna]
     basepath: ClassVar[str]
     executor: ClassVar[ExtensionExecutor]
+    _dispatch_table: ClassVar[DispatchTable | None] = None
+    _dispatch_owner: ClassVar[DispatchTable | None] = None
 
     @classmethod
     @overload
@@ -376,6 +394,8 @@ class AlconnaMatcher(Matcher):
         """注册一个消息事件响应器，
         并且当消息由指定 Alconna 解析并且结果符合 assign 预期时执行
 
+        该响应器不会加入全局的事件响应器列表, 而是在父级响应器的其他处理函数结束后, 由其分支表依据本次解析结果检查并运行
+
         参数:
             path: 指定的查询路径;
                 "$main" 表示没有任何选项/子命令匹配的时候;
@@ -393,12 +413,13 @@ class AlconnaMatcher(Matcher):
             state: 默认 state
         """
 
-        fn = _Dispatch(merge_path(path, cls.basepath), value, or_not, additional)
-        cls.handle()(fn.set)
+        if cls.__dict__.get("_dispatch_table") is None:
+            cls._dispatch_table = DispatchTable(cls.command)
+            cls.append_handler(_run_dispatch)
 
         matcher: type[AlconnaMatcher] = cls.new(
             "",
-            rule & Rule(fn),
+            Rule() & rule,
             Permission() | permission,
             temp=temp,
             expire_time=expire_time,
@@ -408,12 +429,38 @@ class AlconnaMatcher(Matcher):
             source=get_matcher_source(_depth + 1),
             default_state=state,
         )
+        matchers[matcher.priority].remove(matcher)
         store_matcher(matcher)
         matcher.command = cls.command
         matcher.basepath = merge_path(path, cls.basepath)
         matcher.executor = cls.executor
+        matcher._dispatch_table = None
+        matcher._dispatch_owner = cls._dispatch_table
+        cls._dispatch_table.add(matcher, matcher.basepath, value, or_not, additional)  # type: ignore
         return matcher
 
+    @classmethod
+    def destroy(cls) -> None:
+        """销毁当前的事件响应器"""
+        if cls._dispatch_owner is None:
+            super().destroy()
+            return
+        cls._dispatch_owner.remove(cls)
+        # 分支不在全局的事件响应器列表中, 此时父类移除失败的异常可以忽略
+        with contextlib.suppress(KeyError, ValueError):
+            super().destroy()
+        if (plugin := cls.plugin) is not None:
+            plugin.matcher.discard(cls)
+
+    @classmethod
+    def append_handler(cls, handler: T_Handler, parameterless: Iterable[Any] | None = None) -> Dependent[Any]:
+        dependent = super().append_handler(handler, parameterless)
+        if cls.__dict__.get("_dispatch_table") is not None and handler is not _run_dispatch:
+            # 分支表总是在父级响应器的最后运行
+            index = next(i for i, dep in enumerate(cls.handlers) if dep.call is _run_dispatch)
+            cls.handlers.append(cls.handlers.pop(index))
+        return dependent
+
     @classmethod
     def handle(
         cls,
@@ -697,6 +744,7 @@ class AlconnaMatcher(Matcher):
             res = await _message.export(bot, fallback)
         else:
             res = _message
+        await throttle(bot, event)
         return await bot.send(event=event, message=res, **kwargs)
 
     @classmethod
@@ -836,17 +884,18 @@ class AlconnaMatcher(Matcher):
         raise RejectedException
 
     @classmethod
-    def waiter(cls, parameterless: Iterable[Any] | None = None):
+    def waiter(cls, parameterless: Iterable[Any] | None = None, session: bool = False):
         """装饰一个函数来创建一个 `Waiter` 对象用以等待用户输入
 
         函数内需要自行判断输入是否符合预期并返回结果
 
         参数:
             parameterless: 非参数类型依赖列表
+            session: 是否只等待当前会话的消息; 启用后等待按会话索引, 其他会话的消息不会传入该函数
         """
 
         def wrapper(func: _DependentCallable[R]):
-            return Waiter(func, cls.HANDLER_PARAM_TYPES, parameterless)
+            return Waiter(func, cls.HANDLER_PARAM_TYPES, parameterless, session)
 
         return wrapper
 
@@ -1098,4 +1147,6 @@ class Command(AlconnaString):
 
 @run_postprocessor
 def _exit_executor(matcher: AlconnaMatcher):
-    matcher.executor.context.clear()
+    # 分支与父级响应器共用扩展执行器, 由父级响应器在所有分支结束后清理
+    if matcher._dispatch_owner is None:
+        matcher.executor.clear()
@@ -0,0 +1,225 @@
+from bisect import bisect_left
+from typing import Any, Dict, List, Tuple, Callable, Optional, Sequence
+
+from .consts import log
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+"""`render_prometheus` 输出内容对应的 Content-Type"""
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+"""默认的直方图分桶上界 (秒)"""
+
+HookExporter = Callable[[str, str, str, float, bool], None]
+"""钩子调用的导出回调, 参数依次为命令路径、扩展 id、钩子名称、耗时 (秒) 与是否抛出异常"""
+
+
+class Histogram:
+    """固定分桶的耗时直方图
+
+    参数:
+        buckets: 递增的分桶上界, 超出最后一个上界的观测值计入 +Inf 桶
+    """
+
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """返回 (上界, 累计数量) 列表, 最后一项的上界为 inf"""
+        result = []
+        total = 0
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"count": self.count, "sum": self.sum, "buckets": dict(self.cumulative())}
+
+
+class HookStats:
+    """单个扩展在单个命令上某一钩子的统计"""
+
+    __slots__ = ("calls", "errors", "latency")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.calls = 0
+        self.errors = 0
+        self.latency = Histogram(buckets)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "errors": self.errors, "latency": self.latency.snapshot()}
+
+
+class ExtensionMetrics:
+    """按 (命令路径, 扩展 id, 钩子名称) 统计扩展钩子的调用次数、异常次数与耗时分布
+
+    参数:
+        buckets: 耗时直方图的分桶上界 (秒)
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.exporters: List[HookExporter] = []
+        self._stats: Dict[Tuple[str, str, str], HookStats] = {}
+
+    def add_exporter(self, exporter: HookExporter):
+        """添加导出回调, 每次钩子调用结束后都会以该次调用的数据调用它"""
+        self.exporters.append(exporter)
+
+    def record(self, path: str, extension: str, hook: str, elapsed: float, error: bool = False):
+        key = (path, extension, hook)
+        if (stats := self._stats.get(key)) is None:
+            stats = self._stats[key] = HookStats(self.buckets)
+        stats.calls += 1
+        if error:
+            stats.errors += 1
+        stats.latency.observe(elapsed)
+        for exporter in self.exporters:
+            try:
+                exporter(path, extension, hook, elapsed, error)
+            except Exception as e:
+                log("WARNING", f"Extension metrics exporter {exporter!r} raised an exception", e)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Dict[str, Any]]]]:
+        """以 {命令路径: {扩展 id: {钩子名称: 统计}}} 的形式返回当前统计"""
+        result: Dict[str, Dict[str, Dict[str, Dict[str, Any]]]] = {}
+        for (path, extension, hook), stats in self._stats.items():
+            result.setdefault(path, {}).setdefault(extension, {})[hook] = stats.snapshot()
+        return result
+
+    def reset(self):
+        self._stats.clear()
+
+
+class CommandStats:
+    """单个命令的统计
+
+    seen 为收到的消息事件数, head_matched 与 matched 分别为头部匹配与完全匹配的次数;
+    parse、permission 与 generate 分别为解析、权限检查与 `UniMessage.generate` 的耗时分布
+    """
+
+    __slots__ = ("seen", "head_matched", "matched", "parse", "permission", "generate")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.seen = 0
+        self.head_matched = 0
+        self.matched = 0
+        self.parse = Histogram(buckets)
+        self.permission = Histogram(buckets)
+        self.generate = Histogram(buckets)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "seen": self.seen,
+            "head_matched": self.head_matched,
+            "matched": self.matched,
+            "parse": self.parse.snapshot(),
+            "permission": self.permission.snapshot(),
+            "generate": self.generate.snapshot(),
+        }
+
+
+class CommandMetrics:
+    """按命令路径统计各命令的匹配率与耗时
+
+    参数:
+        buckets: 耗时直方图的分桶上界 (秒)
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._stats: Dict[str, CommandStats] = {}
+
+    def get(self, path: str) -> CommandStats:
+        if (stats := self._stats.get(path)) is None:
+            stats = self._stats[path] = CommandStats(self.buckets)
+        return stats
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """以 {命令路径: 统计} 的形式返回当前统计"""
+        return {path: stats.snapshot() for path, stats in self._stats.items()}
+
+    def reset(self):
+        self._stats.clear()
+
+
+extension_metrics = ExtensionMetrics()
+command_metrics = CommandMetrics()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def _bound(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(value)
+
+
+class _Family:
+    def __init__(self, name: str, kind: str, doc: str):
+        self.name = name
+        self.lines = [f"# HELP {name} {doc}", f"# TYPE {name} {kind}"]
+
+    def sample(self, value: float, **labels: str):
+        self.lines.append(f"{self.name}{{{_labels(**labels)}}} {value}")
+
+    def histogram(self, histogram: Histogram, **labels: str):
+        label = _labels(**labels)
+        for bound, count in histogram.cumulative():
+            self.lines.append(f'{self.name}_bucket{{{label},le="{_bound(bound)}"}} {count}')
+        self.lines.append(f"{self.name}_sum{{{label}}} {histogram.sum}")
+        self.lines.append(f"{self.name}_count{{{label}}} {histogram.count}")
+
+
+def render_prometheus(
+    commands: Optional[CommandMetrics] = command_metrics, extensions: Optional[ExtensionMetrics] = extension_metrics
+) -> str:
+    """将统计渲染为 Prometheus 文本格式, 可直接作为 HTTP 响应返回 (Content-Type 见 `PROMETHEUS_CONTENT_TYPE`)
+
+    参数:
+        commands: 命令统计, 为 None 时不输出
+        extensions: 扩展钩子统计, 为 None 时不输出
+
+    返回:
+        Prometheus 文本格式的统计
+    """
+    families: List[_Family] = []
+    if commands is not None:
+        seen = _Family("alconna_command_events_total", "counter", "Message events checked by the command")
+        head = _Family("alconna_command_head_matched_total", "counter", "Events whose command head matched")
+        matched = _Family("alconna_command_matched_total", "counter", "Events fully matched by the command")
+        parse = _Family("alconna_command_parse_seconds", "histogram", "Time spent parsing the message")
+        permission = _Family("alconna_command_permission_seconds", "histogram", "Time spent in permission checks")
+        generate = _Family("alconna_command_generate_seconds", "histogram", "Time spent in UniMessage.generate")
+        for path, stats in commands._stats.items():
+            seen.sample(stats.seen, command=path)
+            head.sample(stats.head_matched, command=path)
+            matched.sample(stats.matched, command=path)
+            parse.histogram(stats.parse, command=path)
+            permission.histogram(stats.permission, command=path)
+            generate.histogram(stats.generate, command=path)
+        families.extend((seen, head, matched, parse, permission, generate))
+    if extensions is not None:
+        calls = _Family("alconna_extension_hook_calls_total", "counter", "Extension hook calls")
+        errors = _Family("alconna_extension_hook_errors_total", "counter", "Extension hook calls that raised")
+        latency = _Family("alconna_extension_hook_seconds", "histogram", "Time spent in extension hooks")
+        for (path, extension, hook), hook_stats in extensions._stats.items():
+            calls.sample(hook_stats.calls, command=path, extension=extension, hook=hook)
+            errors.sample(hook_stats.errors, command=path, extension=extension, hook=hook)
+            latency.histogram(hook_stats.latency, command=path, extension=extension, hook=hook)
+        families.extend((calls, errors, latency))
+    return "".join(f"{line}\n" for family in families for line in family.lines)
@@ -79,3 +79,4 @@ class CompConfig(TypedDict):
     hides: NotRequired[Set[Literal["tab", "enter", "exit"]]]
     disables: NotRequired[Set[Literal["tab", "enter", "exit"]]]
     lite: NotRequired[bool]
+    max_sessions: NotRequired[int]
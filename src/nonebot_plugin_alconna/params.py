@@ -1,6 +1,8 @@
 import inspect
+from itertools import count
+from contextlib import AsyncExitStack
 from typing_extensions import Annotated, get_args
-from typing import Any, Dict, Type, Tuple, Union, Literal, TypeVar, ClassVar, Optional, overload
+from typing import Any, Dict, List, Type, Tuple, Union, Literal, TypeVar, ClassVar, Optional, overload
 
 from nonebot.typing import T_State
 from tarina import run_always_await
@@ -10,11 +12,14 @@ from nonebot.dependencies import Param
 from nonebot.internal.params import Depends
 from nonebot.compat import PydanticUndefined
 from nonebot.internal.matcher import Matcher
+from nonebot.exception import StopPropagation
 from nonebot.internal.adapter import Bot, Event
+from nonebot.message import check_and_run_matcher
 from arclet.alconna.builtin import generate_duplication
 from arclet.alconna import Empty, Alconna, Arparma, Duplication
 
 from .typings import CHECK, MIDDLEWARE
+from .uniseg.constraint import UNISEG_MESSAGE
 from .model import T, Match, Query, CommandResult
 from .extension import Extension, ExtensionExecutor
 from .consts import ALCONNA_RESULT, ALCONNA_ARG_KEY, ALCONNA_EXTENSION, ALCONNA_EXEC_RESULT
@@ -324,25 +329,87 @@ class AlconnaParam(Param):
                 return True
 
 
-class _Dispatch:
-    def __init__(
+class _Branch:
+    __slots__ = ("matcher", "check", "index")
+
+    def __init__(self, matcher: Type[Matcher], check: CHECK, index: int):
+        self.matcher = matcher
+        self.check = check
+        self.index = index
+
+
+class DispatchTable:
+    """`AlconnaMatcher.dispatch` 注册的分支表
+
+    分支按查询路径的首段 (顶层选项/子命令名, 或 "$main") 索引, 对一次解析结果只需检查其实际匹配到的组件对应的分支;
+    无法据此索引的分支 (如 or_not 为真, 或路径不以组件名开头) 总是参与检查
+
+    参数:
+        command: 所属的 Alconna 命令
+    """
+
+    def __init__(self, command: Alconna):
+        self.names = {opt.dest for opt in command.options}
+        self._keyed: Dict[str, List[_Branch]] = {}
+        self._generic: List[_Branch] = []
+        self._counter = count()
+
+    def __len__(self):
+        return len(self._generic) + sum(len(branches) for branches in self._keyed.values())
+
+    def add(
         self,
+        matcher: Type[Matcher],
         path: str,
         value: Any = _seminal,
         or_not: bool = False,
         additional: Optional[CHECK] = None,
     ):
-        self.fn = assign(path, value, or_not, additional)
-        self.result = None
-
-    def set(self, arp: AlcResult):
-        self.result = arp
-
-    async def __call__(self, _state: T_State, event: Event, bot: Bot) -> bool:
-        if self.result is None:
-            return False
-        if await self.fn(event, bot, _state, self.result.result):
-            _state[ALCONNA_RESULT] = self.result
-            self.result = None
-            return True
-        return False
+        branch = _Branch(matcher, assign(path, value, or_not, additional), next(self._counter))
+        head = path.split(".", 1)[0]
+        if or_not or (head == "$main" and value is not _seminal) or (head != "$main" and head not in self.names):
+            self._generic.append(branch)
+        else:
+            self._keyed.setdefault(head, []).append(branch)
+
+    def remove(self, matcher: Type[Matcher]) -> bool:
+        """移除某个分支, 返回其是否存在"""
+        found = False
+        for branches in (self._generic, *self._keyed.values()):
+            for branch in [*branches]:
+                if branch.matcher is matcher:
+                    branches.remove(branch)
+                    found = True
+        return found
+
+    def candidates(self, arp: Arparma) -> List[_Branch]:
+        """获取可能符合该解析结果的分支, 按优先级与注册顺序排列"""
+        branches = [*self._generic]
+        for name in arp.components or ("$main",):
+            branches.extend(self._keyed.get(name, ()))
+        branches.sort(key=lambda branch: (branch.matcher.priority, branch.index))
+        return branches
+
+    async def run(self, matcher: Matcher, bot: Bot, event: Event, state: T_State) -> None:
+        """依据父级响应器的解析结果依次检查并运行符合条件的分支
+
+        分支响应器阻止事件传播时, 父级响应器也会阻止事件传播;
+        各分支共用一个由此处管理的 AsyncExitStack 与依赖缓存, 并各自持有一份扩展列表的副本
+        """
+        result: CommandResult = state[ALCONNA_RESULT]
+        async with AsyncExitStack() as stack:
+            dependency_cache = {}
+            for branch in self.candidates(result.result):
+                _state = {key: state[key] for key in _DISPATCH_KEYS if key in state}
+                if ALCONNA_EXTENSION in _state:
+                    _state[ALCONNA_EXTENSION] = list(_state[ALCONNA_EXTENSION])
+                if not await branch.check(event, bot, _state, result.result):
+                    continue
+                try:
+                    await check_and_run_matcher(branch.matcher, bot, event, _state, stack, dependency_cache)
+                except StopPropagation:
+                    matcher.block = True
+                    return
+
+
+_DISPATCH_KEYS = (ALCONNA_RESULT, ALCONNA_EXEC_RESULT, ALCONNA_EXTENSION, UNISEG_MESSAGE)
@@ -1,29 +1,101 @@
 import asyncio
 import importlib
-from typing import Set, Dict, List, Type, Tuple, Union, Literal, Optional, cast
+from time import perf_counter
+from typing import Any, Set, Dict, List, Type, Tuple, Union, Literal, ClassVar, Optional, cast
 
 from nonebot.typing import T_State
-from tarina import lang, init_spec
-from nonebot.matcher import Matcher
 from nonebot.utils import escape_tag
-from nonebot.plugin.on import on_message
+from tarina import LRU, lang, init_spec
 from nonebot.internal.rule import Rule as Rule
 from nonebot.adapters import Bot, Event, Message
 from nonebot import get_driver, get_plugin_config
 from arclet.alconna.exceptions import SpecialOptionTriggered
-from arclet.alconna import Alconna, Arparma, CompSession, output_manager, command_manager
+from arclet.alconna import (
+    Alconna,
+    Arparma,
+    CompSession,
+    OptionResult,
+    SubcommandResult,
+    output_manager,
+    command_manager,
+)
 
 from .config import Config
+from .hub import waiter_hub
 from .adapters import MAPPING
-from .uniseg import UniMsg, UniMessage
+from .trie import command_trie
+from .uniseg import UniMessage
+from .completion import CompletionStore
 from .model import CompConfig, CommandResult
 from .uniseg.constraint import UNISEG_MESSAGE
+from .metrics import CommandStats, CommandMetrics
+from .argv import structural_key, context_dependent
 from .extension import Extension, ExtensionExecutor
 from .consts import ALCONNA_RESULT, ALCONNA_EXTENSION, ALCONNA_EXEC_RESULT, log
 
 _modules = set()
 
 
+def _copy_arparma(source: Arparma, origin: Any, ctx: dict) -> Arparma:
+    # Arparma 的 __getattr__ 会干扰 copy.copy, 因此手动复制
+    arp = Arparma.__new__(Arparma)
+    arp.__dict__.update(source.__dict__)
+    arp.main_args = {**source.main_args}
+    arp.other_args = {**source.other_args}
+    arp.options = _copy_options(source.options)
+    arp.subcommands = _copy_subcommands(source.subcommands)
+    arp.origin = origin
+    arp.context = ctx
+    return arp
+
+
+_PLAIN_TYPES = (str, int, float, bool, type(None))
+
+
+def _plain(value: Any) -> bool:
+    if isinstance(value, tuple):
+        return all(_plain(item) for item in value)
+    return isinstance(value, _PLAIN_TYPES)
+
+
+def _plain_result(arp: Arparma) -> bool:
+    """判断解析结果中是否只有不可变的基本类型值
+
+    消息段等对象带有各自事件的 origin 等数据, 且可能被处理器修改, 含有它们的结果不能在事件之间共享
+    """
+    header = arp.header_match
+    if not (_plain(header.origin) and _plain(header.result)):
+        return False
+    if not all(_plain(value) for value in (*arp.main_args.values(), *arp.other_args.values())):
+        return False
+    return _plain_options(arp.options) and _plain_subcommands(arp.subcommands)
+
+
+def _plain_options(options: Dict[str, Any]) -> bool:
+    return all(_plain(res.value) and all(_plain(v) for v in res.args.values()) for res in options.values())
+
+
+def _plain_subcommands(subcommands: Dict[str, Any]) -> bool:
+    return all(
+        _plain(res.value)
+        and all(_plain(v) for v in res.args.values())
+        and _plain_options(res.options)
+        and _plain_subcommands(res.subcommands)
+        for res in subcommands.values()
+    )
+
+
+def _copy_options(options: Dict[str, Any]) -> Dict[str, Any]:
+    return {name: OptionResult(res.value, {**res.args}) for name, res in options.items()}
+
+
+def _copy_subcommands(subcommands: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        name: SubcommandResult(res.value, {**res.args}, _copy_options(res.options), _copy_subcommands(res.subcommands))
+        for name, res in subcommands.items()
+    }
+
+
 class AlconnaRule:
     """检查消息字符串是否能够通过此 Alconna 命令。
 
@@ -46,12 +118,14 @@ class AlconnaRule:
         "use_origin",
         "executor",
         "_waiter",
-        "_matchers",
-        "_futures",
-        "_interfaces",
+        "_sessions",
         "_comp_help",
+        "_parse_cache",
+        "__weakref__",
     )
 
+    metrics: ClassVar[Optional[CommandMetrics]] = None
+
     def __init__(
         self,
         command: Alconna,
@@ -67,6 +141,7 @@ class AlconnaRule:
     ):
         self.comp_config = comp_config
         self.use_origin = use_origin
+        cache_size = 32
         try:
             global_config = get_driver().config
             config = get_plugin_config(Config)
@@ -93,6 +168,7 @@ class AlconnaRule:
                 with command_manager.update(command):
                     self.command.meta.context_style = config.alconna_context_style
             self.use_origin = use_origin or config.alconna_use_origin
+            cache_size = config.alconna_parse_cache_size
         except ValueError:
             self.auto_send = auto_send_output
         self.command = command
@@ -102,12 +178,15 @@ class AlconnaRule:
         self.skip = skip_for_unmatch
         self.executor = ExtensionExecutor(self, extensions, exclude_ext)
         self.executor.post_init()
-        self._futures: Dict[str, Dict[str, asyncio.Future]] = {}
-        self._matchers: Dict[str, Type[Matcher]] = {}
-        self._interfaces: Dict[str, CompSession] = {}
+        command_trie.register(self)
+        self._parse_cache: Optional[LRU[Tuple[tuple, int], Arparma]] = LRU(cache_size) if cache_size > 0 else None
+        self._sessions: Optional[CompletionStore] = None
 
         self._comp_help = ""
         if self.comp_config is not None:
+            self._sessions = CompletionStore(
+                self.comp_config.get("max_sessions", 256), self.comp_config.get("timeout", 60)
+            )
             _tab = self.comp_config.get("tab") or ".tab"
             _enter = self.comp_config.get("enter") or ".enter"
             _exit = self.comp_config.get("exit") or ".exit"
@@ -126,27 +205,31 @@ class AlconnaRule:
                     ((lang.require("comp/nonebot", "exit").format(cmd=_exit) + "\n") if "exit" not in hides else ""),
                 )
 
-            async def _waiter_handle(_bot: Bot, _event: Event, _matcher: Matcher, content: UniMsg):
+            async def _waiter_handle(_bot: Bot, _event: Event, _state: T_State) -> bool:
+                session = self._sessions.get((_bot.self_id, _event.get_session_id()))  # type: ignore
+                if session is None or session.future.done():
+                    return False
+                _future = session.future
+                _interface = session.interface
+                content = await UniMessage.generate(event=_event, bot=_bot)
                 msg = str(content).lstrip()
-                _future = self._futures[_bot.self_id][_event.get_session_id()]
-                _interface = self._interfaces[_event.get_session_id()]
                 if msg.startswith(_exit) and "exit" not in disables:
                     if msg == _exit:
                         _future.set_result(False)
-                        await _matcher.finish()
                     else:
                         _future.set_result(None)
-                        await _matcher.pause(
-                            lang.require("analyser", "param_unmatched").format(target=msg.replace(_exit, "", 1))
+                        await _bot.send(
+                            _event,
+                            lang.require("analyser", "param_unmatched").format(target=msg.replace(_exit, "", 1)),
                         )
                 elif msg.startswith(_enter) and "enter" not in disables:
                     if msg == _enter:
                         _future.set_result(True)
-                        await _matcher.finish()
                     else:
                         _future.set_result(None)
-                        await _matcher.pause(
-                            lang.require("analyser", "param_unmatched").format(target=msg.replace(_enter, "", 1))
+                        await _bot.send(
+                            _event,
+                            lang.require("analyser", "param_unmatched").format(target=msg.replace(_enter, "", 1)),
                         )
                 elif msg.startswith(_tab) and "tab" not in disables:
                     offset = msg.replace(_tab, "", 1).lstrip() or 1
@@ -154,15 +237,15 @@ class AlconnaRule:
                         offset = int(offset)
                     except ValueError:
                         _future.set_result(None)
-                        await _matcher.pause(lang.require("analyser", "param_unmatched").format(target=offset))
+                        await _bot.send(_event, lang.require("analyser", "param_unmatched").format(target=offset))
                     else:
                         _interface.tab(offset)
-                        await _matcher.pause(
-                            f"* {_interface.current()}" if hide_tabs else "\n".join(_interface.lines())
+                        await _bot.send(
+                            _event, f"* {_interface.current()}" if hide_tabs else "\n".join(_interface.lines())
                         )
                 else:
                     _future.set_result(content)
-                    await _matcher.finish()
+                return True
 
             self._waiter = _waiter_handle
 
@@ -179,73 +262,110 @@ class AlconnaRule:
         ctx = await self.executor.context_provider(event, bot, state)
 
         if self.comp_config is None:
-            return self.command.parse(msg, ctx)
+            return self._parse(msg, ctx)
         res = None
-        session_id = event.get_session_id()
-        if session_id not in self._interfaces:
-            self._interfaces[session_id] = CompSession(self.command)
-        with self._interfaces[session_id]:
-            res = self.command.parse(msg, ctx)
+        interface = CompSession(self.command)
+        with interface:
+            res = self._parse(msg, ctx)
         if res:
-            self._interfaces[session_id].exit()
-            del self._interfaces[session_id]
+            interface.exit()
             return res
         if not await self.executor.permission_check(bot, event):
+            interface.exit()
             return False
 
-        def _checker(_event: Event):
-            return session_id == _event.get_session_id()
-
-        self._matchers[session_id] = on_message(priority=0, block=True, rule=Rule(_checker), handlers=[self._waiter])
         res = Arparma(
             self.command.path,
             msg,
             False,
             error_info=SpecialOptionTriggered("completion"),
         )
-        _futures = self._futures.setdefault(bot.self_id, {})
-        _futures[session_id] = asyncio.get_running_loop().create_future()
-
-        def _clear():
-            self._interfaces[session_id].exit()
-            self._matchers[session_id].destroy()
-            del _futures[session_id]
-            del self._matchers[session_id]
-            del self._interfaces[session_id]
-
-        while self._interfaces[session_id].available:
-            await self.send(f"{str(self._interfaces[session_id])}{self._comp_help}", bot, event, res)
-            while True:
-                try:
-                    await asyncio.wait_for(_futures[session_id], timeout=self.comp_config.get("timeout", 60))
-                except asyncio.TimeoutError:
-                    await self.send(lang.require("comp/nonebot", "timeout"), bot, event, res)
-                    _clear()
-                    return res
-                finally:
-                    if not _futures[session_id].done():
-                        _futures[session_id].cancel()
-                ans: Union[UniMessage, bool, None] = _futures[session_id].result()
-                _futures[session_id] = asyncio.get_running_loop().create_future()
-                if ans is False:
-                    await self.send(lang.require("comp/nonebot", "exited"), bot, event, res)
-                    _clear()
-                    return res
-                elif ans is None:
-                    continue
-                _res = self._interfaces[session_id].enter(None if ans is True else ans)
-                if _res.result:
-                    res = _res.result
-                elif _res.exception and not isinstance(_res.exception, SpecialOptionTriggered):
-                    await self.send(str(_res.exception), bot, event, res)
-                break
-        _clear()
+        sessions = cast(CompletionStore, self._sessions)
+        session = sessions.open((bot.self_id, event.get_session_id()), interface)
+        remove = waiter_hub.register(self._waiter, waiter_hub.key_func(bot, event))
+        try:
+            while interface.available:
+                await self.send(f"{str(interface)}{self._comp_help}", bot, event, res)
+                while True:
+                    try:
+                        ans: Union[UniMessage, bool, None] = await session.future
+                    except asyncio.TimeoutError:
+                        await self.send(lang.require("comp/nonebot", "timeout"), bot, event, res)
+                        return res
+                    session.reset()
+                    if ans is False:
+                        await self.send(lang.require("comp/nonebot", "exited"), bot, event, res)
+                        return res
+                    elif ans is None:
+                        continue
+                    _res = interface.enter(None if ans is True else ans)
+                    if _res.result:
+                        res = _res.result
+                    elif _res.exception and not isinstance(_res.exception, SpecialOptionTriggered):
+                        await self.send(str(_res.exception), bot, event, res)
+                    break
+        finally:
+            remove()
+            sessions.close(session)
         return res
 
+    def _parse(self, msg: UniMessage, ctx: dict) -> Arparma:
+        if (metrics := AlconnaRule.metrics) is None:
+            return self._parse_cached(msg, ctx)
+        start = perf_counter()
+        try:
+            return self._parse_cached(msg, ctx)
+        finally:
+            metrics.get(self.command.path).parse.observe(perf_counter() - start)
+
+    def _parse_cached(self, msg: UniMessage, ctx: dict) -> Arparma:
+        """以消息的结构 token 缓存匹配成功的解析结果
+
+        命令带有 behaviors 或执行器 (每次解析都需要执行), 消息含有上下文插值或无法标识的媒体段时不使用缓存;
+        解析结果中含有消息段等非基本类型的值时也不会缓存, 以免处理器拿到之前事件的消息段
+
+        命中缓存时返回的是副本, 其中的结果字典与选项/子命令结果均为新对象
+        """
+        command = self.command
+        if (
+            (cache := self._parse_cache) is None
+            or command.behaviors
+            or command._executors
+            or not command.namespace_config.enable_message_cache
+            or (command.meta.context_style and context_dependent(command.meta.context_style, str(msg)))
+            or (token := structural_key(msg)) is None
+        ):
+            return command.parse(msg, ctx)
+        key = (token, command_trie.revision(self))
+        if (cached := cache.get(key, None)) is not None:
+            return _copy_arparma(cached, msg, ctx)
+        arp = command.parse(msg, ctx)
+        if arp.matched and _plain_result(arp):
+            # 缓存一份副本, 以免处理器修改本次的结果后影响之后的命中
+            cache[key] = _copy_arparma(arp, arp.origin, arp.context)
+        return arp
+
+    async def _permission_check(self, bot: Bot, event: Event, stats: Optional[CommandStats]) -> bool:
+        if stats is None:
+            return await self.executor.permission_check(bot, event)
+        start = perf_counter()
+        try:
+            return await self.executor.permission_check(bot, event)
+        finally:
+            stats.permission.observe(perf_counter() - start)
+
     async def __call__(self, event: Event, state: T_State, bot: Bot) -> bool:
+        stats = metrics.get(self.command.path) if (metrics := AlconnaRule.metrics) else None
         self.executor.select(bot, event)
+        if command_trie.prefilter_enabled and self.executor.transparent and not command_trie.prefilter(self, event):
+            # 被预先排除的一定是消息事件
+            if stats:
+                stats.seen += 1
+            return False
         if not (msg := await self.executor.message_provider(event, state, bot, self.use_origin)):
             return False
+        if stats:
+            stats.seen += 1
         msg = await self.executor.receive_wrapper(bot, event, msg)
         Arparma._additional.update(bot=lambda: bot, event=lambda: event, state=lambda: state)
         adapter_name = bot.adapter.get_name()
@@ -253,8 +373,14 @@ class AlconnaRule:
             importlib.import_module(f"nonebot_plugin_alconna.adapters.{MAPPING[adapter_name]}")
         if isinstance(msg, UniMessage):
             _msg = msg
+        elif stats:
+            start = perf_counter()
+            _msg = await UniMessage.generate(message=msg, event=event, bot=bot)
+            stats.generate.observe(perf_counter() - start)
         else:
             _msg = await UniMessage.generate(message=msg, event=event, bot=bot)
+        if not command_trie.match(self, _msg):
+            return False
         state[UNISEG_MESSAGE] = _msg
         with output_manager.capture(self.command.name) as cap:
             output_manager.set_action(lambda x: x, self.command.name)
@@ -267,30 +393,31 @@ class AlconnaRule:
             may_help_text: Optional[str] = cap.get("output", None)
         if not arp.head_matched:
             return False
+        if stats:
+            stats.head_matched += 1
         if not arp.matched and not may_help_text and self.skip:
-            log(
-                "TRACE",
-                escape_tag(lang.require("nbp-alc", "log.parse").format(msg=msg, cmd=self.command.path, arp=arp)),
-            )
+            log("TRACE", lambda: self._parse_log(msg, arp), sample=True)
             return False
         if arp.head_matched:
-            log(
-                "DEBUG",
-                escape_tag(lang.require("nbp-alc", "log.parse").format(msg=msg, cmd=self.command.path, arp=arp)),
-            )
+            log("DEBUG", lambda: self._parse_log(msg, arp), sample=True)
         if not may_help_text and arp.error_info:
             may_help_text = repr(arp.error_info)
         if self.auto_send and may_help_text:
             await self.send(may_help_text, bot, event, arp)
             return False
-        if not await self.executor.permission_check(bot, event):
+        if not await self._permission_check(bot, event, stats):
             return False
+        if stats and arp.matched:
+            stats.matched += 1
         await self.executor.parse_wrapper(bot, state, event, arp)
         state[ALCONNA_RESULT] = CommandResult(source=self.command, result=arp, output=may_help_text)
         state[ALCONNA_EXEC_RESULT] = self.command.exec_result
         state[ALCONNA_EXTENSION] = self.executor.context
         return True
 
+    def _parse_log(self, msg: Message, arp: Arparma) -> str:
+        return escape_tag(lang.require("nbp-alc", "log.parse").format(msg=msg, cmd=self.command.path, arp=arp))
+
     async def send(self, text: str, bot: Bot, event: Event, arp: Arparma) -> Message:
         _t = str(arp.error_info) if isinstance(arp.error_info, SpecialOptionTriggered) else "error"
         try:
@@ -304,6 +431,15 @@ class AlconnaRule:
             return await bot.send(event, event.get_message().__class__(text))
 
 
+def set_command_metrics(metrics: Optional[CommandMetrics]) -> None:
+    """设置统计各命令匹配率与耗时的 CommandMetrics, 为 None 时关闭统计
+
+    参数:
+        metrics: 统计对象, 如 `command_metrics`
+    """
+    AlconnaRule.metrics = metrics
+
+
 @init_spec(AlconnaRule)
 def alconna(rule: AlconnaRule) -> Rule:
     return Rule(rule)
@@ -0,0 +1,254 @@
+import re
+from itertools import count
+from weakref import finalize
+from typing import TYPE_CHECKING, Any, Set, Dict, List, Tuple, Optional, FrozenSet
+
+from nonebot.adapters import Event, Message
+from arclet.alconna import Alconna, command_manager
+
+from .uniseg import Text, UniMessage
+
+if TYPE_CHECKING:
+    from .rule import AlconnaRule
+
+_SPECIAL = frozenset(".^$*+?{}[]|()")
+_OPTIONAL = frozenset("*?{")
+
+
+def _head(text: str) -> str:
+    """截取字符串中第一个空白字符之前的部分"""
+    for index, char in enumerate(text):
+        if char.isspace():
+            return text[:index]
+    return text
+
+
+def literal_prefix(pattern: str) -> str:
+    """提取正则表达式开头的字面量部分
+
+    该结果一定是所有可被该表达式匹配的字符串的公共前缀; 无法确定时返回空字符串
+    """
+    if "|" in pattern:
+        return ""
+    result: List[str] = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            if index + 1 >= len(pattern) or pattern[index + 1].isalnum():
+                break
+            char = pattern[index + 1]
+            step = 2
+        elif char in _SPECIAL:
+            if char in _OPTIONAL and result:
+                result.pop()
+            break
+        else:
+            step = 1
+        if char.isspace():
+            break
+        result.append(char)
+        index += step
+    return "".join(result)
+
+
+def _shortcut_keys(command: Alconna) -> Optional[Tuple[str, ...]]:
+    """获取命令所有快捷指令的匹配表达式; 无法获取时返回 None"""
+    namespace, name = command_manager._command_part(command.path)
+    try:
+        shortcuts: Dict[str, Any] = getattr(command_manager, "_CommandManager__shortcuts")
+    except AttributeError:
+        return None
+    if not (_shortcut := shortcuts.get(f"{namespace}.{name}")):
+        return ()
+    return tuple(_shortcut[1])
+
+
+def command_keys(command: Alconna, header: Any, shortcuts: Optional[Tuple[str, ...]]) -> Optional[Set[str]]:
+    """计算命令可能匹配的所有首段字面量前缀
+
+    返回 None 表示该命令无法被索引, 需要始终参与解析
+    """
+    if command.meta.fuzzy_match or any(not sep.isspace() for sep in command.separators):
+        return None
+    keys: Set[str] = set()
+    if header.flag == 0:
+        keys.update(_head(content) for content in header.content)
+    elif header.flag == 1:
+        pattern: str = header.content.pattern
+        if prefixes := header.origin[1]:
+            pattern = pattern[len(f"(?:{'|'.join(re.escape(prefix) for prefix in prefixes)})") :]
+            keys.update(_head(prefix + literal_prefix(pattern)) for prefix in prefixes)
+        else:
+            keys.add(_head(literal_prefix(pattern)))
+    else:
+        return None
+    if shortcuts is None:
+        return None
+    keys.update(_head(literal_prefix(key)) for key in shortcuts)
+    if "" in keys:
+        return None
+    return keys
+
+
+class _Node:
+    __slots__ = ("children", "rules")
+
+    def __init__(self):
+        self.children: Dict[str, _Node] = {}
+        self.rules: Set[int] = set()
+
+
+class CommandTrie:
+    """按命令头部字面量前缀索引所有 AlconnaRule 的前缀树
+
+    对于一条消息, 只有头部前缀与消息首段文本相符的命令 (以及无法索引的命令) 才会进行完整解析
+    """
+
+    def __init__(self, memo_size: int = 4096):
+        self._root = _Node()
+        self._fallback: Set[int] = set()
+        self._entries: Dict[int, Tuple[Any, Optional[Tuple[str, ...]], Optional[Set[str]]]] = {}
+        self._memo: Dict[Optional[str], FrozenSet[int]] = {}
+        self._memo_size = memo_size
+        self._depth = 0
+        self._raw: Tuple[Optional[Message], int, Optional[str]] = (None, 0, None)
+        self._revisions: Dict[int, int] = {}
+        self._counter = count(1)
+        self.prefilter_enabled = True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def register(self, rule: "AlconnaRule") -> None:
+        """注册 AlconnaRule, 并在其被回收时自动移除"""
+        self.update(rule)
+        finalize(rule, self.remove, id(rule))
+
+    def update(self, rule: "AlconnaRule") -> None:
+        """当命令头部或快捷指令发生变化时重建该命令的索引"""
+        command = rule.command
+        try:
+            header = command_manager.require(command).command_header
+        except ValueError:
+            header = None
+        shortcuts = _shortcut_keys(command)
+        entry = self._entries.get(id(rule))
+        if entry and entry[0] is header and entry[1] == shortcuts:
+            return
+        self.remove(id(rule))
+        keys = None if header is None else command_keys(command, header, shortcuts)
+        self._entries[id(rule)] = (header, shortcuts, keys)
+        self._revisions[id(rule)] = next(self._counter)
+        if keys is None:
+            self._fallback.add(id(rule))
+            return
+        for key in keys:
+            node = self._root
+            for char in key:
+                node = node.children.setdefault(char, _Node())
+            node.rules.add(id(rule))
+            self._depth = max(self._depth, len(key))
+
+    def remove(self, rule_id: int) -> None:
+        """移除某个 AlconnaRule 的索引"""
+        self._memo.clear()
+        self._revisions.pop(rule_id, None)
+        if not (entry := self._entries.pop(rule_id, None)):
+            return
+        if (keys := entry[2]) is None:
+            self._fallback.discard(rule_id)
+            return
+        for key in keys:
+            node = self._root
+            for char in key:
+                if not (node := node.children.get(char)):  # type: ignore
+                    break
+            else:
+                node.rules.discard(rule_id)
+
+    def revision(self, rule: "AlconnaRule") -> int:
+        """获取该 AlconnaRule 的索引版本号, 命令头部或快捷指令变化后版本号随之改变"""
+        self.update(rule)
+        return self._revisions[id(rule)]
+
+    def candidates(self, text: Optional[str]) -> FrozenSet[int]:
+        """获取可能匹配该首段文本的所有 AlconnaRule 的 id
+
+        参数:
+            text: 消息的首段文本; 为 None 时说明消息不以文本开头
+        """
+        if text is not None:
+            text = text[: self._depth]
+        if (cached := self._memo.get(text)) is not None:
+            return cached
+        result = set(self._fallback)
+        node = self._root
+        for char in text or "":
+            if not (node := node.children.get(char)):  # type: ignore
+                break
+            result |= node.rules
+        if len(self._memo) >= self._memo_size:
+            self._memo.clear()
+        self._memo[text] = cached = frozenset(result)
+        return cached
+
+    def match(self, rule: "AlconnaRule", msg: UniMessage) -> bool:
+        """检查该消息是否可能被该 AlconnaRule 的命令头部匹配"""
+        self.update(rule)
+        return id(rule) in self.candidates(first_text(msg))
+
+    def prefilter(self, rule: "AlconnaRule", event: Event) -> bool:
+        """在转换为 UniMessage 之前, 依据原始消息的首段文本预先排除不可能匹配的 AlconnaRule
+
+        无法索引的命令, 以及原始消息不以文本开头或无法获取时, 总是返回 True, 交由后续流程判断
+        """
+        self.update(rule)
+        if id(rule) in self._fallback:
+            return True
+        if (text := self._raw_text(event, rule.use_origin)) is None:
+            return True
+        return id(rule) in self.candidates(text)
+
+    def _raw_text(self, event: Event, use_origin: bool) -> Optional[str]:
+        try:
+            if event.get_type() != "message":
+                return None
+            msg: Message = event.get_message()
+            if use_origin:
+                msg = getattr(event, "original_message", msg)
+        except (NotImplementedError, ValueError):
+            return None
+        # 同一事件会依次经过所有 AlconnaRule, 只需保留最近一条消息的结果
+        last, length, text = self._raw
+        if last is not msg or length != len(msg):
+            text = raw_first_text(msg)
+            self._raw = (msg, len(msg), text)
+        return text
+
+
+def first_text(msg: UniMessage) -> Optional[str]:
+    """获取消息的首段文本 (与 MessageArgv.build 一致地跳过首部空白文本)"""
+    for seg in msg:
+        if isinstance(seg, Text):
+            if not seg.text.strip():
+                continue
+            return seg.text.lstrip()
+        return None
+    return None
+
+
+def raw_first_text(msg: Message) -> Optional[str]:
+    """获取原始消息开头连续文本段拼接而成的文本
+
+    与 `first_text` 不同, 返回 None 表示无法据此判断 (如消息不以文本开头), 而非一定不匹配
+    """
+    parts: List[str] = []
+    for seg in msg:
+        if not seg.is_text() or not isinstance(text := seg.data.get("text"), str):
+            break
+        parts.append(text)
+    return "".join(parts).lstrip() or None
+
+
+command_trie = CommandTrie()
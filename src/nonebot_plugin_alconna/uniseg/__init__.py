@@ -1,4 +1,6 @@
 import asyncio
+import contextlib
+from typing import Dict, Tuple
 
 from nonebot.adapters import Bot
 from nonebot.plugin import PluginMetadata
@@ -32,8 +34,13 @@ from .message import UniMessage as UniMessage
 from .segment import CustomNode as CustomNode
 from .tools import image_fetch as image_fetch
 from .tools import reply_fetch as reply_fetch
+from .upload import UploadCache as UploadCache
+from .limiter import SendLimiter as SendLimiter
+from .limiter import TokenBucket as TokenBucket
 from .params import MessageTarget as MessageTarget
+from .target import TargetFetcher as TargetFetcher
 from .constraint import SupportScope as SupportScope
+from .download import DownloadCache as DownloadCache
 from .segment import custom_handler as custom_handler
 from .segment import custom_register as custom_register
 from .constraint import SupportAdapter as SupportAdapter
@@ -41,10 +48,20 @@ from .fallback import FallbackMessage as FallbackMessage
 from .fallback import FallbackSegment as FallbackSegment
 from .params import UniversalMessage as UniversalMessage
 from .params import UniversalSegment as UniversalSegment
+from .broadcast import BroadcastResult as BroadcastResult
+from .scheduler import ScheduledAction as ScheduledAction
 from .constraint import SerializeFailed as SerializeFailed
+from .upload import MemoryUploadCache as MemoryUploadCache
+from .upload import SqliteUploadCache as SqliteUploadCache
+from .scheduler import action_scheduler as action_scheduler
+from .upload import apply_upload_cache as apply_upload_cache
+from .limiter import apply_send_limiter as apply_send_limiter
 from .segment import apply_media_to_url as apply_media_to_url
+from .download import apply_download_cache as apply_download_cache
 from .constraint import SupportAdapterModule as SupportAdapterModule
-from .adapters import BUILDER_MAPPING, FETCHER_MAPPING, EXPORTER_MAPPING
+from .exporter import apply_export_concurrency as apply_export_concurrency
+from .scheduler import apply_action_persistence as apply_action_persistence
+from .adapters import BUILDER_MAPPING, FETCHER_MAPPING, EXPORTER_MAPPING, import_report, preload_adapters
 
 __version__ = "0.45.0"
 
@@ -73,8 +90,30 @@ def apply_filehost():
 
 reply_handle = reply_fetch  # backward compatibility
 
+
+def _register_preload():
+    from nonebot import get_driver
+
+    @get_driver().on_startup
+    async def _():
+        preload_adapters()
+        log("DEBUG", import_report())
+
+
+with contextlib.suppress(ValueError):
+    _register_preload()
+
 _enable_fetch_targets = False
-FETCH_LOCK = asyncio.Lock()
+FETCH_LOCKS: Dict[Tuple[str, str], asyncio.Lock] = {}
+FETCH_LOCK = asyncio.Lock()  # backward compatibility, no longer used
+
+
+def _fetch_lock(bot: Bot):
+    # 各个 bot 的拉取互不阻塞, 同一 bot 的连接与断开仍按顺序处理
+    key = (bot.adapter.get_name(), bot.self_id)
+    if (lock := FETCH_LOCKS.get(key)) is None:
+        lock = FETCH_LOCKS[key] = asyncio.Lock()
+    return lock
 
 
 def _register_hook():
@@ -85,12 +124,12 @@ def _register_hook():
     @driver.on_bot_connect
     async def _(bot: Bot):
         log("DEBUG", f"cache or refresh targets for bot:{bot.self_id}")
-        async with FETCH_LOCK:
+        async with _fetch_lock(bot):
             await _refresh_bot(bot)
 
     @driver.on_bot_disconnect
     async def _(bot: Bot):
-        async with FETCH_LOCK:
+        async with _fetch_lock(bot):
             TARGET_RECORD.pop(bot.self_id, None)
             if fn := FETCHER_MAPPING.get(bot.adapter.get_name()):
                 fn.cache.pop(bot.self_id, None)
@@ -1,9 +1,9 @@
 import os
 import importlib
-from pathlib import Path
 from warnings import warn
-from typing import Dict, cast
+from time import perf_counter
 from contextlib import suppress
+from typing import Set, Dict, TypeVar, Optional, cast
 
 from nonebot import get_adapters
 
@@ -11,21 +11,96 @@ from ..loader import BaseLoader
 from ..target import TargetFetcher
 from ..builder import MessageBuilder
 from ..exporter import MessageExporter
+from ..constraint import SupportAdapter, log
+
+T = TypeVar("T")
 
-root = Path(__file__).parent
 loaders: Dict[str, BaseLoader] = {}
-_adapters = [path.stem for path in root.iterdir() if path.is_dir() and not path.stem.startswith("_")]
-for name in _adapters:
+import_costs: Dict[str, float] = {}
+"""各适配器的加载耗时 (秒)"""
+_resolved: Set[str] = set()
+
+
+def load_adapter(adapter: str) -> bool:
+    """加载某个适配器对应的 uniseg 模块, 并注册其 builder、exporter 与 fetcher
+
+    参数:
+        adapter: 适配器名称, 即 `Adapter.get_name()` 的返回值
+
+    返回:
+        是否加载成功
+    """
+    if adapter in _resolved:
+        return adapter in loaders
+    _resolved.add(adapter)
+    try:
+        name = SupportAdapter(adapter).name
+    except ValueError:
+        return False
+    start = perf_counter()
     try:
         module = importlib.import_module(f".{name}", __package__)
         loader = cast(BaseLoader, getattr(module, "Loader")())
-        loaders[loader.get_adapter().value] = loader
+        exporter = loader.get_exporter()
+        builder = loader.get_builder()
+        fetcher = None
+        with suppress(NotImplementedError):
+            fetcher = loader.get_fetcher()
     except Exception as e:
-        warn(f"Failed to import uniseg adapter {name}: {e}", RuntimeWarning, 15)
+        warn(f"Failed to load uniseg adapter {adapter}: {e}", RuntimeWarning, 15)
+        return False
+    dict.__setitem__(EXPORTER_MAPPING, adapter, exporter)
+    dict.__setitem__(BUILDER_MAPPING, adapter, builder)
+    if fetcher:
+        dict.__setitem__(FETCHER_MAPPING, adapter, fetcher)
+    loaders[adapter] = loader
+    import_costs[adapter] = perf_counter() - start
+    log("DEBUG", f"uniseg adapter {adapter} loaded in {import_costs[adapter] * 1000:.2f}ms")
+    return True
+
+
+class LazyMapping(Dict[str, T]):
+    """在首次查询某个适配器时才加载其对应模块的映射"""
+
+    def get(self, key: str, default: Optional[T] = None) -> Optional[T]:  # type: ignore
+        if (value := dict.get(self, key)) is not None:
+            return value
+        if key not in _resolved:
+            load_adapter(key)
+        return dict.get(self, key, default)
+
+    def __getitem__(self, key: str) -> T:
+        if key not in _resolved:
+            load_adapter(key)
+        return dict.__getitem__(self, key)
+
+    def __contains__(self, key: object) -> bool:
+        if isinstance(key, str) and key not in _resolved:
+            load_adapter(key)
+        return dict.__contains__(self, key)
+
+
+EXPORTER_MAPPING: LazyMapping[MessageExporter] = LazyMapping()
+BUILDER_MAPPING: LazyMapping[MessageBuilder] = LazyMapping()
+FETCHER_MAPPING: LazyMapping[TargetFetcher] = LazyMapping()
+
+
+def import_report() -> str:
+    """生成各已加载适配器的加载耗时报告"""
+    total = sum(import_costs.values())
+    lines = [f"uniseg adapters loaded: {len(import_costs)}, total {total * 1000:.2f}ms"]
+    lines.extend(
+        f"  {adapter}: {cost * 1000:.2f}ms"
+        for adapter, cost in sorted(import_costs.items(), key=lambda x: x[1], reverse=True)
+    )
+    return "\n".join(lines)
+
+
+def preload_adapters() -> None:
+    """加载所有已注册适配器对应的 uniseg 模块"""
+    for adapter in get_adapters():
+        load_adapter(adapter)
 
-EXPORTER_MAPPING: Dict[str, MessageExporter] = {}
-BUILDER_MAPPING: Dict[str, MessageBuilder] = {}
-FETCHER_MAPPING: Dict[str, TargetFetcher] = {}
 
 try:
     adapters = get_adapters()
@@ -39,25 +114,11 @@ else:
             15,
         )
     elif os.environ.get("PLUGIN_ALCONNA_TESTENV"):
-        for adapter, loader in loaders.items():
-            try:
-                EXPORTER_MAPPING[adapter] = loaders[adapter].get_exporter()
-                BUILDER_MAPPING[adapter] = loaders[adapter].get_builder()
-                with suppress(NotImplementedError):
-                    FETCHER_MAPPING[adapter] = loaders[adapter].get_fetcher()
-            except Exception as e:
-                warn(f"Failed to load uniseg adapter {adapter}: {e}", RuntimeWarning, 15)
+        for _adapter in SupportAdapter:
+            load_adapter(_adapter.value)
     else:
         for adapter in adapters:
-            if adapter in loaders:
-                try:
-                    EXPORTER_MAPPING[adapter] = loaders[adapter].get_exporter()
-                    BUILDER_MAPPING[adapter] = loaders[adapter].get_builder()
-                    with suppress(NotImplementedError):
-                        FETCHER_MAPPING[adapter] = loaders[adapter].get_fetcher()
-                except Exception as e:
-                    warn(f"Failed to load uniseg adapter {adapter}: {e}", RuntimeWarning, 15)
-            else:
+            if adapter not in SupportAdapter.__members__.values():
                 warn(
                     f"Adapter {adapter} is not found in the uniseg.adapters,"
                     f"please go to the github repo and create an issue for it.",
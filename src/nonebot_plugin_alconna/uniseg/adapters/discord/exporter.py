@@ -1,15 +1,16 @@
+import time
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Union, cast
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Union, Optional, cast
 
 from tarina import lang
 from nonebot.adapters import Bot, Event
-from nonebot.internal.driver import Request
 from nonebot.adapters.discord.api.types import ChannelType
 from nonebot.adapters.discord.bot import Bot as DiscordBot
 from nonebot.adapters.discord.api.model import Channel, MessageGet
 from nonebot.adapters.discord.message import Message, MessageSegment, parse_message
 from nonebot.adapters.discord.event import MessageEvent, GuildMessageCreateEvent, DirectMessageCreateEvent
 
+from nonebot_plugin_alconna.uniseg.download import fetch_url
 from nonebot_plugin_alconna.uniseg.constraint import SupportScope
 from nonebot_plugin_alconna.uniseg.segment import At, File, Text, AtAll, Audio, Emoji, Image, Reply, Video, Voice
 from nonebot_plugin_alconna.uniseg.exporter import Target, SupportAdapter, MessageExporter, SerializeFailed, export
@@ -97,10 +98,9 @@ class DiscordMessageExporter(MessageExporter[Message]):
             path = Path(seg.path)
             return MessageSegment.attachment(path.name, content=path.read_bytes())
         elif seg.url and (seg.id or seg.name):
-            resp = await bot.adapter.request(Request("GET", seg.url))
             return MessageSegment.attachment(
                 seg.id or seg.name,
-                content=resp.content,  # type: ignore
+                content=await fetch_url(bot, seg.url),
             )
         else:
             raise SerializeFailed(lang.require("nbp-uniseg", "invalid_segment").format(type=name, seg=seg))
@@ -126,6 +126,33 @@ class DiscordMessageExporter(MessageExporter[Message]):
         assert isinstance(bot, DiscordBot)
         return await bot.delete_message(channel_id=mid.channel_id, message_id=_mid.id)
 
+    async def recall_many(self, items: List[Tuple[Any, Union[Target, Event]]], bot: Bot) -> List[Optional[Exception]]:
+        assert isinstance(bot, DiscordBot)
+        results: List[Optional[Exception]] = [None] * len(items)
+        channels: Dict[int, List[Tuple[int, MessageGet]]] = {}
+        for index, (mid, _) in enumerate(items):
+            channels.setdefault(mid.channel_id, []).append((index, mid))
+        # 批量删除每次只能删除 2 至 100 条两周内的消息, 且需要管理消息的权限; 失败时退回逐条删除
+        limit = time.time() - 14 * 86400 + 60
+        for channel_id, mids in channels.items():
+            recent = [item for item in mids if item[1].timestamp.timestamp() > limit]
+            single = [item for item in mids if item[1].timestamp.timestamp() <= limit]
+            for i in range(0, len(recent), 100):
+                chunk = recent[i : i + 100]
+                if len(chunk) == 1:
+                    single.extend(chunk)
+                    continue
+                try:
+                    await bot.bulk_delete_message(channel_id=channel_id, messages=[mid.id for _, mid in chunk])
+                except Exception:
+                    single.extend(chunk)
+            for index, mid in single:
+                try:
+                    await bot.delete_message(channel_id=channel_id, message_id=mid.id)
+                except Exception as e:
+                    results[index] = e
+        return results
+
     async def edit(self, new: Message, mid: Any, bot: Bot, context: Union[Target, Event]):
         _mid: MessageGet = cast(MessageGet, mid)
         assert isinstance(bot, DiscordBot)
@@ -1,4 +1,5 @@
-from typing import TYPE_CHECKING, Union
+from functools import partial
+from typing import TYPE_CHECKING, Any, Union
 
 from nonebot.adapters import Bot
 from nonebot.adapters.discord.api.types import ChannelType
@@ -13,24 +14,33 @@ class DiscordTargetFetcher(TargetFetcher):
     def get_adapter(cls) -> SupportAdapter:
         return SupportAdapter.discord
 
-    async def fetch(self, bot: Bot, target: Union[Target, None] = None):
+    def fetch(self, bot: Bot, target: Union[Target, None] = None):
+        return self._walk(self.fetch_tasks(bot, target))
+
+    def fetch_tasks(self, bot: Bot, target: Union[Target, None] = None):
         if TYPE_CHECKING:
             assert isinstance(bot, DiscordBot)
         if target and not target.channel:
-            return
+            return []
+        return [partial(self._guilds, bot, target)]
+
+    async def _guilds(self, bot: "DiscordBot", target: Union[Target, None]):
         if target and target.parent_id:
             guilds = [await bot.get_guild(guild_id=int(target.parent_id))]
         else:
             guilds = await bot.get_current_user_guilds()
         for guild in guilds:
-            channels = await bot.get_guild_channels(guild_id=guild.id)
-            for channel in channels:
-                yield Target(
-                    str(channel.id),
-                    str(guild.id),
-                    channel=True,
-                    private=channel.type == ChannelType.DM,
-                    adapter=self.get_adapter(),
-                    self_id=bot.self_id,
-                    extra={"channel_type": channel.type},
-                )
+            yield partial(self._channels, bot, guild)
+
+    async def _channels(self, bot: "DiscordBot", guild: Any):
+        channels = await bot.get_guild_channels(guild_id=guild.id)
+        for channel in channels:
+            yield Target(
+                str(channel.id),
+                str(guild.id),
+                channel=True,
+                private=channel.type == ChannelType.DM,
+                adapter=self.get_adapter(),
+                self_id=bot.self_id,
+                extra={"channel_type": channel.type},
+            )
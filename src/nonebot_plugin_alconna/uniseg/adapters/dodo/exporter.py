@@ -1,15 +1,17 @@
+import json
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, Union, cast
 
 from tarina import lang
-from nonebot.drivers import Request
 from nonebot.adapters import Bot, Event
 from nonebot.adapters.dodo.bot import Bot as DoDoBot
 from nonebot.adapters.dodo.event import MessageEvent
 from nonebot.adapters.dodo.event import Event as DoDoEvent
 from nonebot.adapters.dodo.message import Message, MessageSegment
 
+from nonebot_plugin_alconna.uniseg.download import fetch_url
 from nonebot_plugin_alconna.uniseg.constraint import SupportScope
+from nonebot_plugin_alconna.uniseg.upload import media_key, cached_upload
 from nonebot_plugin_alconna.uniseg.segment import At, Text, Image, Reply, Video
 from nonebot_plugin_alconna.uniseg.exporter import Target, SupportAdapter, MessageExporter, SerializeFailed, export
 
@@ -67,18 +69,21 @@ class DoDoMessageExporter(MessageExporter[Message]):
     async def image(self, seg: Image, bot: Bot) -> "MessageSegment":
         if TYPE_CHECKING:
             assert isinstance(bot, DoDoBot)
-        if seg.raw:
-            data = seg.raw_bytes
-        elif seg.path:
-            data = Path(seg.path)
-        elif seg.url:
-            resp = await bot.adapter.request(Request("GET", seg.url))
-            data = cast(bytes, resp.content)
-        else:
+        if not (seg.raw or seg.path or seg.url):
             raise SerializeFailed(lang.require("nbp-uniseg", "invalid_segment").format(type="image", seg=seg))
-        res = await bot.set_resouce_picture_upload(file=data)
 
-        return MessageSegment.picture(res.url, res.width, res.height)
+        async def upload():
+            if seg.raw:
+                data = seg.raw_bytes
+            elif seg.path:
+                data = Path(seg.path)
+            else:
+                data = cast(bytes, await fetch_url(bot, seg.url))  # type: ignore
+            res = await bot.set_resouce_picture_upload(file=data)
+            return json.dumps([res.url, res.width, res.height])
+
+        url, width, height = json.loads(await cached_upload(await media_key(seg, bot), upload))
+        return MessageSegment.picture(url, width, height)
 
     @export
     async def video(self, seg: Video, bot: Bot) -> "MessageSegment":
@@ -1,18 +1,32 @@
-from pathlib import Path
+from contextlib import asynccontextmanager
 from typing import TYPE_CHECKING, Any, Union
 
 from tarina import lang
 from nonebot.adapters import Bot, Event
-from nonebot.internal.driver import Request
 from nonebot.adapters.feishu.bot import Bot as FeishuBot
 from nonebot.adapters.feishu.message import Message, MessageSegment
 from nonebot.adapters.feishu.event import MessageEvent, GroupMessageEvent, PrivateMessageEvent
 
+from nonebot_plugin_alconna.uniseg.download import fetch_url
 from nonebot_plugin_alconna.uniseg.constraint import SupportScope
-from nonebot_plugin_alconna.uniseg.segment import At, File, Text, AtAll, Audio, Image, Reply, Video, Voice
+from nonebot_plugin_alconna.uniseg.upload import media_key, cached_upload
+from nonebot_plugin_alconna.uniseg.segment import At, File, Text, AtAll, Audio, Image, Media, Reply, Video, Voice
 from nonebot_plugin_alconna.uniseg.exporter import Target, SupportAdapter, MessageExporter, SerializeFailed, export
 
 
+@asynccontextmanager
+async def _open_media(seg: Media, bot: Bot):
+    if seg.url:
+        yield await fetch_url(bot, seg.url)
+        return
+    if seg.raw is not None and hasattr(seg.raw, "__aiter__"):
+        await seg.aread()
+    if seg.raw:
+        seg.sniff()
+    with seg.open() as f:
+        yield f
+
+
 class FeishuMessageExporter(MessageExporter[Message]):
     def get_message_type(self):
         return Message
@@ -43,6 +57,14 @@ class FeishuMessageExporter(MessageExporter[Message]):
             )
         raise NotImplementedError
 
+    async def _upload_file(self, seg: Union[Voice, Audio, File, Video], bot: Bot) -> str:
+        async with _open_media(seg, bot) as raw:
+            data = {"file_type": "stream", "file_name": seg.name}
+            files = {"file": ("file", raw)}
+            params = {"method": "POST", "data": data, "files": files}
+            result = await bot.call_api("im/v1/files", **params)
+        return result["data"]["file_key"]
+
     @export
     async def text(self, seg: Text, bot: Bot) -> "MessageSegment":
         return MessageSegment.text(seg.text)
@@ -59,20 +81,18 @@ class FeishuMessageExporter(MessageExporter[Message]):
     async def image(self, seg: Image, bot: Bot) -> "MessageSegment":
         if seg.id:
             return MessageSegment.image(seg.id)
-        elif seg.url:
-            resp = await bot.adapter.request(Request("GET", seg.url))
-            image = resp.content
-        elif seg.path:
-            image = Path(seg.path).read_bytes()
-        elif seg.raw:
-            image = seg.raw_bytes
-        else:
+        elif not (seg.url or seg.path or seg.raw):
             raise SerializeFailed(lang.require("nbp-uniseg", "invalid_segment").format(type="image", seg=seg))
-        data = {"image_type": "message"}
-        files = {"image": ("file", image)}
-        params = {"method": "POST", "data": data, "files": files}
-        result = await bot.call_api("im/v1/images", **params)
-        file_key = result["data"]["image_key"]
+
+        async def upload():
+            async with _open_media(seg, bot) as image:
+                data = {"image_type": "message"}
+                files = {"image": ("file", image)}
+                params = {"method": "POST", "data": data, "files": files}
+                result = await bot.call_api("im/v1/images", **params)
+            return result["data"]["image_key"]
+
+        file_key = await cached_upload(await media_key(seg, bot), upload)
         return MessageSegment.image(file_key)
 
     @export
@@ -80,60 +100,27 @@ class FeishuMessageExporter(MessageExporter[Message]):
         name = seg.__class__.__name__.lower()
         if seg.id:
             return MessageSegment.audio(seg.id, seg.duration)
-        elif seg.url:
-            resp = await bot.adapter.request(Request("GET", seg.url))
-            raw = resp.content
-        elif seg.path:
-            raw = Path(seg.path).read_bytes()
-        elif seg.raw:
-            raw = seg.raw_bytes
-        else:
+        elif not (seg.url or seg.path or seg.raw):
             raise SerializeFailed(lang.require("nbp-uniseg", "invalid_segment").format(type=name, seg=seg))
-        data = {"file_type": "stream", "file_name": seg.name}
-        files = {"file": ("file", raw)}
-        params = {"method": "POST", "data": data, "files": files}
-        result = await bot.call_api("im/v1/files", **params)
-        file_key = result["data"]["file_key"]
+        file_key = await cached_upload(await media_key(seg, bot), lambda: self._upload_file(seg, bot))
         return MessageSegment.audio(file_key, seg.duration)
 
     @export
     async def file(self, seg: File, bot: Bot) -> "MessageSegment":
         if seg.id:
             return MessageSegment.file(seg.id, seg.name)
-        elif seg.url:
-            resp = await bot.adapter.request(Request("GET", seg.url))
-            raw = resp.content
-        elif seg.path:
-            raw = Path(seg.path).read_bytes()
-        elif seg.raw:
-            raw = seg.raw_bytes
-        else:
+        elif not (seg.url or seg.path or seg.raw):
             raise SerializeFailed(lang.require("nbp-uniseg", "invalid_segment").format(type="file", seg=seg))
-        data = {"file_type": "stream", "file_name": seg.name}
-        files = {"file": ("file", raw)}
-        params = {"method": "POST", "data": data, "files": files}
-        result = await bot.call_api("im/v1/files", **params)
-        file_key = result["data"]["file_key"]
+        file_key = await cached_upload(await media_key(seg, bot), lambda: self._upload_file(seg, bot))
         return MessageSegment.file(file_key, seg.name)
 
     @export
     async def video(self, seg: Video, bot: Bot) -> "MessageSegment":
         if seg.id:
             return MessageSegment.sticker(seg.id)
-        elif seg.url:
-            resp = await bot.adapter.request(Request("GET", seg.url))
-            raw = resp.content
-        elif seg.path:
-            raw = Path(seg.path).read_bytes()
-        elif seg.raw:
-            raw = seg.raw_bytes
-        else:
+        elif not (seg.url or seg.path or seg.raw):
             raise SerializeFailed(lang.require("nbp-uniseg", "invalid_segment").format(type="video", seg=seg))
-        data = {"file_type": "stream", "file_name": seg.name}
-        files = {"file": ("file", raw)}
-        params = {"method": "POST", "data": data, "files": files}
-        result = await bot.call_api("im/v1/files", **params)
-        file_key = result["data"]["file_key"]
+        file_key = await cached_upload(await media_key(seg, bot), lambda: self._upload_file(seg, bot))
         return MessageSegment.sticker(file_key)
 
     @export
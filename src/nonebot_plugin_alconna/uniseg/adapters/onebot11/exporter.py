@@ -4,11 +4,11 @@ from typing import TYPE_CHECKING, Any, Union
 
 from tarina import lang
 from nonebot.adapters import Bot, Event
-from nonebot.internal.driver import Request
 from nonebot.adapters.onebot.v11.event import MessageEvent
 from nonebot.adapters.onebot.v11.bot import Bot as OnebotBot
 from nonebot.adapters.onebot.v11.message import Message, MessageSegment
 
+from nonebot_plugin_alconna.uniseg.download import fetch_url
 from nonebot_plugin_alconna.uniseg.constraint import SupportScope
 from nonebot_plugin_alconna.uniseg.exporter import Target, SupportAdapter, MessageExporter, SerializeFailed, export
 from nonebot_plugin_alconna.uniseg.segment import (
@@ -87,8 +87,7 @@ class Onebot11MessageExporter(MessageExporter["Message"]):
         elif seg.path:
             return method(Path(seg.path))
         elif seg.url:
-            resp = await bot.adapter.request(Request("GET", seg.url))
-            return method(resp.content)
+            return method(await fetch_url(bot, seg.url))
         elif seg.id:
             return method(seg.id)
         else:
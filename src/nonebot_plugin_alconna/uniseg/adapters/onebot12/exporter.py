@@ -8,6 +8,7 @@ from nonebot.adapters.onebot.v12.bot import Bot as OnebotBot
 from nonebot.adapters.onebot.v12.message import Message, MessageSegment
 
 from nonebot_plugin_alconna.uniseg.constraint import SupportScope
+from nonebot_plugin_alconna.uniseg.upload import media_key, cached_upload
 from nonebot_plugin_alconna.uniseg.segment import At, File, Text, AtAll, Audio, Image, Reply, Video, Voice
 from nonebot_plugin_alconna.uniseg.exporter import Target, SupportAdapter, MessageExporter, SerializeFailed, export
 
@@ -90,35 +91,36 @@ class Onebot12MessageExporter(MessageExporter["Message"]):
         }[name]
         if seg.id:
             return method(seg.id)
-        elif seg.url:
-            resp = await bot.upload_file(type="url", name=seg.name, url=seg.url)
-            return method(resp["file_id"])
-        elif seg.path:
-            if seg.__class__.to_url:
-                resp = await bot.upload_file(
-                    type="url",
-                    name=Path(seg.path).name,
-                    url=await seg.__class__.to_url(
-                        seg.path, bot, None if seg.name == seg.__default_name__ else seg.name
-                    ),
-                )
-            else:
-                resp = await bot.upload_file(type="path", path=str(seg.path), name=Path(seg.path).name)
-            return method(resp["file_id"])
-        elif seg.raw:
-            if seg.__class__.to_url:
+        elif not (seg.url or seg.path or seg.raw):
+            raise SerializeFailed(lang.require("nbp-uniseg", "invalid_segment").format(type=name, seg=seg))
+
+        async def upload() -> str:
+            if seg.url:
+                resp = await bot.upload_file(type="url", name=seg.name, url=seg.url)
+            elif seg.path:
+                if seg.__class__.to_url:
+                    resp = await bot.upload_file(
+                        type="url",
+                        name=Path(seg.path).name,
+                        url=await seg.__class__.to_url(
+                            seg.path, bot, None if seg.name == seg.__default_name__ else seg.name
+                        ),
+                    )
+                else:
+                    resp = await bot.upload_file(type="path", path=str(seg.path), name=Path(seg.path).name)
+            elif seg.__class__.to_url:
                 resp = await bot.upload_file(
                     type="url",
                     name=seg.name,
                     url=await seg.__class__.to_url(
-                        seg.raw, bot, None if seg.name == seg.__default_name__ else seg.name
+                        seg.raw, bot, None if seg.name == seg.__default_name__ else seg.name  # type: ignore
                     ),
                 )
             else:
                 resp = await bot.upload_file(type="data", data=seg.raw_bytes, name=seg.name)
-            return method(resp["file_id"])
-        else:
-            raise SerializeFailed(lang.require("nbp-uniseg", "invalid_segment").format(type=name, seg=seg))
+            return resp["file_id"]
+
+        return method(await cached_upload(await media_key(seg, bot), upload))
 
     @export
     async def reply(self, seg: Reply, bot: Bot) -> "MessageSegment":
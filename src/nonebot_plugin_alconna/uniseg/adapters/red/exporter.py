@@ -3,13 +3,13 @@ from typing import TYPE_CHECKING, Any, Union, cast
 
 from tarina import lang
 from nonebot.adapters import Bot, Event
-from nonebot.internal.driver import Request
 from nonebot.adapters.red.bot import Bot as RedBot
 from nonebot.adapters.red.api.model import ChatType
 from nonebot.adapters.red.event import MessageEvent
 from nonebot.adapters.red.api.model import Message as MessageModel
 from nonebot.adapters.red.message import Message, ForwardNode, MessageSegment
 
+from nonebot_plugin_alconna.uniseg.download import fetch_url
 from nonebot_plugin_alconna.uniseg.constraint import SupportScope
 from nonebot_plugin_alconna.uniseg.exporter import Target, SupportAdapter, MessageExporter, SerializeFailed, export
 from nonebot_plugin_alconna.uniseg.segment import (
@@ -79,8 +79,7 @@ class RedMessageExporter(MessageExporter[Message]):
         elif seg.raw:
             return method(seg.raw_bytes)
         elif seg.url:
-            resp = await bot.adapter.request(Request("GET", seg.url))
-            return method(resp.content)  # type: ignore
+            return method(await fetch_url(bot, seg.url))  # type: ignore
         else:
             raise SerializeFailed(lang.require("nbp-uniseg", "invalid_segment").format(type=name, seg=seg))
 
@@ -92,8 +91,7 @@ class RedMessageExporter(MessageExporter[Message]):
         elif seg.raw:
             return MessageSegment.voice(seg.raw_bytes, duration=seg.duration or 1)
         elif seg.url:
-            resp = await bot.adapter.request(Request("GET", seg.url))
-            return MessageSegment.voice(resp.content, duration=seg.duration or 1)  # type: ignore
+            return MessageSegment.voice(await fetch_url(bot, seg.url), duration=seg.duration or 1)  # type: ignore
         else:
             raise SerializeFailed(lang.require("nbp-uniseg", "invalid_segment").format(type=name, seg=seg))
 
@@ -1,4 +1,5 @@
-from typing import TYPE_CHECKING, Union
+from functools import partial
+from typing import TYPE_CHECKING, Any, Union
 
 from nonebot.adapters import Bot
 from nonebot.adapters.satori.bot import Bot as SatoriBot
@@ -12,58 +13,64 @@ class SatoriTargetFetcher(TargetFetcher):
     def get_adapter(cls) -> SupportAdapter:
         return SupportAdapter.satori
 
-    async def fetch(self, bot: Bot, target: Union[Target, None] = None):
+    def fetch(self, bot: Bot, target: Union[Target, None] = None):
+        return self._walk(self.fetch_tasks(bot, target))
+
+    def fetch_tasks(self, bot: Bot, target: Union[Target, None] = None):
         if TYPE_CHECKING:
             assert isinstance(bot, SatoriBot)
+        tasks = []
         if not target or target.private:
-            friends = await bot.friend_list()
-            for friend in friends.data:
-                yield Target(
-                    str(friend.id),
-                    private=True,
-                    adapter=self.get_adapter(),
-                    platform=bot.platform,
-                    self_id=bot.self_id,
-                )
-            while friends.next:
-                friends = await bot.friend_list(next_token=friends.next)
-                for friend in friends.data:
-                    yield Target(
-                        str(friend.id),
-                        private=True,
-                        adapter=self.get_adapter(),
-                        platform=bot.platform,
-                        self_id=bot.self_id,
-                    )
+            tasks.append(partial(self._friends, bot))
         if not target or not target.private:
-            if target and target.parent_id:
-                guilds = [await bot.guild_get(guild_id=target.parent_id)]
-            else:
-                guilds = []
-                resp = await bot.guild_list()
-                guilds.extend(resp.data)
-                while resp.next:
-                    resp = await bot.guild_list(next_token=resp.next)
-                    guilds.extend(resp.data)
-            for guild in guilds:
-                channels = await bot.channel_list(guild_id=guild.id)
-                for channel in channels.data:
-                    yield Target(
-                        str(channel.id),
-                        str(guild.id),
-                        adapter=self.get_adapter(),
-                        platform=bot.platform,
-                        self_id=bot.self_id,
-                        extra={"channel_type": channel.type},
-                    )
-                while channels.next:
-                    channels = await bot.channel_list(guild_id=guild.id, next_token=channels.next)
-                    for channel in channels.data:
-                        yield Target(
-                            str(channel.id),
-                            str(guild.id),
-                            adapter=self.get_adapter(),
-                            platform=bot.platform,
-                            self_id=bot.self_id,
-                            extra={"channel_type": channel.type},
-                        )
+            tasks.append(partial(self._guilds, bot, target))
+        return tasks
+
+    async def _friends(self, bot: "SatoriBot"):
+        friends = await bot.friend_list()
+        for friend in friends.data:
+            yield self._friend_target(bot, friend)
+        while friends.next:
+            friends = await bot.friend_list(next_token=friends.next)
+            for friend in friends.data:
+                yield self._friend_target(bot, friend)
+
+    def _friend_target(self, bot: "SatoriBot", friend: Any):
+        return Target(
+            str(friend.id),
+            private=True,
+            adapter=self.get_adapter(),
+            platform=bot.platform,
+            self_id=bot.self_id,
+        )
+
+    async def _guilds(self, bot: "SatoriBot", target: Union[Target, None]):
+        if target and target.parent_id:
+            yield partial(self._channels, bot, await bot.guild_get(guild_id=target.parent_id))
+            return
+        resp = await bot.guild_list()
+        for guild in resp.data:
+            yield partial(self._channels, bot, guild)
+        while resp.next:
+            resp = await bot.guild_list(next_token=resp.next)
+            for guild in resp.data:
+                yield partial(self._channels, bot, guild)
+
+    async def _channels(self, bot: "SatoriBot", guild: Any):
+        channels = await bot.channel_list(guild_id=guild.id)
+        for channel in channels.data:
+            yield self._channel_target(bot, guild, channel)
+        while channels.next:
+            channels = await bot.channel_list(guild_id=guild.id, next_token=channels.next)
+            for channel in channels.data:
+                yield self._channel_target(bot, guild, channel)
+
+    def _channel_target(self, bot: "SatoriBot", guild: Any, channel: Any):
+        return Target(
+            str(channel.id),
+            str(guild.id),
+            adapter=self.get_adapter(),
+            platform=bot.platform,
+            self_id=bot.self_id,
+            extra={"channel_type": channel.type},
+        )
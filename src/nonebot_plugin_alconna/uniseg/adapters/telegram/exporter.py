@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Any, Union, cast
+from typing import Any, List, Union, cast
 
 from tarina import lang
 from nonebot.adapters import Bot, Event
@@ -14,6 +14,7 @@ from nonebot.adapters.telegram.message import Message as TgMessage
 from nonebot.adapters.telegram.model import Message as MessageModel
 from nonebot.adapters.telegram.event import MessageEvent, EventWithChat
 
+from nonebot_plugin_alconna.uniseg.upload import cached_media_id
 from nonebot_plugin_alconna.uniseg.constraint import SupportScope
 from nonebot_plugin_alconna.uniseg.segment import At, File, Text, Audio, Emoji, Image, Reply, Video, Voice
 from nonebot_plugin_alconna.uniseg.exporter import Target, SupportAdapter, MessageExporter, SerializeFailed, export
@@ -95,8 +96,12 @@ class TelegramMessageExporter(MessageExporter[Message]):
             "audio": TgFile.audio,
             "file": TgFile.document,
         }[name]
-        if seg.id or seg.url:
-            return method(seg.id or seg.url)
+        if seg.id:
+            return method(seg.id)
+        elif file_id := await cached_media_id(seg, bot):
+            return method(file_id)
+        elif seg.url:
+            return method(seg.url)
         elif seg.path:
             return method(Path(seg.path).read_bytes())
         elif seg.raw:
@@ -116,6 +121,18 @@ class TelegramMessageExporter(MessageExporter[Message]):
             return await bot.send(event=target, message=message)
         return await bot.send_to(target.id, message)
 
+    def get_media_ids(self, receipts: List[Any]) -> List[str]:
+        ids = []
+        for receipt in receipts:
+            if not isinstance(receipt, MessageModel):
+                continue
+            if receipt.photo:
+                # 同一张图片的多个尺寸, 最后一个为原图
+                ids.append(receipt.photo[-1].file_id)
+            elif media := receipt.video or receipt.audio or receipt.voice or receipt.document or receipt.animation:
+                ids.append(media.file_id)
+        return ids
+
     async def recall(self, mid: Any, bot: Bot, context: Union[Target, Event]):
         assert isinstance(bot, TgBot)
         _mid: MessageModel = cast(MessageModel, mid)
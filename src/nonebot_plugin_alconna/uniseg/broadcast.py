@@ -0,0 +1,123 @@
+import asyncio
+from dataclasses import field, dataclass
+from typing import Any, Set, Dict, List, Tuple, Callable, Iterable, Optional
+
+from nonebot.adapters import Bot, Message
+
+from .target import Target
+from .exporter import MessageExporter
+from .adapters import EXPORTER_MAPPING
+from .message import Receipt, UniMessage
+from .constraint import SerializeFailed, log, lang
+from .limiter import PRIORITY_BROADCAST, TokenBucket, throttle
+
+
+@dataclass
+class BroadcastResult:
+    """广播的结果"""
+
+    receipts: List[Receipt] = field(default_factory=list)
+    """发送成功的目标的回执, 回执的 context 即为对应的目标"""
+    errors: List[Tuple[Target, Exception]] = field(default_factory=list)
+    """发送失败的目标与对应的异常"""
+
+    @property
+    def total(self) -> int:
+        return len(self.receipts) + len(self.errors)
+
+
+async def broadcast(
+    message: UniMessage,
+    targets: Iterable[Target],
+    bot: Optional[Bot] = None,
+    fallback: bool = True,
+    concurrency: int = 16,
+    rate: Optional[float] = None,
+    burst: int = 1,
+    progress: Optional[Callable[[int, int], Any]] = None,
+) -> BroadcastResult:
+    """向多个目标发送同一条消息
+
+    各目标的 bot 选择与发送都受 concurrency 限制; 消息对每个 (适配器, bot) 只导出一次, 之后并发地发往各个目标;
+    取消等待该函数的任务会取消所有未完成的发送
+
+    参数:
+        message: 要发送的消息
+        targets: 发送目标
+        bot: 发送使用的 bot, 为 None 时由各个目标自行选择
+        fallback: 导出失败时是否回退为纯文本
+        concurrency: 同时进行的发送数量上限
+        rate: 每个 bot 每秒最多发送的消息数量, 为 None 时不限速
+        burst: 每个 bot 允许的瞬时突发数量
+        progress: 进度回调, 参数为已完成 (包括失败) 的目标数量与目标总数
+
+    返回:
+        各个目标的回执与异常
+    """
+    targets = list(targets)
+    result = BroadcastResult()
+    total = len(targets)
+
+    def _finish(target: Target, error: Optional[Exception] = None):
+        if error is not None:
+            result.errors.append((target, error))
+        if not progress:
+            return
+        # 进度回调出错不应中断广播或丢失已收集的结果
+        try:
+            progress(result.total, total)
+        except Exception as e:
+            log("WARNING", "Broadcast progress callback raised an exception", e)
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _select(target: Target) -> Optional[Bot]:
+        async with sem:
+            try:
+                return await target.select()
+            except Exception as e:
+                _finish(target, e)
+                return None
+
+    bots = [bot] * total if bot else await asyncio.gather(*(_select(target) for target in targets))
+    groups: Dict[Tuple[str, str], Tuple[Bot, List[Target]]] = {}
+    for target, _bot in zip(targets, bots):
+        if _bot is not None:
+            groups.setdefault((_bot.adapter.get_name(), _bot.self_id), (_bot, []))[1].append(target)
+
+    harvested: Set[Tuple[str, str]] = set()
+
+    async def _send(fn: MessageExporter, _bot: Bot, msg: Message, target: Target, bucket: Optional[TokenBucket]):
+        # 限速的等待不占用并发名额, 以免受限的 bot 阻塞其他 bot 的发送
+        if bucket:
+            await bucket.acquire()
+        await throttle(_bot, target, PRIORITY_BROADCAST)
+        async with sem:
+            try:
+                # 部分适配器会在发送时修改消息段, 因此每个目标使用一份副本
+                res = await fn.send_to(target, _bot, msg.copy())
+            except Exception as e:
+                _finish(target, e)
+                return
+            receipts = res if isinstance(res, list) else [res]
+            result.receipts.append(Receipt(_bot, target, fn, receipts))
+            _finish(target)
+            if (key := (_bot.adapter.get_name(), _bot.self_id)) not in harvested:
+                # 同一 (适配器, bot) 下各目标的资源标识相同, 只需记录一次; harvest 失败时只输出日志
+                harvested.add(key)
+                await fn.harvest(message, _bot, receipts)
+
+    tasks = []
+    for (adapter_name, _), (_bot, group) in groups.items():
+        try:
+            if not (fn := EXPORTER_MAPPING.get(adapter_name)):
+                raise SerializeFailed(lang.require("nbp-uniseg", "unsupported").format(adapter=adapter_name))
+            msg = await message.export(_bot, fallback)
+        except Exception as e:
+            for target in group:
+                _finish(target, e)
+            continue
+        bucket = TokenBucket(rate, burst) if rate else None
+        tasks.extend(_send(fn, _bot, msg, target, bucket) for target in group)
+    await asyncio.gather(*tasks)
+    return result
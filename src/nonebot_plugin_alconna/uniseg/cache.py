@@ -0,0 +1,111 @@
+import asyncio
+from copy import copy
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, TypeVar, Callable, Optional, Awaitable
+
+from tarina import LRU
+from nonebot.internal.adapter import Bot, Event, Message
+
+from .segment import Text, Reply, Segment
+
+if TYPE_CHECKING:
+    from .message import UniMessage
+
+TM = TypeVar("TM", bound=List[Segment])
+
+
+def fork(message: TM) -> TM:
+    """复制一份可安全修改的消息
+
+    消息与其中的每个消息段都会被浅复制, 消息段的子段与文本段的样式也会被复制;
+    消息段引用的其他对象 (如媒体段的 raw, 回复段的 msg) 仍与原消息共享
+    """
+    result = message.__class__.__new__(message.__class__)
+    list.extend(result, (_copy_segment(seg) for seg in list.__iter__(message)))
+    return result
+
+
+def _copy_segment(seg: Segment) -> Segment:
+    new = copy(seg)
+    if seg._children:
+        new._children = [_copy_segment(child) for child in seg._children]
+    if isinstance(seg, Text):
+        new.styles = {scale: styles[:] for scale, styles in seg.styles.items()}  # type: ignore
+    return new
+
+
+def _snapshot(message: Message) -> Tuple[Tuple[str, Dict[str, Any]], ...]:
+    # 仅浅复制 data, 未被替换的值与原消息为同一对象, 比较时开销很小
+    return tuple((seg.type, dict(seg.data)) for seg in message)
+
+
+class _Entry:
+    __slots__ = ("event", "messages", "replies")
+
+    def __init__(self, event: Event):
+        self.event = event
+        self.messages: Dict[Tuple[int, str], Tuple[Message, Tuple[Tuple[str, Dict[str, Any]], ...], UniMessage]] = {}
+        self.replies: Dict[str, asyncio.Future[Optional[Reply]]] = {}
+
+
+class MessageCache:
+    """以事件为单位缓存消息的转换结果与回复信息
+
+    同一事件下的所有 AlconnaRule 与处理函数共享一次 MessageBuilder.generate 与 extract_reply 的结果;
+    每次取出的都是副本, 修改取出的消息不会影响其他使用者
+
+    参数:
+        size: 最多缓存的事件数量
+    """
+
+    def __init__(self, size: int = 128):
+        self._entries: LRU[int, _Entry] = LRU(size)
+
+    def _entry(self, event: Event, create: bool = False) -> Optional[_Entry]:
+        entry: Optional[_Entry] = self._entries.get(id(event), None)
+        if entry is not None and entry.event is event:
+            return entry
+        if not create:
+            return None
+        self._entries[id(event)] = entry = _Entry(event)
+        return entry
+
+    def get_message(self, event: Event, message: Message, adapter: str) -> Optional["UniMessage"]:
+        """获取该事件下某条消息的转换结果副本"""
+        if not (entry := self._entry(event)):
+            return None
+        if not (cached := entry.messages.get((id(message), adapter))):
+            return None
+        origin, snapshot, result = cached
+        if origin is not message or _snapshot(message) != snapshot:
+            return None
+        return fork(result)
+
+    def set_message(self, event: Event, message: Message, adapter: str, result: "UniMessage") -> "UniMessage":
+        """缓存该事件下某条消息的转换结果, 并返回一份副本"""
+        entry = self._entry(event, create=True)
+        entry.messages[(id(message), adapter)] = (message, _snapshot(message), result)  # type: ignore
+        return fork(result)
+
+    async def get_reply(
+        self,
+        event: Event,
+        bot: Bot,
+        adapter: str,
+        fetch: Callable[[Event, Bot], Awaitable[Optional[Reply]]],
+    ) -> Optional[Reply]:
+        """获取该事件的回复信息; 同一事件的并发请求只会调用一次 fetch"""
+        entry = self._entry(event, create=True)
+        if (task := entry.replies.get(adapter)) is None:  # type: ignore
+            task = entry.replies[adapter] = asyncio.ensure_future(fetch(event, bot))  # type: ignore
+        try:
+            reply = await asyncio.shield(task)
+        except Exception:
+            entry.replies.pop(adapter, None)  # type: ignore
+            raise
+        return copy(reply) if reply else reply
+
+    def clear(self):
+        self._entries.clear()
+
+
+message_cache = MessageCache()
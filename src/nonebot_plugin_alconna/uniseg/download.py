@@ -0,0 +1,250 @@
+import re
+import time
+import uuid
+import asyncio
+import hashlib
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Set, Dict, List, Union, Optional
+
+from nonebot.adapters import Bot
+from nonebot.utils import run_sync
+from nonebot.internal.driver.model import Request
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def _header(headers: Any, name: str) -> str:
+    if not headers:
+        return ""
+    return headers.get(name) or headers.get(name.lower()) or ""
+
+
+class _Entry:
+    __slots__ = ("content", "path", "size", "etag", "last_modified", "expire")
+
+    def __init__(
+        self,
+        content: Optional[bytes],
+        path: Optional[Path],
+        size: int,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        expire: float,
+    ):
+        self.content = content
+        self.path = path
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expire = expire
+
+    async def read(self) -> Optional[bytes]:
+        if self.content is not None:
+            return self.content
+        if self.path:
+            try:
+                return await run_sync(self.path.read_bytes)()
+            except OSError:
+                return None
+        return None
+
+
+def _unlink(paths: List[Path]):
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+class DownloadCache:
+    """媒体下载的共享缓存
+
+    - 同一 URL 的并发请求会合并为一次下载; 携带 headers 或 cookies 的请求按 bot 区分, 不与其他 bot 共享
+    - 仅缓存带有 ETag、Last-Modified 或 Cache-Control: max-age 的响应, 过期后携带校验头重新请求
+    - 内存中的缓存按字节数限制大小, 超出 spill_threshold 的响应可写入磁盘, 磁盘读写在线程池中进行
+
+    参数:
+        max_bytes: 内存缓存的字节数上限
+        spill_dir: 大文件的磁盘缓存目录, 为 None 时不缓存大文件
+        spill_threshold: 超出该字节数的响应视为大文件
+        max_disk_bytes: 磁盘缓存的字节数上限
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        spill_dir: Optional[Union[str, Path]] = None,
+        spill_threshold: int = 4 * 1024 * 1024,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+    ):
+        self.max_bytes = max_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.spill_threshold = spill_threshold
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future[Any]] = {}
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._tasks: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _key(bot: Bot, url: str, kwargs: Dict[str, Any]) -> str:
+        if not kwargs:
+            return url
+        key = f"{url}\x00{sorted(kwargs.items(), key=lambda x: x[0])!r}"
+        if kwargs.get("headers") or kwargs.get("cookies"):
+            # 请求可能携带凭据, 其响应只能由同一个 bot 复用
+            key = f"{bot.adapter.get_name()}\x00{bot.self_id}\x00{key}"
+        return key
+
+    async def fetch(self, bot: Bot, url: str, **kwargs: Any) -> Any:
+        """下载 URL 的内容
+
+        参数:
+            bot: 用于发起请求的 bot
+            url: 资源地址
+            kwargs: 传递给 Request 的其他参数
+
+        返回:
+            响应内容, 与 `bot.adapter.request(...).content` 一致
+        """
+        key = self._key(bot, str(url), kwargs)
+        if (entry := self._entries.get(key)) and entry.expire > time.time():
+            if (content := await entry.read()) is not None:
+                self._entries.move_to_end(key)
+                return content
+        if (future := self._inflight.get(key)) is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    return await self.fetch(bot, url, **kwargs)
+                raise
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            content = await self._download(bot, key, str(url), dict(kwargs))
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark as retrieved
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(content)
+            return content
+        finally:
+            del self._inflight[key]
+
+    async def _download(self, bot: Bot, key: str, url: str, kwargs: Dict[str, Any]) -> Any:
+        headers = dict(kwargs.pop("headers", None) or {})
+        entry = self._entries.get(key)
+        if entry:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        resp = await bot.adapter.request(Request("GET", url, headers=headers, **kwargs))
+        if resp.status_code == 304 and entry and (content := await entry.read()) is not None:
+            entry.expire = self._expire(resp.headers)
+            self._entries.move_to_end(key)
+            return content
+        if path := self._remove(key):
+            await run_sync(_unlink)([path])
+        if resp.status_code == 200 and isinstance(resp.content, bytes):
+            await self._store(key, resp.content, resp.headers)
+        return resp.content
+
+    @staticmethod
+    def _expire(headers: Any) -> float:
+        if mat := _MAX_AGE.search(_header(headers, "Cache-Control").lower()):
+            return time.time() + int(mat[1])
+        return 0.0
+
+    async def _store(self, key: str, content: bytes, headers: Any):
+        control = _header(headers, "Cache-Control").lower()
+        if "no-store" in control:
+            return
+        etag = _header(headers, "ETag") or None
+        last_modified = _header(headers, "Last-Modified") or None
+        expire = 0.0 if "no-cache" in control else self._expire(headers)
+        if not (etag or last_modified or expire):
+            return
+        size = len(content)
+        if size > self.spill_threshold or size > self.max_bytes:
+            if not self.spill_dir or size > self.max_disk_bytes:
+                return
+            # 文件名不随 key 固定, 以免尚未完成的删除误删同一 key 新写入的文件
+            path = self.spill_dir / f"{hashlib.sha256(key.encode()).hexdigest()}-{uuid.uuid4().hex[:8]}"
+            try:
+                await run_sync(self._spill)(path, content)
+            except OSError:
+                return
+            self._entries[key] = _Entry(None, path, size, etag, last_modified, expire)
+            self._disk_bytes += size
+        else:
+            self._entries[key] = _Entry(content, None, size, etag, last_modified, expire)
+            self._memory_bytes += size
+        if paths := self._evict():
+            await run_sync(_unlink)(paths)
+
+    @staticmethod
+    def _spill(path: Path, content: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+
+    def _remove(self, key: str) -> Optional[Path]:
+        """移除条目; 条目位于磁盘时返回需要删除的文件, 由调用方在线程池中删除"""
+        if not (entry := self._entries.pop(key, None)):
+            return None
+        if entry.path:
+            self._disk_bytes -= entry.size
+            return entry.path
+        self._memory_bytes -= entry.size
+        return None
+
+    def _evict(self) -> List[Path]:
+        paths = []
+        for key in list(self._entries):
+            if self._memory_bytes <= self.max_bytes and self._disk_bytes <= self.max_disk_bytes:
+                break
+            entry = self._entries[key]
+            if entry.path and self._disk_bytes > self.max_disk_bytes:
+                paths.append(entry.path)
+                self._remove(key)
+            elif not entry.path and self._memory_bytes > self.max_bytes:
+                self._remove(key)
+        return paths
+
+    def clear(self):
+        paths = [path for key in list(self._entries) if (path := self._remove(key))]
+        if not paths:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            _unlink(paths)
+            return
+        task = loop.create_task(run_sync(_unlink)(paths))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @property
+    def size(self) -> int:
+        """当前内存缓存占用的字节数"""
+        return self._memory_bytes
+
+
+download_cache = DownloadCache()
+
+
+def apply_download_cache(cache: DownloadCache):
+    """替换全局使用的媒体下载缓存"""
+    global download_cache
+
+    download_cache.clear()
+    download_cache = cache
+
+
+async def fetch_url(bot: Bot, url: str, **kwargs: Any) -> Any:
+    """通过全局下载缓存获取 URL 的内容"""
+    return await download_cache.fetch(bot, url, **kwargs)
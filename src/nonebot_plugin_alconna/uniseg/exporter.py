@@ -1,4 +1,6 @@
+import asyncio
 import inspect
+from contextvars import ContextVar
 from abc import ABCMeta, abstractmethod
 from typing import (
     TYPE_CHECKING,
@@ -6,10 +8,12 @@ from typing import (
     Dict,
     List,
     Type,
+    Tuple,
     Union,
     Generic,
     TypeVar,
     Callable,
+    Optional,
     Awaitable,
     get_args,
     get_origin,
@@ -19,8 +23,9 @@ from tarina import lang
 from nonebot.adapters import Bot, Event, Message, MessageSegment
 
 from .target import Target as Target
-from .segment import Other, Segment, custom
-from .constraint import SupportAdapter, SerializeFailed
+from .segment import Media, Other, Segment, custom
+from .upload import learn_media_id, get_upload_cache
+from .constraint import SupportAdapter, SerializeFailed, log
 
 if TYPE_CHECKING:
     from .message import UniMessage
@@ -30,10 +35,42 @@ TS = TypeVar("TS", bound=Segment)
 TM = TypeVar("TM", bound=Message)
 
 
+_export_limit = 1
+_export_limits: Dict[str, int] = {}
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+_in_concurrent_export: ContextVar[bool] = ContextVar("_in_concurrent_export", default=False)
+
+
+def apply_export_concurrency(limit: int, bots: Optional[Dict[str, int]] = None):
+    """启用消息段的并发导出
+
+    启用后, 一条消息中的各个消息段 (如多张需要下载或上传的图片) 会被并发导出, 结果仍保持原有顺序
+
+    参数:
+        limit: 每个 bot 同时进行的消息段导出数量上限, 为 1 时即逐个导出
+        bots: 针对特定 bot (以 self_id 为键) 的数量上限
+    """
+    global _export_limit
+
+    _export_limit = max(1, limit)
+    _export_limits.clear()
+    _export_limits.update({self_id: max(1, value) for self_id, value in (bots or {}).items()})
+    _semaphores.clear()
+
+
+def _get_semaphore(bot: Bot) -> Optional[asyncio.Semaphore]:
+    limit = _export_limits.get(bot.self_id, _export_limit)
+    if limit <= 1:
+        return None
+    if (sem := _semaphores.get(bot.self_id)) is None:
+        sem = _semaphores[bot.self_id] = asyncio.Semaphore(limit)
+    return sem
+
+
 def export(
     func: Union[
         Callable[[Any, TS, Bot], Awaitable[MessageSegment]], Callable[[Any, TS, Bot], Awaitable[List[MessageSegment]]]
-    ]
+    ],
 ):
     sig = inspect.signature(func)
     func.__export_target__ = sig.parameters["seg"].annotation
@@ -74,39 +111,104 @@ class MessageExporter(Generic[TM], metaclass=ABCMeta):
                 else:
                     self._mapping[target] = method
 
+    async def _export_segment(
+        self, seg: Segment, bot: Bot, fallback: bool
+    ) -> Union[MessageSegment, List[MessageSegment], str]:
+        if isinstance(seg, Media) and seg.raw is not None and hasattr(seg.raw, "__aiter__"):
+            # 各适配器的导出均需要同步读取 raw, 因此先将异步字节流读入
+            await seg.aread()
+        seg_type = seg.__class__
+        if seg_type in self._mapping:
+            return await self._mapping[seg_type](seg, bot)
+        if res := await custom.export(self, seg, bot, fallback):
+            return res
+        if isinstance(seg, Other):
+            return seg.origin  # type: ignore
+        if fallback or bot.adapter.get_name() == SupportAdapter.nonebug:
+            return str(seg)
+        raise SerializeFailed(lang.require("nbp-uniseg", "failed").format(target=seg, adapter=bot.adapter.get_name()))
+
+    async def _export_bounded(self, sem: asyncio.Semaphore, seg: Segment, bot: Bot, fallback: bool):
+        async with sem:
+            _in_concurrent_export.set(True)
+            return await self._export_segment(seg, bot, fallback)
+
     async def export(self, source: "UniMessage", bot: Bot, fallback: bool):
         msg_type = self.get_message_type()
         message = msg_type()
-        for seg in source:
-            seg_type = seg.__class__
-            if seg_type in self._mapping:
-                res = await self._mapping[seg_type](seg, bot)
-                if isinstance(res, list):
-                    message.extend(res)
-                else:
-                    message.append(res)
-            elif res := await custom.export(self, seg, bot, fallback):
-                if isinstance(res, list):
-                    message.extend(res)
-                else:
-                    message.append(res)
-            elif isinstance(seg, Other):
-                message.append(seg.origin)  # type: ignore
-            elif fallback or bot.adapter.get_name() == SupportAdapter.nonebug:
-                message += str(seg)
+        if len(source) > 1 and not _in_concurrent_export.get() and (sem := _get_semaphore(bot)):
+            results = await asyncio.gather(
+                *(self._export_bounded(sem, seg, bot, fallback) for seg in source), return_exceptions=True
+            )
+            for res in results:
+                if isinstance(res, BaseException):
+                    raise res
+        else:
+            results = [await self._export_segment(seg, bot, fallback) for seg in source]
+        for res in results:
+            if isinstance(res, list):
+                message.extend(res)
+            elif isinstance(res, str):
+                message += res
             else:
-                raise SerializeFailed(
-                    lang.require("nbp-uniseg", "failed").format(target=seg, adapter=bot.adapter.get_name())
-                )
+                message.append(res)
         return message
 
     @abstractmethod
     async def send_to(self, target: Union[Target, Event], bot: Bot, message: Message):
         raise NotImplementedError
 
+    def get_media_ids(self, receipts: List[Any]) -> List[str]:
+        """从发送结果中按发送顺序提取平台返回的、可重复使用的资源标识
+
+        返回的数量与消息中的媒体消息段数量不一致时视为无法对应, 不会记录
+        """
+        return []
+
+    async def harvest(self, source: "UniMessage", bot: Bot, receipts: List[Any]):
+        """在启用上传结果缓存时记录发送结果中的资源标识, 之后导出相同资源时将复用该标识而不再重新传输
+
+        此时消息已经发送成功, 因此记录失败只输出日志, 不会抛出异常
+        """
+        if get_upload_cache() is None or self.__class__.get_media_ids is MessageExporter.get_media_ids:
+            return
+        try:
+            medias = [seg for seg in source if isinstance(seg, Media)]
+            if not medias or len(ids := self.get_media_ids(receipts)) != len(medias):
+                return
+            for seg, media_id in zip(medias, ids):
+                if not seg.id:
+                    await learn_media_id(seg, bot, media_id)
+        except Exception as e:
+            log("WARNING", "Failed to record media ids from send receipts", e)
+
     async def recall(self, mid: Any, bot: Bot, context: Union[Target, Event]):
         raise NotImplementedError
 
+    async def recall_many(self, items: List[Tuple[Any, Union[Target, Event]]], bot: Bot) -> List[Optional[Exception]]:
+        """批量撤回消息, 默认逐条撤回; 平台支持批量删除时可覆盖此方法
+
+        某条消息撤回失败时仍会继续撤回其余消息
+
+        参数:
+            items: (消息 id, 发送对象) 列表
+            bot: 发送这些消息的 bot
+
+        返回:
+            与 items 一一对应的结果, 撤回成功为 None, 失败为对应的异常
+        """
+        results: List[Optional[Exception]] = []
+        for mid, context in items:
+            try:
+                await self.recall(mid, bot, context)
+            except NotImplementedError:
+                raise
+            except Exception as e:
+                results.append(e)
+            else:
+                results.append(None)
+        return results
+
     async def edit(self, new: Message, mid: Any, bot: Bot, context: Union[Target, Event]):
         raise NotImplementedError
 
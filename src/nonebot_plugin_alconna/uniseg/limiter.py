@@ -0,0 +1,267 @@
+import asyncio
+from itertools import count
+from contextvars import ContextVar
+from heapq import heappop, heappush
+from typing import Any, Dict, List, Tuple, Union, Optional
+
+from nonebot.adapters import Bot, Event
+
+from .target import Target
+from .adapters import EXPORTER_MAPPING
+
+PRIORITY_REPLY = 0
+"""回复当前事件的发送"""
+PRIORITY_NORMAL = 1
+"""主动发送"""
+PRIORITY_BROADCAST = 2
+"""批量广播"""
+
+send_priority: ContextVar[Optional[int]] = ContextVar("send_priority", default=None)
+"""当前上下文中发送的优先级, 为 None 时依据发送对象决定"""
+
+
+class TokenBucket:
+    """令牌桶限速器
+
+    参数:
+        rate: 每秒补充的令牌数量
+        burst: 桶的容量, 即允许的瞬时突发数量
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated: Optional[float] = None
+
+    def _refill(self) -> float:
+        now = asyncio.get_running_loop().time()
+        if self._updated is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+    async def acquire(self):
+        """取得一个令牌, 令牌不足时等待到可用为止"""
+        self._refill()
+        # 令牌可以透支, 透支的部分即为需要等待的时间; 后续的调用会依次排在其后
+        self._tokens -= 1
+        if self._tokens < 0:
+            await asyncio.sleep(-self._tokens / self.rate)
+
+    def delay(self) -> float:
+        """距离有一个令牌可用还需等待的时间 (秒), 不消耗令牌"""
+        self._refill()
+        return max(0.0, (1 - self._tokens) / self.rate)
+
+    def take(self):
+        """消耗一个令牌, 应在 `delay` 为 0 时调用"""
+        self._tokens -= 1
+
+    def until_full(self) -> float:
+        """距离桶补满还需等待的时间 (秒); 补满的桶与新建的桶等价"""
+        self._refill()
+        return max(0.0, (self.burst - self._tokens) / self.rate)
+
+
+class _BotQueue:
+    """单个 bot 的等待队列
+
+    所有发送对象的等待者位于同一个按 (优先级, 到达顺序) 排序的堆中, 由一个 pump 依次放行
+    """
+
+    __slots__ = ("bucket", "waiters", "lanes", "pump", "wakeup")
+
+    def __init__(self, bucket: Optional[TokenBucket]):
+        self.bucket = bucket
+        self.waiters: List[Tuple[int, int, str, asyncio.Future]] = []
+        self.lanes: Dict[str, TokenBucket] = {}
+        self.pump: Optional[asyncio.Task] = None
+        self.wakeup: Optional[asyncio.Future] = None
+
+    def notify(self):
+        if self.wakeup is not None and not self.wakeup.done():
+            self.wakeup.set_result(None)
+
+    async def sleep(self, delay: float):
+        """等待 delay 秒, 期间有新的等待者到来时提前返回"""
+        self.wakeup = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self.wakeup, delay)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.wakeup = None
+
+
+class SendLimiter:
+    """按 bot 排队的发送限速器
+
+    同一 bot 下的发送按优先级 (数值越小越先) 依次放行, 同一优先级内先到先得;
+    优先级对 bot 的总限速同样有效, 某个发送对象的限速未恢复时会先放行其他发送对象的等待者
+
+    参数:
+        limits: 各适配器下每个发送对象的限速, 键为适配器名称 (可使用 SupportAdapter), 值为 (每秒消息数, 突发数量)
+        bot_limits: 各适配器下每个 bot 的总限速, 格式同上
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Tuple[float, int]]] = None,
+        bot_limits: Optional[Dict[str, Tuple[float, int]]] = None,
+    ):
+        self.limits = dict(limits or {})
+        self.bot_limits = dict(bot_limits or {})
+        self._counter = count()
+        self._bots: Dict[Tuple[str, str], _BotQueue] = {}
+        self.queued = 0
+        self.max_queued = 0
+        self.sent = 0
+        self.delayed = 0
+        self.wait_total = 0.0
+
+    async def acquire(self, bot: Bot, target: str, priority: int = PRIORITY_NORMAL):
+        """等待直到可以向 target 发送一条消息
+
+        参数:
+            bot: 发送使用的 bot
+            target: 发送对象的 id
+            priority: 优先级, 数值越小越先放行
+        """
+        adapter = bot.adapter.get_name()
+        if adapter not in self.limits and adapter not in self.bot_limits:
+            return
+        loop = asyncio.get_running_loop()
+        key = (adapter, bot.self_id)
+        if (queue := self._bots.get(key)) is None:
+            limit = self.bot_limits.get(adapter)
+            queue = self._bots[key] = _BotQueue(TokenBucket(*limit) if limit else None)
+        if (limit := self.limits.get(adapter)) and target not in queue.lanes:
+            queue.lanes[target] = TokenBucket(*limit)
+        future = loop.create_future()
+        heappush(queue.waiters, (priority, next(self._counter), target, future))
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        if queue.pump is None or queue.pump.done() or queue.pump.get_loop() is not loop:
+            queue.pump = loop.create_task(self._pump(key, queue))
+        else:
+            queue.notify()
+        start = loop.time()
+        try:
+            await future
+        finally:
+            self.queued -= 1
+        waited = loop.time() - start
+        self.sent += 1
+        self.wait_total += waited
+        if waited > 1e-3:
+            self.delayed += 1
+
+    def _next(self, queue: _BotQueue) -> Tuple[Optional[Tuple[int, int, str, asyncio.Future]], float]:
+        """取出优先级最高且其发送对象已可发送的等待者; 没有时返回最短的等待时间"""
+        deferred = []
+        picked = None
+        wait = float("inf")
+        while queue.waiters:
+            item = heappop(queue.waiters)
+            if item[3].done():
+                continue
+            bucket = queue.lanes.get(item[2])
+            if bucket is None or (delay := bucket.delay()) <= 0:
+                picked = item
+                break
+            deferred.append(item)
+            wait = min(wait, delay)
+        for item in deferred:
+            heappush(queue.waiters, item)
+        return picked, wait
+
+    async def _pump(self, key: Tuple[str, str], queue: _BotQueue):
+        while True:
+            if queue.bucket and queue.waiters and (delay := queue.bucket.delay()) > 0:
+                # 先等待 bot 的令牌再选取等待者, 以便等待期间到来的高优先级发送能够插队
+                await queue.sleep(delay)
+                continue
+            picked, wait = self._next(queue)
+            if picked is not None:
+                if queue.bucket:
+                    queue.bucket.take()
+                if (bucket := queue.lanes.get(picked[2])) is not None:
+                    bucket.take()
+                picked[3].set_result(None)
+                continue
+            if wait != float("inf"):
+                await queue.sleep(wait)
+                continue
+            # 没有等待者时移除已补满的令牌桶, 补满前的桶仍需保留以免限速被重置
+            for target in [target for target, bucket in queue.lanes.items() if not bucket.until_full()]:
+                del queue.lanes[target]
+            buckets = [*queue.lanes.values(), *([queue.bucket] if queue.bucket else [])]
+            if buckets and (idle := max(bucket.until_full() for bucket in buckets)) > 0:
+                await queue.sleep(idle)
+                continue
+            if self._bots.get(key) is queue:
+                del self._bots[key]
+            return
+
+    @property
+    def metrics(self) -> Dict[str, Any]:
+        """发送统计: queued 为当前排队数, max_queued 为排队数峰值, sent 为已放行的发送数,
+        delayed 为因限速而等待过的发送数, wait_total 为累计等待时间 (秒)"""
+        return {
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "sent": self.sent,
+            "delayed": self.delayed,
+            "wait_total": self.wait_total,
+        }
+
+
+_send_limiter: Optional[SendLimiter] = None
+
+
+def apply_send_limiter(
+    limits: Optional[Dict[str, Tuple[float, int]]] = None,
+    bot_limits: Optional[Dict[str, Tuple[float, int]]] = None,
+) -> Optional[SendLimiter]:
+    """启用发送限速, 经由 UniMessage、Receipt 与 AlconnaMatcher 的发送都会按限速排队
+
+    参数:
+        limits: 各适配器下每个发送对象的限速, 键为适配器名称, 值为 (每秒消息数, 突发数量)
+        bot_limits: 各适配器下每个 bot 的总限速, 格式同上
+
+    返回:
+        新的限速器; 两者均为空时关闭限速并返回 None
+    """
+    global _send_limiter
+
+    _send_limiter = SendLimiter(limits, bot_limits) if limits or bot_limits else None
+    return _send_limiter
+
+
+def get_send_limiter() -> Optional[SendLimiter]:
+    return _send_limiter
+
+
+async def throttle(bot: Bot, context: Union[Target, Event], priority: Optional[int] = None):
+    """在启用发送限速时等待直到可以向 context 发送消息
+
+    参数:
+        bot: 发送使用的 bot
+        context: 发送对象或事件
+        priority: 优先级, 为 None 时使用 `send_priority`, 其也为 None 时回复事件优先于主动发送
+    """
+    if _send_limiter is None:
+        return
+    if priority is None and (priority := send_priority.get()) is None:
+        priority = PRIORITY_REPLY if isinstance(context, Event) else PRIORITY_NORMAL
+    if isinstance(context, Target):
+        target = context.id
+    else:
+        try:
+            target = EXPORTER_MAPPING[bot.adapter.get_name()].get_target(context, bot).id
+        except Exception:
+            target = ""
+    await _send_limiter.acquire(bot, target, priority)
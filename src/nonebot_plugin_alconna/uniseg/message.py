@@ -1,24 +1,42 @@
-import asyncio
 from io import BytesIO
 from pathlib import Path
 from copy import deepcopy
 from types import FunctionType
 from dataclasses import dataclass
 from typing_extensions import Self, SupportsIndex
-from typing import TYPE_CHECKING, Any, List, Type, Tuple, Union, Literal, TypeVar, Iterable, Optional, overload
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    List,
+    Type,
+    Tuple,
+    Union,
+    Literal,
+    TypeVar,
+    Callable,
+    Iterable,
+    Optional,
+    overload,
+)
 
 from tarina import lang
 from nonebot.internal.adapter import Bot, Event, Message
 from nonebot.internal.matcher import current_bot, current_event
 
 from .target import Target
+from .cache import message_cache
 from .exporter import MessageExporter
 from .fallback import FallbackMessage
 from .constraint import SerializeFailed
 from .template import UniMessageTemplate
+from .limiter import PRIORITY_REPLY, throttle
 from .adapters import BUILDER_MAPPING, EXPORTER_MAPPING
 from .segment import At, File, Text, AtAll, Audio, Emoji, Hyper, Image, Reply, Video, Voice, Segment
 
+if TYPE_CHECKING:
+    from .broadcast import BroadcastResult
+    from .scheduler import ScheduledAction
+
 T = TypeVar("T")
 TS = TypeVar("TS", bound=Segment)
 TS1 = TypeVar("TS1", bound=Segment)
@@ -776,8 +794,11 @@ class UniMessage(List[TS]):
             adapter = _adapter.get_name()
         if not (fn := BUILDER_MAPPING.get(adapter)):
             raise SerializeFailed(lang.require("nbp-uniseg", "unsupported").format(adapter=adapter))
-        result = UniMessage(fn.generate(message))
-        if (event and bot) and (_reply := await fn.extract_reply(event, bot)):
+        if not event:
+            return UniMessage(fn.generate(message))
+        if (result := message_cache.get_message(event, message, adapter)) is None:
+            result = message_cache.set_message(event, message, adapter, UniMessage(fn.generate(message)))
+        if bot and (_reply := await message_cache.get_reply(event, bot, adapter, fn.extract_reply)):
             if result.has(Reply) and result.index(Reply) == 0:
                 result.pop(0)
             result.insert(0, _reply)
@@ -811,7 +832,11 @@ class UniMessage(List[TS]):
             adapter = _adapter.get_name()
         if not (fn := BUILDER_MAPPING.get(adapter)):
             raise SerializeFailed(lang.require("nbp-uniseg", "unsupported").format(adapter=adapter))
-        return UniMessage(fn.generate(message))
+        if not event:
+            return UniMessage(fn.generate(message))
+        if (result := message_cache.get_message(event, message, adapter)) is None:
+            result = message_cache.set_message(event, message, adapter, UniMessage(fn.generate(message)))
+        return result
 
     @staticmethod
     def get_message_id(event: Optional[Event] = None, bot: Optional[Bot] = None, adapter: Optional[str] = None) -> str:
@@ -913,8 +938,39 @@ class UniMessage(List[TS]):
         adapter_name = adapter.get_name()
         if not (fn := EXPORTER_MAPPING.get(adapter_name)):
             raise SerializeFailed(lang.require("nbp-uniseg", "unsupported").format(adapter=adapter_name))
+        await throttle(bot, target, PRIORITY_REPLY if reply_to else None)
         res = await fn.send_to(target, bot, msg)
-        return Receipt(bot, target, fn, res if isinstance(res, list) else [res])
+        receipts = res if isinstance(res, list) else [res]
+        await fn.harvest(self, bot, receipts)
+        return Receipt(bot, target, fn, receipts)
+
+    async def broadcast(
+        self,
+        targets: Iterable[Target],
+        bot: Optional[Bot] = None,
+        fallback: bool = True,
+        concurrency: int = 16,
+        rate: Optional[float] = None,
+        burst: int = 1,
+        progress: Optional[Callable[[int, int], Any]] = None,
+    ) -> "BroadcastResult":
+        """向多个目标发送该消息, 消息对每个 (适配器, bot) 只导出一次
+
+        参数:
+            targets: 发送目标
+            bot: 发送使用的 bot, 为 None 时由各个目标自行选择
+            fallback: 导出失败时是否回退为纯文本
+            concurrency: 同时进行的发送数量上限
+            rate: 每个 bot 每秒最多发送的消息数量, 为 None 时不限速
+            burst: 每个 bot 允许的瞬时突发数量
+            progress: 进度回调, 参数为已完成 (包括失败) 的目标数量与目标总数
+
+        返回:
+            各个目标的回执与异常
+        """
+        from .broadcast import broadcast
+
+        return await broadcast(self, targets, bot, fallback, concurrency, rate, burst, progress)
 
 
 @dataclass
@@ -947,10 +1003,16 @@ class Receipt:
             return
 
     async def recall(self, delay: float = 0, index: int = -1):
+        """撤回消息
+
+        delay 大于 0 时撤回由统一的调度器在到期时执行, 但该方法仍会等待撤回完成后才返回;
+        不希望等待时请使用 `recall_later`
+        """
         if not self.msg_ids:
             return self
         if delay > 1e-4:
-            await asyncio.sleep(delay)
+            await self.recall_later(delay, index)
+            return self
         try:
             msg_id = self.msg_ids[index]
         except IndexError:
@@ -970,10 +1032,15 @@ class Receipt:
         delay: float = 0,
         index: int = -1,
     ):
+        """编辑消息
+
+        delay 大于 0 时编辑由统一的调度器在到期时执行, 但该方法仍会等待编辑完成后才返回;
+        不希望等待时请使用 `edit_later`
+        """
         if not self.msg_ids:
             return self
         if delay > 1e-4:
-            await asyncio.sleep(delay)
+            return await self.edit_later(message, delay, index)
         message = UniMessage(message)
         msg = await self.exporter.export(message, self.bot, True)
         try:
@@ -983,6 +1050,7 @@ class Receipt:
         if not msg_id:
             return self
         try:
+            await throttle(self.bot, self.context)
             res = await self.exporter.edit(msg, msg_id, self.bot, self.context)
             if res:
                 if isinstance(res, list):
@@ -1002,8 +1070,13 @@ class Receipt:
         reply_to: Union[str, bool, Reply, None] = False,
         delay: float = 0,
     ):
+        """向同一对象发送消息
+
+        delay 大于 0 时发送由统一的调度器在到期时执行, 但该方法仍会等待发送完成后才返回;
+        不希望等待时请使用 `send_later`
+        """
         if delay > 1e-4:
-            await asyncio.sleep(delay)
+            return await self.send_later(message, delay, fallback, at_sender, reply_to)
         message = UniMessage(message)
         if at_sender:
             if isinstance(at_sender, str):
@@ -1023,8 +1096,11 @@ class Receipt:
                         raise TypeError("reply_to must be str when target is not Event")
                 self.insert(0, Reply(reply_to))  # type: ignore
         msg = await self.exporter.export(message, self.bot, fallback)
+        await throttle(self.bot, self.context, PRIORITY_REPLY if reply_to else None)
         res = await self.exporter.send_to(self.context, self.bot, msg)
-        self.msg_ids.extend(res if isinstance(res, list) else [res])
+        receipts = res if isinstance(res, list) else [res]
+        await self.exporter.harvest(message, self.bot, receipts)
+        self.msg_ids.extend(receipts)
         return self
 
     async def reply(
@@ -1036,3 +1112,55 @@ class Receipt:
         delay: float = 0,
     ):
         return await self.send(message, fallback, at_sender, self.get_reply(index), delay)
+
+    def recall_later(self, delay: float, index: int = -1) -> "ScheduledAction":
+        """在 delay 秒后撤回消息
+
+        与 `recall(delay=...)` 不同, 该方法立即返回, 不等待撤回完成
+
+        参数:
+            delay: 延时 (秒)
+            index: 要撤回的消息在 msg_ids 中的索引
+
+        返回:
+            可用于取消或等待该操作的对象
+        """
+        from .scheduler import action_scheduler
+
+        try:
+            msg_id = self.msg_ids[index]
+        except IndexError:
+            msg_id = self.msg_ids[0] if self.msg_ids else None
+        return action_scheduler.schedule(delay, "recall", self, msg_id)
+
+    def edit_later(
+        self,
+        message: Union[UniMessage, str, Iterable[Union[str, Segment]], Segment],
+        delay: float,
+        index: int = -1,
+    ) -> "ScheduledAction":
+        """在 delay 秒后编辑消息, 立即返回
+
+        返回:
+            可用于取消或等待该操作的对象
+        """
+        from .scheduler import action_scheduler
+
+        return action_scheduler.schedule(delay, "edit", self, message, index)
+
+    def send_later(
+        self,
+        message: Union[UniMessage, str, Iterable[Union[str, Segment]], Segment],
+        delay: float,
+        fallback: bool = True,
+        at_sender: Union[str, bool] = False,
+        reply_to: Union[str, bool, Reply, None] = False,
+    ) -> "ScheduledAction":
+        """在 delay 秒后向同一对象发送消息, 立即返回
+
+        返回:
+            可用于取消或等待该操作的对象
+        """
+        from .scheduler import action_scheduler
+
+        return action_scheduler.schedule(delay, "send", self, message, fallback, at_sender, reply_to)
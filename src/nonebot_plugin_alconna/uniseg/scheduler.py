@@ -0,0 +1,322 @@
+import json
+import time
+import asyncio
+from pathlib import Path
+from itertools import count
+from heapq import heappop, heappush
+from typing import TYPE_CHECKING, Any, Set, Dict, List, Tuple, Union, Optional
+
+from nonebot import get_bot, get_driver
+from nonebot.adapters import Bot, Event
+
+from .target import Target
+from .constraint import log
+from .exporter import MessageExporter
+from .adapters import EXPORTER_MAPPING
+
+if TYPE_CHECKING:
+    from .message import Receipt
+
+
+class ScheduledAction:
+    """一个延时执行的撤回/编辑/发送操作
+
+    可通过 `cancel` 取消; 等待该对象可得到操作的结果 (撤回为 None, 编辑与发送为对应的 Receipt)
+    """
+
+    __slots__ = ("when", "deadline", "kind", "receipt", "args", "future", "cancelled")
+
+    def __init__(self, when: float, deadline: float, kind: str, receipt: "Receipt", args: Tuple[Any, ...]):
+        self.when = when
+        self.deadline = deadline
+        self.kind = kind
+        self.receipt = receipt
+        self.args = args
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.future.add_done_callback(self._on_done)
+        self.cancelled = False
+
+    def _on_done(self, future: asyncio.Future):
+        if future.cancelled():
+            # 等待者被取消时 future 也随之取消, 此时操作不应再执行
+            self.cancelled = True
+        else:
+            # 失败已记录在日志中, 没有等待者时不应再报告未取得的异常
+            future.exception()
+
+    def cancel(self) -> bool:
+        """取消该操作, 已执行或已取消时返回 False"""
+        if self.cancelled or self.future.done():
+            return False
+        self.cancelled = True
+        self.future.cancel()
+        return True
+
+    @property
+    def done(self) -> bool:
+        return self.future.done()
+
+    def __await__(self):
+        return self.future.__await__()
+
+
+class ActionScheduler:
+    """延时操作的调度器
+
+    所有延时操作存放在一个以执行时间排序的最小堆中, 任意时刻只有一个 `call_at` 句柄指向最早的操作;
+    同一时刻到期的撤回会按 (适配器, bot) 合并, 交由 `MessageExporter.recall_many` 批量执行
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, ScheduledAction]] = []
+        self._counter = count()
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self):
+        return sum(1 for _, _, action in self._heap if not action.cancelled)
+
+    def schedule(self, delay: float, kind: str, receipt: "Receipt", *args: Any) -> ScheduledAction:
+        """在 delay 秒后执行操作
+
+        参数:
+            delay: 延时 (秒)
+            kind: 操作类型, 为 recall, edit 或 send
+            receipt: 操作所属的回执
+            args: 操作的参数; recall 为 (消息 id,), edit 为 (消息, 索引), send 为 Receipt.send 的参数
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # 事件循环更换后旧的句柄与条目已无意义, 其等待者也不会再得到结果
+            for _, _, action in self._heap:
+                action.cancelled = True
+                if not action.future.done() and not action.future.get_loop().is_closed():
+                    action.future.cancel()
+            self._heap.clear()
+            self._handle = None
+            self._loop = loop
+        action = ScheduledAction(loop.time() + max(0.0, delay), time.time() + max(0.0, delay), kind, receipt, args)
+        heappush(self._heap, (action.when, next(self._counter), action))
+        self._arm()
+        return action
+
+    def _arm(self):
+        while self._heap and self._heap[0][2].cancelled:
+            heappop(self._heap)
+        if not self._heap or not self._loop:
+            if self._handle:
+                self._handle.cancel()
+                self._handle = None
+            return
+        when = self._heap[0][0]
+        if self._handle and self._handle.when() <= when:
+            return
+        if self._handle:
+            self._handle.cancel()
+        self._handle = self._loop.call_at(when, self._fire)
+
+    def _fire(self):
+        self._handle = None
+        now = self._loop.time()  # type: ignore
+        due: List[ScheduledAction] = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, action = heappop(self._heap)
+            if not action.cancelled:
+                due.append(action)
+        if due:
+            task = self._loop.create_task(self._run(due))  # type: ignore
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self._arm()
+
+    async def _run(self, actions: List[ScheduledAction]):
+        recalls: Dict[Tuple[int, str], List[ScheduledAction]] = {}
+        others = []
+        requeued: Set[int] = set()
+        for action in actions:
+            if action.kind != "recall":
+                others.append(self._execute(action))
+                continue
+            if not action.args[0]:
+                if not action.future.done():
+                    action.future.set_result(None)
+                continue
+            try:
+                key = (id(action.receipt.exporter), action.receipt.bot.self_id)
+            except LookupError as e:
+                # 从文件恢复的撤回到期时 bot 可能尚未连接, 每 5 秒重试一次, 一分钟后放弃
+                if isinstance(action.receipt, _DetachedReceipt) and action.receipt.attempts < 12:
+                    action.receipt.attempts += 1
+                    action.when = self._loop.time() + 5  # type: ignore
+                    heappush(self._heap, (action.when, next(self._counter), action))
+                    self._arm()
+                    requeued.add(id(action))
+                    continue
+                log("WARNING", "Bot of scheduled recall is not available, dropped", e)
+                action.future.set_exception(e)
+                continue
+            recalls.setdefault(key, []).append(action)
+        try:
+            await asyncio.gather(*(self._recall(group) for group in recalls.values()), *others)
+        finally:
+            # 执行被中断时也不应让等待者一直等待
+            for action in actions:
+                if id(action) not in requeued and not action.future.done():
+                    action.future.cancel()
+
+    async def _execute(self, action: ScheduledAction):
+        try:
+            if action.kind == "edit":
+                message, index = action.args
+                result = await action.receipt.edit(message, 0, index)
+            else:
+                result = await action.receipt.send(*action.args)
+        except Exception as e:
+            log("WARNING", f"Scheduled {action.kind} failed", e)
+            if not action.future.done():
+                action.future.set_exception(e)
+        else:
+            if not action.future.done():
+                action.future.set_result(result)
+
+    async def _recall(self, actions: List[ScheduledAction]):
+        receipt = actions[0].receipt
+        try:
+            errors = await receipt.exporter.recall_many([(a.args[0], a.receipt.context) for a in actions], receipt.bot)
+        except NotImplementedError:
+            for action in actions:
+                if not action.future.done():
+                    action.future.set_result(None)
+            return
+        except Exception as e:
+            errors = [e] * len(actions)
+        # 每个操作按各自消息的撤回结果完成
+        for action, error in zip(actions, errors):
+            if error:
+                log("WARNING", "Scheduled recall failed", error)
+            elif action.args[0] in action.receipt.msg_ids:
+                action.receipt.msg_ids.remove(action.args[0])
+            if action.future.done():
+                continue
+            if error:
+                action.future.set_exception(error)
+            else:
+                action.future.set_result(None)
+
+    def save(self, path: Union[str, Path]) -> int:
+        """将尚未执行的撤回写入文件, 以便重启后通过 `load` 恢复
+
+        编辑与发送依赖于内存中的消息对象, 不会被保存
+
+        返回:
+            写入的撤回数量
+        """
+        entries = []
+        for _, _, action in self._heap:
+            if action.cancelled or action.kind != "recall":
+                continue
+            receipt = action.receipt
+            context = receipt.context
+            try:
+                if isinstance(context, Event):
+                    context = receipt.exporter.get_target(context, receipt.bot)
+                entry = {
+                    "kind": action.kind,
+                    "due": action.deadline,
+                    "adapter": receipt.bot.adapter.get_name(),
+                    "self_id": receipt.bot.self_id,
+                    "target": context.dump(),
+                    "message": action.args[0],
+                }
+                # 无法以 JSON 表示的消息 id 或目标无法恢复, 在此处跳过
+                json.dumps(entry)
+            except Exception as e:
+                log("DEBUG", "Skip persisting scheduled recall", e)
+                continue
+            entries.append(entry)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(entries, ensure_ascii=False), encoding="utf-8")
+        return len(entries)
+
+    def load(self, path: Union[str, Path]) -> int:
+        """读取 `save` 写入的撤回并重新调度, 读取后文件会被删除
+
+        到期时对应的 bot 尚未连接的撤回将被丢弃
+
+        返回:
+            恢复的撤回数量
+        """
+        path = Path(path)
+        if not path.exists():
+            return 0
+        try:
+            entries = json.loads(path.read_text(encoding="utf-8"))
+        except ValueError as e:
+            log("WARNING", f"Invalid scheduled action file {path}, ignored", e)
+            entries = []
+        path.unlink()
+        now = time.time()
+        restored = 0
+        for entry in entries if isinstance(entries, list) else []:
+            try:
+                if entry["kind"] != "recall":
+                    continue
+                mid = entry["message"]
+                receipt = _DetachedReceipt(entry["adapter"], entry["self_id"], Target.load(entry["target"]), mid)
+                self.schedule(entry["due"] - now, "recall", receipt, mid)  # type: ignore
+            except (KeyError, TypeError) as e:
+                log("DEBUG", "Skip malformed scheduled recall", e)
+                continue
+            restored += 1
+        return restored
+
+
+class _DetachedReceipt:
+    """从文件恢复的撤回所用的回执, bot 在执行时才查找"""
+
+    def __init__(self, adapter: str, self_id: str, context: Target, mid: Any):
+        self.adapter = adapter
+        self.self_id = self_id
+        self.context = context
+        self.msg_ids = [mid]
+        self.attempts = 0
+
+    @property
+    def bot(self) -> Bot:
+        return get_bot(self.self_id)
+
+    @property
+    def exporter(self) -> MessageExporter:
+        return EXPORTER_MAPPING[self.adapter]
+
+
+action_scheduler = ActionScheduler()
+
+
+_persist_path: Optional[Path] = None
+
+
+def apply_action_persistence(path: Union[str, Path] = "data/alconna/scheduled_actions.json"):
+    """启用延时撤回的持久化: 关闭时将尚未执行的撤回写入 path, 启动时读取并重新调度
+
+    参数:
+        path: 保存文件的路径
+    """
+    global _persist_path
+
+    if _persist_path is not None:
+        _persist_path = Path(path)
+        return
+    _persist_path = Path(path)
+    driver = get_driver()
+
+    @driver.on_startup
+    async def _():
+        if restored := action_scheduler.load(_persist_path):  # type: ignore
+            log("DEBUG", f"restored {restored} scheduled recall(s)")
+
+    @driver.on_shutdown
+    async def _():
+        action_scheduler.save(_persist_path)  # type: ignore
@@ -8,6 +8,7 @@ from pathlib import Path
 from datetime import datetime
 from urllib.parse import urlparse
 from typing_extensions import Self
+from bisect import bisect_left, bisect_right
 from dataclasses import field, asdict, dataclass
 from typing import (
     TYPE_CHECKING,
@@ -19,20 +20,27 @@ from typing import (
     Union,
     Literal,
     TypeVar,
+    BinaryIO,
     Callable,
     ClassVar,
     Iterable,
+    Iterator,
     Optional,
     Protocol,
     Awaitable,
+    AsyncIterable,
+    AsyncIterator,
     overload,
 )
 
+from nonebot.utils import run_sync
 from nonebot.compat import custom_validation
 from nonebot.internal.adapter import Bot, Message, MessageSegment
 from nepattern import MatchMode, BasePattern, create_local_patterns
 
 from .utils import fleep
+from .upload import cached_to_url
+from .constraint import SerializeFailed
 
 if TYPE_CHECKING:
     from .message import UniMessage
@@ -42,6 +50,7 @@ if TYPE_CHECKING:
 
 TS = TypeVar("TS", bound="Segment")
 TS1 = TypeVar("TS1", bound="Segment")
+CHUNK_SIZE = 64 * 1024
 
 
 @custom_validation
@@ -199,6 +208,50 @@ STYLE_TYPE_MAP = {
 }
 
 
+def _is_merged(styles: Dict[Tuple[int, int], List[str]]) -> bool:
+    """判断样式区间是否已经有序、互不重叠, 且相邻区间的样式不同"""
+    last_end = None
+    last: Optional[List[str]] = None
+    for (start, end), _styles in styles.items():
+        if start >= end or not _styles or len(set(_styles)) != len(_styles):
+            return False
+        if last_end is not None and (start < last_end or (start == last_end and _styles == last)):
+            return False
+        last_end, last = end, _styles
+    return True
+
+
+def _merge_spans(spans: List[Tuple[Tuple[int, int], List[str]]]) -> List[Tuple[Tuple[int, int], List[str]]]:
+    """将可能重叠的样式区间合并为有序且互不重叠的区间
+
+    重叠部分的样式按区间在 spans 中的先后顺序合并, 样式相同的相邻区间会合为一个区间
+    """
+    bounds: Dict[int, Tuple[List[int], List[int]]] = {}
+    for index, ((start, end), _) in enumerate(spans):
+        if start < end:
+            bounds.setdefault(start, ([], []))[0].append(index)
+            bounds.setdefault(end, ([], []))[1].append(index)
+    result: List[Tuple[Tuple[int, int], List[str]]] = []
+    active: Dict[int, List[str]] = {}
+    points = sorted(bounds)
+    for left, right in zip(points, points[1:]):
+        enter, leave = bounds[left]
+        for index in leave:
+            del active[index]
+        for index in enter:
+            active[index] = spans[index][1]
+        current: List[str] = []
+        for index in sorted(active):
+            current.extend(sty for sty in active[index] if sty not in current)
+        if not current:
+            continue
+        if result and result[-1][0][1] == left and result[-1][1] == current:
+            result[-1] = ((result[-1][0][0], right), current)
+        else:
+            result.append(((left, right), current))
+    return result
+
+
 @dataclass
 class Text(Segment):
     """Text对象, 表示一类文本元素"""
@@ -213,42 +266,24 @@ class Text(Segment):
         return True
 
     def __merge__(self):
-        data = {}
         styles = self.styles
-        if not styles:
+        if not styles or _is_merged(styles):
             return
-        for scale, _styles in styles.items():
-            for i in range(*scale):
-                if i not in data:
-                    data[i] = _styles[:]
-                else:
-                    data[i].extend(s for s in _styles if s not in data[i])
+        merged = _merge_spans(list(styles.items()))
         styles.clear()
-        data1: dict[str, list] = {}
-        for i, _styles in data.items():
-            key = "\x01".join(_styles)
-            data1.setdefault(key, []).append(i)
-        data.clear()
-        for key, indexes in data1.items():
-            start = indexes[0]
-            end = start
-            for i in indexes[1:]:
-                if i - end == 1:
-                    end = i
-                else:
-                    data[(start, end + 1)] = key.split("\x01")
-                    start = end = i
-            if end >= start:
-                data[(start, end + 1)] = key.split("\x01")
-        for scale in sorted(data.keys()):
-            styles[scale] = data[scale]
+        styles.update(merged)
 
     def mark(self, start: int, end: int, *styles: str):
-        _styles = self.styles.setdefault((start, end), [])
-        for sty in styles:
-            if sty not in _styles:
-                _styles.append(sty)
         self.__merge__()
+        if start >= end or not styles:
+            return self
+        items = list(self.styles.items())
+        # 已合并的区间互不重叠且按起点排序, 只需重新合并与 [start, end] 相交或相邻的部分
+        lo = bisect_left([scale[1] for scale, _ in items], start)
+        hi = bisect_right([scale[0] for scale, _ in items], end)
+        merged = _merge_spans([*items[lo:hi], ((start, end), list(styles))])
+        self.styles.clear()
+        self.styles.update([*items[:lo], *merged, *items[hi:]])
         return self
 
     def __str__(self) -> str:
@@ -353,10 +388,16 @@ class MediaToUrl(Protocol):
 
 @dataclass
 class Media(Segment):
+    """媒体消息段的基类
+
+    raw 可以是二进制数据、文件对象或异步字节流; 导出时异步字节流会先被完整读入,
+    目前仅 Feishu 适配器以文件对象的形式流式上传, 其他适配器仍会在导出时读入完整数据
+    """
+
     id: Optional[str] = field(default=None)
     url: Optional[str] = field(default=None)
     path: Optional[Union[str, Path]] = field(default=None)
-    raw: Optional[Union[bytes, BytesIO]] = field(default=None)
+    raw: Optional[Union[bytes, BytesIO, BinaryIO, AsyncIterable[bytes]]] = field(default=None)
     mimetype: Optional[str] = field(default=None)
     name: str = field(default="media")
 
@@ -369,17 +410,120 @@ class Media(Segment):
         if self.url and not urlparse(self.url).hostname:
             self.url = f"https://{self.url}"
 
-    @property
-    def raw_bytes(self) -> bytes:
-        if not self.raw:
-            raise ValueError(f"{self} has no raw data")
-        raw = self.raw.getvalue() if isinstance(self.raw, BytesIO) else self.raw
-        header = raw[:128]
+    def read_header(self, size: int = 128) -> bytes:
+        """读取 raw 或 path 开头的若干字节, 不会读取整个资源"""
+        raw = self.raw
+        if isinstance(raw, bytes):
+            return raw[:size]
+        if isinstance(raw, BytesIO):
+            with raw.getbuffer() as buffer:
+                return bytes(buffer[:size])
+        if raw is not None and hasattr(raw, "read"):
+            if not raw.seekable():  # type: ignore
+                return b""
+            pos = raw.tell()  # type: ignore
+            header = raw.read(size)  # type: ignore
+            raw.seek(pos)  # type: ignore
+            return header
+        if raw is None and self.path:
+            with open(self.path, "rb") as f:
+                return f.read(size)
+        return b""
+
+    def sniff(self) -> None:
+        """根据资源开头的字节推断 mimetype 与 name; 同一资源只会推断一次"""
+        source = self.path if self.raw is None else self.raw
+        if source is None or getattr(self, "_sniffed", None) is source:
+            return
+        if not (header := self.read_header()):
+            return
         info = fleep.get(header)
         self.mimetype = info.mimes[0] if info.mimes else self.mimetype
         if info.types and info.extensions:
             self.name = f"{info.types[0]}.{info.extensions[0]}"
-        return raw
+        self._sniffed = source
+
+    @property
+    def raw_bytes(self) -> bytes:
+        if not self.raw:
+            raise ValueError(f"{self} has no raw data")
+        self.sniff()
+        raw = self.raw
+        if isinstance(raw, bytes):
+            return raw
+        if isinstance(raw, BytesIO):
+            return raw.getvalue()
+        if hasattr(raw, "read"):
+            if not raw.seekable():  # type: ignore
+                self.raw = raw.read()  # type: ignore
+                self.sniff()
+                return self.raw  # type: ignore
+            pos = raw.tell()  # type: ignore
+            data = raw.read()  # type: ignore
+            raw.seek(pos)  # type: ignore
+            return data
+        raise SerializeFailed(f"{self} holds an async stream, use `await {self.__class__.__name__}.aread()` instead")
+
+    def iter_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """按块读取 raw 或 path 中的数据, 不会一次性读入整个资源"""
+        raw = self.raw
+        if isinstance(raw, (bytes, BytesIO)):
+            with memoryview(raw) if isinstance(raw, bytes) else raw.getbuffer() as buffer:
+                for start in range(0, len(buffer), chunk_size):
+                    yield bytes(buffer[start : start + chunk_size])
+            return
+        if raw is not None and hasattr(raw, "read"):
+            while chunk := raw.read(chunk_size):  # type: ignore
+                yield chunk
+            return
+        if raw is None and self.path:
+            with open(self.path, "rb") as f:
+                while chunk := f.read(chunk_size):
+                    yield chunk
+            return
+        if raw is None:
+            raise ValueError(f"{self} has no raw data")
+        raise ValueError(f"{self} holds an async stream, use `{self.__class__.__name__}.aiter_chunks()` instead")
+
+    async def aiter_chunks(self, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """按块异步读取 raw 或 path 中的数据, 支持异步迭代器形式的 raw"""
+        if self.raw is not None and hasattr(self.raw, "__aiter__"):
+            async for chunk in self.raw:  # type: ignore
+                yield chunk
+            return
+        for chunk in self.iter_chunks(chunk_size):
+            yield chunk
+
+    async def aread(self) -> bytes:
+        """读取完整的资源数据; 若 raw 为异步迭代器, 读取后会以 bytes 形式保存在 raw 中"""
+        if self.raw is not None and hasattr(self.raw, "__aiter__"):
+            self.raw = b"".join([chunk async for chunk in self.aiter_chunks()])
+        if self.raw is None and self.path:
+            return await run_sync(Path(self.path).read_bytes)()
+        return self.raw_bytes
+
+    @contextlib.contextmanager
+    def open(self) -> Iterator[BinaryIO]:
+        """以文件对象的形式打开 raw 或 path, 便于以流的方式上传"""
+        raw = self.raw
+        if isinstance(raw, bytes):
+            yield BytesIO(raw)
+        elif raw is not None and hasattr(raw, "read"):
+            if not raw.seekable():  # type: ignore
+                yield raw  # type: ignore
+                return
+            pos = raw.tell()  # type: ignore
+            try:
+                yield raw  # type: ignore
+            finally:
+                raw.seek(pos)  # type: ignore
+        elif raw is None and self.path:
+            with open(self.path, "rb") as f:
+                yield f
+        elif raw is None:
+            raise ValueError(f"{self} has no raw data")
+        else:
+            raise ValueError(f"{self} holds an async stream, use `await {self.__class__.__name__}.aread()` first")
 
 
 @dataclass
@@ -555,7 +699,7 @@ class _CustomMounter:
             func: Union[
                 Callable[["MessageExporter", TS, Bot, bool], Awaitable[Optional[MessageSegment]]],
                 Callable[["MessageExporter", TS, Bot, bool], Awaitable[List[MessageSegment]]],
-            ]
+            ],
         ):
             cls.EXPORTERS[custom_type] = func  # type: ignore
             return func
@@ -584,4 +728,4 @@ env[Segment] = BasePattern(
 
 def apply_media_to_url(func: MediaToUrl):
     """为 Media 对象设置 to_url 方法，用于将文件或数据上传到文件服务器并返回 URL"""
-    Media.to_url = func
+    Media.to_url = cached_to_url(func)
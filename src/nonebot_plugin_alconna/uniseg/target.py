@@ -1,7 +1,21 @@
+import asyncio
 from datetime import datetime
 from functools import partial
 from abc import ABCMeta, abstractmethod
-from typing import TYPE_CHECKING, Any, Set, Dict, List, Type, Union, Callable, Awaitable, AsyncIterator
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Set,
+    Dict,
+    List,
+    Type,
+    Union,
+    Callable,
+    Iterable,
+    Optional,
+    Awaitable,
+    AsyncIterator,
+)
 
 from nonebot.adapters import Bot, Adapter, Message
 
@@ -257,7 +271,14 @@ class Target:
         return f"Target({self.dump()})"
 
 
+FetchTask = Callable[[], AsyncIterator[Union[Target, "FetchTask"]]]
+"""拉取任务: 调用后得到一个异步迭代器, 其产出发送对象或需要额外执行的拉取任务 (例如某个群组下的频道列表)"""
+
+
 class TargetFetcher(metaclass=ABCMeta):
+    concurrency: int = 4
+    """同一 bot 下同时执行的拉取任务数量上限"""
+
     def __init__(self) -> None:
         self.cache: Dict[str, Set[Target]] = {}
         self.last_refresh: Dict[str, datetime] = {}
@@ -269,13 +290,85 @@ class TargetFetcher(metaclass=ABCMeta):
     @abstractmethod
     def fetch(self, bot: Bot, target: Union[Target, None] = None) -> AsyncIterator[Target]: ...
 
+    def fetch_tasks(self, bot: Bot, target: Union[Target, None] = None) -> Optional[Iterable[FetchTask]]:
+        """将拉取拆分为可并发执行的任务; 返回 None 时使用 `fetch` 依次拉取"""
+        return None
+
+    async def _walk(self, tasks: Iterable[FetchTask]) -> AsyncIterator[Target]:
+        for task in tasks:
+            async for item in task():
+                if isinstance(item, Target):
+                    yield item
+                else:
+                    async for tg in self._walk([item]):
+                        yield tg
+
+    async def fetch_all(self, bot: Bot, target: Union[Target, None] = None) -> AsyncIterator[Target]:
+        """拉取发送对象; 若提供了 `fetch_tasks`, 各个任务以至多 `concurrency` 的并发执行, 产出顺序不作保证
+
+        任一任务失败或被取消时, 其余任务会被取消, 异常向外抛出
+        """
+        if (tasks := self.fetch_tasks(bot, target)) is None:
+            async for tg in self.fetch(bot, target):
+                yield tg
+            return
+        sem = asyncio.Semaphore(max(1, self.concurrency))
+        queue: asyncio.Queue[Union[Target, BaseException, None]] = asyncio.Queue()
+        pending: Set[asyncio.Task] = set()
+
+        async def _run(task: FetchTask):
+            async with sem:
+                async for item in task():
+                    if isinstance(item, Target):
+                        queue.put_nowait(item)
+                    else:
+                        _spawn(item)
+
+        def _done(task: asyncio.Task):
+            pending.discard(task)
+            if task.cancelled():
+                # 被消费者以外取消时结果已不完整, 需以异常结束拉取, 否则消费者会一直等待
+                queue.put_nowait(asyncio.CancelledError())
+                return
+            if exc := task.exception():
+                queue.put_nowait(exc)
+            elif not pending:
+                # 子任务在父任务结束前就已加入 pending, 因此 pending 为空即表示全部完成
+                queue.put_nowait(None)
+
+        def _spawn(task: FetchTask):
+            _task = asyncio.create_task(_run(task))
+            pending.add(_task)
+            _task.add_done_callback(_done)
+
+        for task in tasks:
+            _spawn(task)
+        if not pending:
+            return
+        try:
+            while (item := await queue.get()) is not None:
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            for _task in pending:
+                _task.cancel()
+
     async def refresh(self, bot: Bot, target: Union[Target, None] = None):
-        if bot.self_id in self.cache:
-            del self.cache[bot.self_id]
+        """拉取发送对象并合并进缓存
+
+        拉取期间缓存保持可用; 仅在完整拉取 (target 为 None) 成功后才移除不再存在的发送对象
+        """
         self.last_refresh[bot.self_id] = datetime.now()
         _cache = self.cache.setdefault(bot.self_id, set())
-        async for tg in self.fetch(bot, target):
+        seen: Set[Target] = set()
+        async for tg in self.fetch_all(bot, target):
+            # 相等的发送对象也可能带有新的 extra, 因此替换旧的对象
+            _cache.discard(tg)
             _cache.add(tg)
+            seen.add(tg)
+        if target is None:
+            _cache.intersection_update(seen)
 
     def get_selector(self, bot: Bot):
         async def _check(target: Target):
@@ -293,11 +386,11 @@ class TargetFetcher(metaclass=ABCMeta):
             now = datetime.now()
             if bot.self_id in self.last_refresh and (now - self.last_refresh[bot.self_id]).seconds < 600:
                 return False
-            self.cache.pop(bot.self_id, None)
             _cache = self.cache.setdefault(bot.self_id, set())
             self.last_refresh[bot.self_id] = now
             count = 0
-            async for tg in self.fetch(bot, target):
+            async for tg in self.fetch_all(bot, target):
+                _cache.discard(tg)
                 _cache.add(tg)
                 if target.verify(tg):
                     count += 1
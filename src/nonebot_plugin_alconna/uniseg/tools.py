@@ -8,10 +8,11 @@ from nonebot import get_bots
 from nonebot.typing import T_State
 from nonebot import get_bot as _get_bot
 from nonebot.exception import ActionFailed
-from nonebot.internal.driver.model import Request
 from nonebot.internal.adapter import Bot, Event, Adapter
 
 from .segment import Image
+from .download import fetch_url
+from .cache import message_cache
 
 
 async def reply_fetch(event: Event, bot: Bot):
@@ -21,7 +22,7 @@ async def reply_fetch(event: Event, bot: Bot):
     adapter = _adapter.get_name()
     if not (fn := BUILDER_MAPPING.get(adapter)):
         return
-    return await fn.extract_reply(event, bot)
+    return await message_cache.get_reply(event, bot, adapter, fn.extract_reply)
 
 
 async def image_fetch(event: Event, bot: Bot, state: T_State, img: Image, **kwargs):
@@ -38,9 +39,7 @@ async def image_fetch(event: Event, bot: Bot, state: T_State, img: Image, **kwar
         return await origin.download(bot)
 
     if img.url:  # mirai2, qqguild, kook, villa, minecraft, ding
-        req = Request("GET", img.url, **kwargs)
-        resp = await bot.adapter.request(req)
-        return resp.content
+        return await fetch_url(bot, img.url, **kwargs)
     if not img.id:
         return None
     if adapter_name == "OneBot V11":
@@ -49,9 +48,7 @@ async def image_fetch(event: Event, bot: Bot, state: T_State, img: Image, **kwar
 
             assert isinstance(bot, Bot)
         url = (await bot.get_image(file=img.id))["data"]["url"]
-        req = Request("GET", url, **kwargs)
-        resp = await bot.adapter.request(req)
-        return resp.content
+        return await fetch_url(bot, url, **kwargs)
     if adapter_name == "OneBot V12":
         if TYPE_CHECKING:
             from nonebot.adapters.onebot.v12.bot import Bot
@@ -61,9 +58,7 @@ async def image_fetch(event: Event, bot: Bot, state: T_State, img: Image, **kwar
         return b64decode(resp) if isinstance(resp, str) else bytes(resp)
     if adapter_name == "mirai2":
         url = f"https://gchat.qpic.cn/gchatpic_new/0/0-0-" f"{img.id.replace('-', '').upper()}/0"
-        req = Request("GET", url, **kwargs)
-        resp = await bot.adapter.request(req)
-        return resp.content
+        return await fetch_url(bot, url, **kwargs)
     if adapter_name == "Telegram":
         if TYPE_CHECKING:
             from nonebot.adapters.telegram.bot import Bot
@@ -75,9 +70,7 @@ async def image_fetch(event: Event, bot: Bot, state: T_State, img: Image, **kwar
         if (p := Path(res.file_path)).exists():  # telegram api local mode
             return p.read_bytes()
         url = URL(bot.bot_config.api_server) / "file" / f"bot{bot.bot_config.token}" / res.file_path
-        req = Request("GET", url, **kwargs)
-        resp = await bot.adapter.request(req)
-        return resp.content
+        return await fetch_url(bot, url, **kwargs)
     if adapter_name == "Feishu":
         if TYPE_CHECKING:
             from nonebot.adapters.feishu.bot import Bot
@@ -0,0 +1,285 @@
+import time
+import hashlib
+import sqlite3
+import threading
+from io import BytesIO
+from pathlib import Path
+from collections import OrderedDict
+from abc import ABCMeta, abstractmethod
+from typing import TYPE_CHECKING, Any, Tuple, Union, Callable, Optional, Awaitable
+
+from nonebot.adapters import Bot
+from nonebot.utils import run_sync
+
+if TYPE_CHECKING:
+    from .segment import Media
+
+
+class UploadCache(metaclass=ABCMeta):
+    """上传结果缓存的基类
+
+    缓存的键由资源内容与 bot 共同决定, 值为平台返回的资源标识 (如 file_key, file_id 或资源 URL)
+
+    参数:
+        max_size: 最多缓存的条目数量, 超出时按最近最少使用淘汰
+        ttl: 条目的有效期 (秒), 为 None 时永不过期
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 86400):
+        self.max_size = max_size
+        self.ttl = ttl
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]: ...
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None: ...
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+    async def aget(self, key: str) -> Optional[str]:
+        """在事件循环中读取缓存; 会阻塞的后端应覆盖此方法"""
+        return self.get(key)
+
+    async def aset(self, key: str, value: str) -> None:
+        """在事件循环中写入缓存; 会阻塞的后端应覆盖此方法"""
+        self.set(key, value)
+
+    def _expire_at(self) -> Optional[float]:
+        return None if self.ttl is None else time.time() + self.ttl
+
+
+class MemoryUploadCache(UploadCache):
+    """基于内存的上传结果缓存"""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 86400):
+        super().__init__(max_size, ttl)
+        self._data: OrderedDict[str, Tuple[str, Optional[float]]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        if not (item := self._data.get(key)):
+            return None
+        value, expire = item
+        if expire is not None and expire < time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self._data[key] = (value, self._expire_at())
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqliteUploadCache(UploadCache):
+    """基于本地 sqlite 数据库的上传结果缓存, 可在重启后保留
+
+    导出与发送时的读写在线程池中进行, 不会阻塞事件循环
+
+    参数:
+        path: 数据库文件路径
+    """
+
+    def __init__(self, path: Union[str, Path], max_size: int = 1024, ttl: Optional[float] = 86400):
+        super().__init__(max_size, ttl)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS upload_cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expire REAL, access REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value, expire FROM upload_cache WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        value, expire = row
+        now = time.time()
+        if expire is not None and expire < now:
+            self._conn.execute("DELETE FROM upload_cache WHERE key = ?", (key,))
+            return None
+        self._conn.execute("UPDATE upload_cache SET access = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._set(key, value)
+
+    def _set(self, key: str, value: str) -> None:
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO upload_cache (key, value, expire, access) VALUES (?, ?, ?, ?)",
+            (key, value, self._expire_at(), now),
+        )
+        self._conn.execute("DELETE FROM upload_cache WHERE expire IS NOT NULL AND expire < ?", (now,))
+        self._conn.execute(
+            "DELETE FROM upload_cache WHERE key NOT IN (SELECT key FROM upload_cache ORDER BY access DESC LIMIT ?)",
+            (self.max_size,),
+        )
+
+    async def aget(self, key: str) -> Optional[str]:
+        return await run_sync(self.get)(key)
+
+    async def aset(self, key: str, value: str) -> None:
+        await run_sync(self.set)(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM upload_cache")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM upload_cache").fetchone()[0]
+
+
+_upload_cache: Optional[UploadCache] = None
+
+
+def apply_upload_cache(cache: Optional[UploadCache]):
+    """启用上传结果缓存, 重复发送相同的资源时将复用之前上传得到的资源标识
+
+    参数:
+        cache: 缓存后端, 如 MemoryUploadCache 或 SqliteUploadCache; 为 None 时关闭缓存
+    """
+    global _upload_cache
+
+    _upload_cache = cache
+
+
+def get_upload_cache() -> Optional[UploadCache]:
+    return _upload_cache
+
+
+_INLINE_HASH_SIZE = 64 * 1024
+"""小于该大小的数据直接在事件循环中计算摘要, 更大的数据交由线程池计算"""
+
+
+def _digest(*parts: Any) -> str:
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(part if isinstance(part, (bytes, bytearray, memoryview)) else str(part).encode())
+        hasher.update(b"\x00")
+    return hasher.hexdigest()
+
+
+def _stream_digest(prefix: Tuple[Any, ...], stream: Any) -> Optional[str]:
+    if not stream.seekable():
+        return None
+    hasher = hashlib.sha256(_digest(*prefix, "raw").encode())
+    pos = stream.tell()
+    try:
+        while chunk := stream.read(64 * 1024):
+            hasher.update(chunk)
+    finally:
+        stream.seek(pos)
+    return hasher.hexdigest()
+
+
+def _buffer_digest(prefix: Tuple[Any, ...], buffer: BytesIO) -> str:
+    with buffer.getbuffer() as view:
+        return _digest(*prefix, "raw", view)
+
+
+async def _raw_digest(prefix: Tuple[Any, ...], data: bytes) -> str:
+    if len(data) < _INLINE_HASH_SIZE:
+        return _digest(*prefix, "raw", data)
+    return await run_sync(_digest)(*prefix, "raw", data)
+
+
+async def resource_key(data: Union[str, Path, bytes, BytesIO, Any], bot: Bot, kind: str = "") -> Optional[str]:
+    """根据资源内容与 bot 计算缓存键
+
+    较大的二进制数据与文件对象在线程池中计算摘要, 不会阻塞事件循环
+
+    参数:
+        data: 资源, 可以是 URL、路径、二进制数据或可 seek 的文件对象
+        bot: 上传资源的 bot
+        kind: 区分同一资源不同上传方式的标记
+
+    返回:
+        缓存键; 资源无法在不消耗其内容的情况下计算键 (如异步流) 时返回 None
+    """
+    prefix = (bot.adapter.get_name(), bot.self_id, kind)
+    if isinstance(data, BytesIO):
+        # getbuffer 不会复制缓冲区; 视图存在期间 BytesIO 无法改变大小, 因此视图不跨越 await 持有
+        with data.getbuffer() as view:
+            if view.nbytes < _INLINE_HASH_SIZE:
+                return _digest(*prefix, "raw", view)
+        return await run_sync(_buffer_digest)(prefix, data)
+    if isinstance(data, bytes):
+        return await _raw_digest(prefix, data)
+    if hasattr(data, "read"):
+        return await run_sync(_stream_digest)(prefix, data)
+    if not isinstance(data, (str, Path)):
+        return None
+    if isinstance(data, str) and data.startswith(("http://", "https://")):
+        return _digest(*prefix, "url", data)
+    try:
+        stat = Path(data).stat()
+    except OSError:
+        return None
+    return _digest(*prefix, "path", Path(data).resolve(), stat.st_mtime_ns, stat.st_size)
+
+
+async def media_key(seg: "Media", bot: Bot, kind: str = "") -> Optional[str]:
+    """根据媒体消息段计算缓存键; 消息段没有可用的资源时返回 None"""
+    kind = f"{seg.__class__.__name__}:{seg.name}:{kind}"
+    if seg.url:
+        return await resource_key(seg.url, bot, kind)
+    if seg.path:
+        return await resource_key(seg.path, bot, kind)
+    if seg.raw:
+        return await resource_key(seg.raw, bot, kind)
+    return None
+
+
+async def cached_media_id(seg: "Media", bot: Bot) -> Optional[str]:
+    """查找此前发送相同资源时平台返回的资源标识 (如 Telegram 的 file_id), 未启用缓存或未记录时返回 None"""
+    if _upload_cache is None or (key := await media_key(seg, bot, "media_id")) is None:
+        return None
+    return await _upload_cache.aget(key)
+
+
+async def learn_media_id(seg: "Media", bot: Bot, media_id: str):
+    """记录发送资源后平台返回的资源标识, 之后导出相同资源时将直接使用该标识"""
+    if _upload_cache is not None and (key := await media_key(seg, bot, "media_id")) is not None:
+        await _upload_cache.aset(key, media_id)
+
+
+async def cached_upload(key: Optional[str], upload: Callable[[], Awaitable[str]]) -> str:
+    """在启用缓存时优先复用 key 对应的上传结果, 否则调用 upload 进行上传并记录结果"""
+    if _upload_cache is None or key is None:
+        return await upload()
+    if (value := await _upload_cache.aget(key)) is not None:
+        return value
+    value = await upload()
+    await _upload_cache.aset(key, value)
+    return value
+
+
+def cached_to_url(func: Callable[..., Awaitable[str]]) -> Callable[..., Awaitable[str]]:
+    """为 Media.to_url 附加上传结果缓存"""
+
+    async def to_url(data: Union[str, Path, bytes, BytesIO], bot: Bot, name: Optional[str] = None) -> str:
+        if _upload_cache is None:
+            return await func(data, bot, name)
+        key = await resource_key(data, bot, f"to_url:{name}")
+        return await cached_upload(key, lambda: func(data, bot, name))
+
+    to_url.__wrapped__ = func  # type: ignore
+    return to_url
@@ -4,7 +4,7 @@ from typing import Union
 
 from nonebot import require
 
-from nonebot_plugin_alconna.uniseg.segment import Media
+from nonebot_plugin_alconna.uniseg.segment import apply_media_to_url
 
 try:
     require("nonebot_plugin_filehost")
@@ -19,4 +19,4 @@ async def to_url(data: Union[str, Path, bytes, BytesIO], bot: ..., name: Union[s
     return await FileHost(data, filename=name).to_url()
 
 
-Media.to_url = to_url
+apply_media_to_url(to_url)
@@ -11,6 +11,39 @@ from pathlib import Path
 with (Path(__file__).parent / "data.json").open(encoding="utf-8") as data_file:
     data = json.load(data_file)
 
+_index = None
+
+
+def _compile():
+    """
+    Builds a byte-level prefix trie of all signatures, grouped by offset
+
+    Each trie node is a dict mapping the next byte to a child node; the
+    terminal entries of a node are stored under the key -1 as a list of
+    (order, element) pairs, where order is the position of the signature
+    in data.json. Signatures are matched directly on the header bytes, so
+    a lookup costs at most one trie walk per distinct offset.
+
+    Returns:
+        (list) -> list of (offset, trie root) pairs
+    """
+
+    global _index
+
+    if _index is None:
+        roots = {}
+        order = 0
+        for element in data:
+            root = roots.setdefault(element["offset"], {})
+            for signature in element["signature"]:
+                node = root
+                for byte in bytes.fromhex(signature):
+                    node = node.setdefault(byte, {})
+                node.setdefault(-1, []).append((order, element, len(signature)))
+                order += 1
+        _index = sorted(roots.items())
+    return _index
+
 
 class Info:
     """
@@ -57,18 +90,22 @@ def get(obj: bytes):
     if not isinstance(obj, bytes):
         raise TypeError("object type must be bytes")
 
-    stream = " ".join([f"{byte:02X}" for byte in obj])
+    matches = []
+    for offset, root in _compile():
+        node = root
+        for byte in obj[offset:]:
+            if (node := node.get(byte)) is None:
+                break
+            if -1 in node:
+                matches.extend(node[-1])
 
     types = {}
     extensions = {}
     mimes = {}
-    for element in data:
-        for signature in element["signature"]:
-            offset = element["offset"] * 2 + element["offset"]
-            if signature == stream[offset : len(signature) + offset]:
-                types[element["type"]] = len(signature)
-                extensions[element["extension"]] = len(signature)
-                mimes[element["mime"]] = len(signature)
+    for _, element, length in sorted(matches, key=lambda x: x[0]):
+        types[element["type"]] = length
+        extensions[element["extension"]] = length
+        mimes[element["mime"]] = length
     return Info(
         sorted(types, key=lambda x: types.get(x, False), reverse=True),
         sorted(extensions.keys(), key=lambda x: extensions.get(x, False), reverse=True),
@@ -0,0 +1,330 @@
+"""AlconnaRule 解析与分发热路径的基准测试
+
+测量 `AlconnaRule.__call__` → `MessageArgv.build` → `Alconna.parse` 路径在不同命令数量、
+消息形态以及是否启用扩展/补全会话时的吞吐量与延迟。每个事件会依次经过所有已注册命令的规则,
+与 NoneBot 对同一优先级的 matcher 逐个检查规则的行为一致。
+
+默认每次分发都构造新的事件, 且消息中的参数各不相同, 以免命中按事件或按消息内容的缓存;
+cached 组合则反复分发同一批事件对象, 测量命中缓存时的耗时。
+
+启用补全时, comp_session 形态会触发补全会话并以后续输入完成会话, 测量从触发到得到解析结果的耗时;
+另外还会测量带样式文本在 Satori、Telegram 与 Kook 下的导出耗时。
+
+用法:
+    PYTHONPATH=src python -m tests.benchmark --commands 10 100 1000 --events 200 --json bench.json
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+from functools import partial
+from itertools import count, product
+from typing import Any, Dict, List, Tuple, Callable
+
+import nonebot
+
+SHAPES = ("plain", "miss", "styled", "at_image", "reply", "comp_session")
+_seq = count()
+EXPORT_ADAPTERS = ("satori", "telegram", "kook")
+
+
+def _setup():
+    nonebot.init(driver="~fastapi+~httpx+~websockets", log_level="WARNING")
+    from nonebot.adapters.kaiheila import Adapter as KookAdapter
+    from nonebot.adapters.satori import Adapter as SatoriAdapter
+    from nonebot.adapters.telegram import Adapter as TelegramAdapter
+    from nonebot.adapters.onebot.v11 import Adapter as Onebot11Adapter
+
+    driver = nonebot.get_driver()
+    driver.register_adapter(Onebot11Adapter)
+    driver.register_adapter(SatoriAdapter)
+    driver.register_adapter(TelegramAdapter)
+    driver.register_adapter(KookAdapter)
+    nonebot.require("nonebot_plugin_alconna")
+
+
+def _bots():
+    from nonebot.adapters.satori import Bot as SatoriBot
+    from nonebot.adapters.onebot.v11 import Bot as Onebot11Bot
+    from nonebot.adapters.satori import Adapter as SatoriAdapter
+    from nonebot.adapters.onebot.v11 import Adapter as Onebot11Adapter
+
+    ob11 = Onebot11Bot(nonebot.get_adapter(Onebot11Adapter), "1")
+    satori = SatoriBot(nonebot.get_adapter(SatoriAdapter), "1", "satori", None)  # type: ignore
+    return ob11, satori
+
+
+def _events(shape: str, index: int, ob11: Any, satori: Any) -> Tuple[Any, Any]:
+    """构造一个目标命令为 cmd{index} 的新事件, 每次调用的消息 id 与参数都不同"""
+    from nonebot.adapters.onebot.v11.event import Reply, Sender
+    from nonebot.adapters.satori import Message as SatoriMessage
+    from nonebot.adapters.onebot.v11 import Message, MessageSegment
+
+    from tests.fake import fake_message_event_satori, fake_group_message_event_v11
+
+    seq = next(_seq)
+    if shape == "plain":
+        return ob11, fake_group_message_event_v11(message=Message(f"cmd{index} {seq} -v"), message_id=seq)
+    if shape == "comp_session":
+        # 缺少 --num 的参数, 启用补全时会开启补全会话
+        return ob11, fake_group_message_event_v11(message=Message(f"cmd{index} --num"), message_id=seq)
+    if shape == "miss":
+        return ob11, fake_group_message_event_v11(message=Message(f"hello world, nothing to see {seq}"), message_id=seq)
+    if shape == "styled":
+        message = SatoriMessage(f"<b>cmd{index}</b> <i>{seq}</i> -v")
+        return satori, fake_message_event_satori(message=message, id=seq)
+    if shape == "at_image":
+        message = (
+            MessageSegment.text(f"cmd{index} ")
+            + MessageSegment.at(123)
+            + MessageSegment.image(f"https://example.com/{seq}.png")
+        )
+        return ob11, fake_group_message_event_v11(message=message, message_id=seq)
+    reply = Reply(
+        time=1000000,
+        message_type="group",
+        message_id=seq + 10000,
+        real_id=seq + 10000,
+        sender=Sender(user_id=123, nickname="test"),
+        message=Message("quoted"),
+    )
+    return ob11, fake_group_message_event_v11(message=Message(f"cmd{index} {seq}"), message_id=seq, reply=reply)
+
+
+def _rules(count: int, extensions: bool, completion: bool) -> List[Any]:
+    from nonebot.adapters.onebot.v11 import Message
+    from arclet.alconna import Args, Option, Alconna, AllParam, command_manager
+
+    from nonebot_plugin_alconna.rule import AlconnaRule
+    from tests.fake import fake_group_message_event_v11
+    from nonebot_plugin_alconna.extension import Extension
+
+    class NoopExtension(Extension):
+        @property
+        def priority(self) -> int:
+            return 10
+
+        @property
+        def id(self) -> str:
+            return "benchmark:noop"
+
+        async def receive_wrapper(self, bot, event, command, receive):
+            return receive
+
+        async def parse_wrapper(self, bot, state, event, res) -> None:
+            pass
+
+    class BenchRule(AlconnaRule):
+        """补全会话的提示直接作答, 不经过 bot 发送"""
+
+        async def send(self, text, bot, event, arp):
+            if self._sessions.get((bot.self_id, event.get_session_id())) is not None:
+                answer = fake_group_message_event_v11(message=Message("42"), message_id=event.message_id)
+                await self._waiter(bot, answer, {})
+            return Message()
+
+    command_manager.max_count = max(command_manager.max_count, count * 2 + 200)
+    return [
+        BenchRule(
+            Alconna(f"cmd{i}", Option("-n|--num", Args["num", int]), Option("-v|--verbose"), Args["arg?", AllParam]),
+            comp_config={"lite": True} if completion else None,
+            extensions=[NoopExtension()] if extensions else None,
+        )
+        for i in range(count)
+    ]
+
+
+def _clear(rules: List[Any]):
+    from arclet.alconna import command_manager
+
+    for rule in rules:
+        command_manager.delete(rule.command)
+    rules.clear()
+
+
+async def _run(rules: List[Any], make: Callable[[int], Tuple[Any, Any]], events: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    matched = 0
+    for i in range(events):
+        # 事件在计时之外构造, 只测量规则检查本身
+        bot, event = make(i * 7919 % len(rules))
+        start = time.perf_counter()
+        for rule in rules:
+            if await rule(event, {}, bot):
+                matched += 1
+                break
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        "events": events,
+        "matched": matched,
+        "events_per_sec": events / total if total else 0.0,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+async def benchmark(
+    commands: List[int],
+    events: int,
+    shapes: List[str],
+    extensions: List[bool],
+    completion: List[bool],
+    cached: List[bool],
+) -> List[Dict[str, Any]]:
+    """运行所有组合的基准测试
+
+    参数:
+        commands: 注册的命令数量
+        events: 每种组合下分发的事件数量
+        shapes: 消息形态, 取值见 SHAPES
+        extensions: 是否为每个命令启用一个空扩展
+        completion: 是否启用补全会话
+        cached: 是否反复分发同一批事件对象, 为 False 时每次分发都构造新的事件
+
+    返回:
+        每种组合的测试结果
+    """
+    ob11, satori = _bots()
+    results = []
+    for size, ext, comp in product(commands, extensions, completion):
+        rules = _rules(size, ext, comp)
+        try:
+            for shape, reuse in product(shapes, cached):
+                if shape == "comp_session" and not comp:
+                    continue
+                if reuse:
+                    cache = [_events(shape, i, ob11, satori) for i in range(size)]
+                    make: Callable[[int], Tuple[Any, Any]] = cache.__getitem__
+                else:
+                    make = partial(_events, shape, ob11=ob11, satori=satori)
+                await _run(rules, make, min(events, 10))  # warm up
+                result = await _run(rules, make, events)
+                result.update(commands=size, shape=shape, extensions=ext, completion=comp, cached=reuse)
+                results.append(result)
+                print(
+                    f"commands={size:<5} shape={shape:<12} ext={ext!s:<5} comp={comp!s:<5} cached={reuse!s:<5} "
+                    f"{result['events_per_sec']:>10.1f} ev/s  "
+                    f"p50={result['p50_ms']:.3f}ms  p99={result['p99_ms']:.3f}ms",
+                    file=sys.stderr,
+                )
+        finally:
+            _clear(rules)
+    return results
+
+
+def _styled():
+    from nonebot_plugin_alconna import Text, UniMessage
+
+    bold = Text("bold and italic").mark(0, 4, "bold").mark(9, 15, "italic")
+    code = Text("run `cmd 42` now").mark(4, 12, "code")
+    link = Text("see https://example.com").mark(4, 23, "link")
+    return UniMessage([bold, Text(" "), code, Text(" "), link])
+
+
+async def export_benchmark(adapters: List[str], events: int) -> List[Dict[str, Any]]:
+    """测量带样式文本在各适配器下的导出耗时
+
+    参数:
+        adapters: 适配器, 取值见 EXPORT_ADAPTERS
+        events: 每个适配器下导出的次数
+
+    返回:
+        每个适配器的测试结果
+    """
+    from nonebot.adapters.kaiheila import Bot as KookBot
+    from nonebot.adapters.telegram.config import BotConfig
+    from nonebot.adapters.telegram import Bot as TelegramBot
+    from nonebot.adapters.kaiheila import Adapter as KookAdapter
+    from nonebot.adapters.telegram import Adapter as TelegramAdapter
+
+    _, satori = _bots()
+    bots = {
+        "satori": satori,
+        "telegram": TelegramBot(nonebot.get_adapter(TelegramAdapter), "1", config=BotConfig(token="1:token")),
+        "kook": KookBot(nonebot.get_adapter(KookAdapter), "1", "kook", "token"),
+    }
+    results = []
+    for name in adapters:
+        bot = bots[name]
+        latencies: List[float] = []
+        for i in range(events + min(events, 10)):
+            # 每次导出都使用新的消息, 以免命中消息上的缓存
+            message = _styled()
+            start = time.perf_counter()
+            await message.export(bot)
+            if i >= min(events, 10):  # 前几次为预热
+                latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        total = sum(latencies)
+        result = {
+            "adapter": name,
+            "events": events,
+            "events_per_sec": events / total if total else 0.0,
+            "mean_ms": statistics.fmean(latencies) * 1000,
+            "p50_ms": latencies[len(latencies) // 2] * 1000,
+            "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        }
+        results.append(result)
+        print(
+            f"export  adapter={name:<9} {result['events_per_sec']:>10.1f} ev/s  "
+            f"p50={result['p50_ms']:.3f}ms  p99={result['p99_ms']:.3f}ms",
+            file=sys.stderr,
+        )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=list(SHAPES))
+    parser.add_argument("--extensions", choices=("off", "on", "both"), default="both")
+    parser.add_argument("--completion", choices=("off", "on", "both"), default="off")
+    parser.add_argument("--cached", choices=("off", "on", "both"), default="off")
+    parser.add_argument("--export", nargs="*", choices=EXPORT_ADAPTERS, default=list(EXPORT_ADAPTERS))
+    parser.add_argument("--json", dest="output", help="将结果以 JSON 格式写入该文件, 为 - 时输出到 stdout")
+    args = parser.parse_args(argv)
+
+    def flags(value: str) -> List[bool]:
+        return {"off": [False], "on": [True], "both": [False, True]}[value]
+
+    _setup()
+
+    async def run():
+        results = await benchmark(
+            args.commands,
+            args.events,
+            args.shapes,
+            flags(args.extensions),
+            flags(args.completion),
+            flags(args.cached),
+        )
+        return results, await export_benchmark(args.export, args.events)
+
+    results, exports = asyncio.run(run())
+    if args.output:
+        from nonebot_plugin_alconna import __version__
+
+        report = {
+            "version": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+            "export": exports,
+        }
+        if args.output == "-":
+            print(json.dumps(report, indent=2, ensure_ascii=False))
+        else:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+from nonebug import App
+from nonebot import get_adapter
+from nonebot.adapters.onebot.v11 import Bot, Adapter, Message, ActionFailed
+
+
+@pytest.mark.asyncio()
+async def test_broadcast(app: App):
+    from nonebot_plugin_alconna import Target, UniMessage
+
+    targets = [Target("1"), Target("2"), Target("3", private=True)]
+    progress = []
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        ctx.should_call_api(
+            "send_msg", {"message_type": "group", "group_id": 1, "message": Message("hi")}, {"message_id": 1}
+        )
+        ctx.should_call_api(
+            "send_msg",
+            {"message_type": "group", "group_id": 2, "message": Message("hi")},
+            exception=ActionFailed(retcode=100),
+        )
+        ctx.should_call_api(
+            "send_msg", {"message_type": "private", "user_id": 3, "message": Message("hi")}, {"message_id": 3}
+        )
+        result = await UniMessage("hi").broadcast(
+            targets, bot, concurrency=1, progress=lambda done, total: progress.append((done, total))
+        )
+
+    assert result.total == 3
+    assert [receipt.context for receipt in result.receipts] == [targets[0], targets[2]]
+    assert [receipt.msg_ids for receipt in result.receipts] == [[{"message_id": 1}], [{"message_id": 3}]]
+    assert len(result.errors) == 1
+    assert result.errors[0][0] is targets[1]
+    assert isinstance(result.errors[0][1], ActionFailed)
+    assert progress == [(1, 3), (2, 3), (3, 3)]
+
+
+@pytest.mark.asyncio()
+async def test_broadcast_progress_error(app: App):
+    from nonebot_plugin_alconna import Target, UniMessage
+
+    def progress(done: int, total: int):
+        raise RuntimeError("progress")
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        for group in (1, 2):
+            ctx.should_call_api(
+                "send_msg",
+                {"message_type": "group", "group_id": group, "message": Message("hi")},
+                {"message_id": group},
+            )
+        result = await UniMessage("hi").broadcast([Target("1"), Target("2")], bot, concurrency=1, progress=progress)
+
+    assert [receipt.msg_ids for receipt in result.receipts] == [[{"message_id": 1}], [{"message_id": 2}]]
+    assert not result.errors
+
+
+@pytest.mark.asyncio()
+async def test_token_bucket():
+    from nonebot_plugin_alconna import TokenBucket
+
+    bucket = TokenBucket(rate=50, burst=2)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for _ in range(4):
+        await bucket.acquire()
+    # 前两个令牌立即可用, 其余两个各需等待 1/50 秒
+    assert loop.time() - start >= 0.035
+
+    with pytest.raises(ValueError, match="rate must be positive"):
+        TokenBucket(rate=0)
+
+
+@pytest.mark.asyncio()
+async def test_send_limiter():
+    from types import SimpleNamespace
+
+    from nonebot_plugin_alconna import SendLimiter
+    from nonebot_plugin_alconna.uniseg.limiter import PRIORITY_REPLY, PRIORITY_NORMAL, PRIORITY_BROADCAST
+
+    limiter = SendLimiter({"Fake": (20, 1)})
+    bot = SimpleNamespace(adapter=SimpleNamespace(get_name=lambda: "Fake"), self_id="1")
+    other = SimpleNamespace(adapter=SimpleNamespace(get_name=lambda: "Other"), self_id="1")
+    order = []
+
+    async def send(name: str, priority: int, target: str = "10000"):
+        await limiter.acquire(bot, target, priority)  # type: ignore
+        order.append(name)
+
+    await limiter.acquire(other, "10000")  # type: ignore
+    assert limiter.metrics["sent"] == 0
+
+    await send("first", PRIORITY_NORMAL)
+    # 令牌已耗尽, 之后的发送会排队并按优先级放行
+    await asyncio.gather(
+        send("broadcast", PRIORITY_BROADCAST),
+        send("normal", PRIORITY_NORMAL),
+        send("reply", PRIORITY_REPLY),
+    )
+    assert order == ["first", "reply", "normal", "broadcast"]
+    metrics = limiter.metrics
+    assert metrics["sent"] == 4
+    assert metrics["queued"] == 0
+    assert metrics["max_queued"] == 3
+    assert metrics["delayed"] == 3
+
+    # 空闲的令牌桶补满后即被移除
+    await asyncio.sleep(0.1)
+    assert not limiter._bots
+
+    # 优先级同样作用于 bot 的总限速, 不同发送对象间也会按优先级放行
+    limiter = SendLimiter(bot_limits={"Fake": (20, 1)})
+    order.clear()
+    await send("first", PRIORITY_NORMAL, "1")
+    await asyncio.gather(
+        send("broadcast1", PRIORITY_BROADCAST, "2"),
+        send("broadcast2", PRIORITY_BROADCAST, "3"),
+        send("reply", PRIORITY_REPLY, "4"),
+    )
+    assert order == ["first", "reply", "broadcast1", "broadcast2"]
+    await asyncio.sleep(0.1)
+    assert not limiter._bots
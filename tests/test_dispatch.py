@@ -0,0 +1,142 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from nonebug import App
+from nonebot import get_adapter
+from arclet.alconna import Args, Option, Alconna, Subcommand
+from nonebot.adapters.onebot.v11 import Bot, Adapter, Message
+
+from tests.fake import fake_group_message_event_v11
+
+
+@pytest.mark.asyncio()
+async def test_dispatch(app: App, monkeypatch: pytest.MonkeyPatch):
+    from nonebot.matcher import matchers
+    from nonebot.message import handle_event
+
+    from nonebot_plugin_alconna import on_alconna
+
+    alc = Alconna("test_dispatch", Option("add", Args["a", int]), Subcommand("rm", Option("--all")))
+    matcher = on_alconna(alc)
+    count = sum(len(group) for group in matchers.values())
+    add = matcher.dispatch("add")
+    remove = matcher.dispatch("rm", block=True)
+    remove_all = remove.dispatch("~all")
+    main = matcher.dispatch("$main")
+    assert sum(len(group) for group in matchers.values()) == count
+    assert len(matcher._dispatch_table) == 3  # type: ignore
+
+    @add.handle()
+    async def _(a: int):
+        await asyncio.sleep(0.01)
+        await add.send(f"add {a}")
+
+    @remove.handle()
+    async def _():
+        await remove.send("rm")
+
+    @remove_all.handle()
+    async def _():
+        await remove_all.send("rm all")
+
+    @main.handle()
+    async def _():
+        await main.send("main")
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        events = [
+            fake_group_message_event_v11(message=Message("test_dispatch add 1"), message_id=1),
+            fake_group_message_event_v11(message=Message("test_dispatch add 2"), message_id=2),
+            fake_group_message_event_v11(message=Message("test_dispatch rm --all"), message_id=3),
+            fake_group_message_event_v11(message=Message("test_dispatch"), message_id=4),
+        ]
+        ctx.should_call_send(events[0], "add 1", None)
+        ctx.should_call_send(events[1], "add 2", None)
+        await asyncio.gather(*(handle_event(bot, event) for event in events[:2]))
+        ctx.should_call_send(events[2], "rm", None)
+        ctx.should_call_send(events[2], "rm all", None)
+        await handle_event(bot, events[2])
+        ctx.should_call_send(events[3], "main", None)
+        await handle_event(bot, events[3])
+
+    plugin = SimpleNamespace(matcher={matcher, add, remove})
+    monkeypatch.setattr(remove, "plugin", plugin)
+    remove.destroy()
+    assert len(matcher._dispatch_table) == 2  # type: ignore
+    assert plugin.matcher == {matcher, add}
+
+
+@pytest.mark.asyncio()
+async def test_dispatch_generator_dependency(app: App):
+    from nonebot.params import Depends
+    from nonebot.message import handle_event
+
+    from nonebot_plugin_alconna import on_alconna
+
+    closed = []
+
+    def session():
+        yield "session"
+        closed.append(True)
+
+    matcher = on_alconna(Alconna("test_dispatch_dep", Option("add", Args["a", int])))
+    add = matcher.dispatch("add")
+
+    @add.handle()
+    async def _(a: int, sess: str = Depends(session)):
+        await add.send(f"{sess} {a}")
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        event = fake_group_message_event_v11(message=Message("test_dispatch_dep add 1"))
+        ctx.should_call_send(event, "session 1", None)
+        await handle_event(bot, event)
+    assert closed == [True]
+
+
+@pytest.mark.asyncio()
+async def test_dispatch_extension(app: App):
+    from nonebot.message import handle_event
+
+    from nonebot_plugin_alconna import Extension, on_alconna
+
+    calls = []
+
+    class TagExtension(Extension):
+        @property
+        def priority(self) -> int:
+            return 1
+
+        @property
+        def id(self) -> str:
+            return "tag"
+
+        async def send_wrapper(self, bot, event, send):
+            calls.append(str(send))
+            return send
+
+    matcher = on_alconna(Alconna("test_dispatch_ext", Option("add", Args["a", int])), extensions=[TagExtension])
+    add = matcher.dispatch("add")
+
+    @matcher.handle()
+    async def _():
+        calls.append("parent")
+
+    @add.handle()
+    async def _(a: int, ext: TagExtension):
+        await asyncio.sleep(0.01)
+        assert isinstance(ext, TagExtension)
+        await add.send(f"add {a}")
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        event = fake_group_message_event_v11(message=Message("test_dispatch_ext add 1"))
+        ctx.should_call_send(event, "add 1", None)
+        await handle_event(bot, event)
+    assert calls == ["parent", "add 1"]
+    assert not matcher.executor.context
@@ -0,0 +1,97 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from nonebot.internal.driver.model import Request, Response
+
+
+class FakeServer:
+    def __init__(self, headers: dict):
+        self.headers = headers
+        self.requests: list = []
+
+    def get_name(self) -> str:
+        return "fake"
+
+    async def request(self, req: Request) -> Response:
+        self.requests.append(req)
+        await asyncio.sleep(0.01)
+        if self.headers.get("ETag") and req.headers.get("If-None-Match") == self.headers["ETag"]:
+            return Response(304, headers=self.headers, request=req)
+        return Response(200, headers=self.headers, content=b"image", request=req)
+
+
+@pytest.mark.asyncio()
+async def test_download_coalesce():
+    from nonebot_plugin_alconna import DownloadCache
+
+    server = FakeServer({})
+    bot = SimpleNamespace(adapter=server)
+    cache = DownloadCache()
+    results = await asyncio.gather(*(cache.fetch(bot, "https://example.com/a.png") for _ in range(3)))  # type: ignore
+    assert results == [b"image"] * 3
+    assert len(server.requests) == 1
+    await cache.fetch(bot, "https://example.com/a.png")  # type: ignore
+    assert len(server.requests) == 2
+    assert cache.size == 0
+
+
+@pytest.mark.asyncio()
+async def test_download_validators():
+    from nonebot_plugin_alconna import DownloadCache
+
+    server = FakeServer({"ETag": '"v1"'})
+    bot = SimpleNamespace(adapter=server)
+    cache = DownloadCache()
+    assert await cache.fetch(bot, "https://example.com/a.png") == b"image"  # type: ignore
+    assert await cache.fetch(bot, "https://example.com/a.png") == b"image"  # type: ignore
+    assert server.requests[1].headers["If-None-Match"] == '"v1"'
+
+    server = FakeServer({"Cache-Control": "max-age=60"})
+    bot = SimpleNamespace(adapter=server)
+    assert await cache.fetch(bot, "https://example.com/b.png") == b"image"  # type: ignore
+    assert await cache.fetch(bot, "https://example.com/b.png") == b"image"  # type: ignore
+    assert len(server.requests) == 1
+
+    small = DownloadCache(max_bytes=5)
+    assert await small.fetch(bot, "https://example.com/c.png") == b"image"  # type: ignore
+    assert await small.fetch(bot, "https://example.com/d.png") == b"image"  # type: ignore
+    assert small.size == 5
+
+
+@pytest.mark.asyncio()
+async def test_download_spill(tmp_path):
+    from nonebot_plugin_alconna import DownloadCache
+
+    server = FakeServer({"Cache-Control": "max-age=60"})
+    bot = SimpleNamespace(adapter=server)
+    cache = DownloadCache(spill_dir=tmp_path, spill_threshold=2)
+    assert await cache.fetch(bot, "https://example.com/a.png") == b"image"  # type: ignore
+    assert [path.read_bytes() for path in tmp_path.iterdir()] == [b"image"]
+    assert await cache.fetch(bot, "https://example.com/a.png") == b"image"  # type: ignore
+    assert len(server.requests) == 1
+    assert cache.size == 0
+    cache.clear()
+    await asyncio.gather(*cache._tasks)
+    assert not list(tmp_path.iterdir())
+
+
+@pytest.mark.asyncio()
+async def test_download_authenticated():
+    from nonebot_plugin_alconna import DownloadCache
+
+    server = FakeServer({})
+    first = SimpleNamespace(adapter=server, self_id="1")
+    second = SimpleNamespace(adapter=server, self_id="2")
+    cache = DownloadCache()
+    headers = {"Authorization": "Bearer token"}
+    await asyncio.gather(
+        cache.fetch(first, "https://example.com/a.png", headers=headers),  # type: ignore
+        cache.fetch(second, "https://example.com/a.png", headers=headers),  # type: ignore
+    )
+    assert len(server.requests) == 2
+    await asyncio.gather(
+        cache.fetch(first, "https://example.com/a.png"),  # type: ignore
+        cache.fetch(second, "https://example.com/a.png"),  # type: ignore
+    )
+    assert len(server.requests) == 3
@@ -59,3 +59,141 @@ async def test_extension(app: App):
         event = fake_group_message_event_v11(message=Message("add 1.3 2.4"), user_id=456)
         ctx.receive_event(bot, event)
         ctx.should_call_send(event, "权限不足！")
+
+
+@pytest.mark.asyncio()
+async def test_extension_select_cache(app: App):
+    from nonebot_plugin_alconna.rule import AlconnaRule
+    from nonebot_plugin_alconna import Extension, add_global_extension
+
+    calls = []
+
+    class StaticExtension(Extension):
+        static_validate = True
+
+        @property
+        def priority(self) -> int:
+            return 1
+
+        @property
+        def id(self) -> str:
+            return "static"
+
+        def validate(self, bot, event) -> bool:
+            calls.append("static")
+            return True
+
+    class DynamicExtension(Extension):
+        @property
+        def priority(self) -> int:
+            return 2
+
+        @property
+        def id(self) -> str:
+            return "dynamic"
+
+        def validate(self, bot, event) -> bool:
+            calls.append("dynamic")
+            return event.get_user_id() == "123"
+
+    rule = AlconnaRule(Alconna("select_cache"), extensions=[DynamicExtension(), StaticExtension()])
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        event = fake_group_message_event_v11(message=Message("select_cache"), user_id=123)
+        ids = [ext.id for ext in rule.executor.select(bot, event).context]
+        assert ids == ["static", "dynamic", "!default"]
+        event.user_id = 456
+        ids = [ext.id for ext in rule.executor.select(bot, event).context]
+        assert ids == ["static", "!default"]
+        assert calls == ["static", "dynamic", "dynamic"]
+
+        class LateExtension(StaticExtension):
+            @property
+            def id(self) -> str:
+                return "late"
+
+        assert rule.executor._hooks["permission_check"] == []
+
+        add_global_extension(LateExtension())
+        try:
+            ids = [ext.id for ext in rule.executor.select(bot, event).context]
+            assert ids == ["static", "late", "!default"]
+        finally:
+            from nonebot_plugin_alconna.extension import ExtensionExecutor
+
+            ExtensionExecutor.globals.pop()
+
+
+@pytest.mark.asyncio()
+async def test_extension_profiler(app: App):
+    from nonebot_plugin_alconna.rule import AlconnaRule
+    from nonebot_plugin_alconna import Extension, set_extension_profiler
+
+    class GuardExtension(Extension):
+        @property
+        def priority(self) -> int:
+            return 1
+
+        @property
+        def id(self) -> str:
+            return "guard"
+
+        async def permission_check(self, bot, event, command):
+            return event.get_user_id() == "123"
+
+    records = []
+    rule = AlconnaRule(Alconna("profiled"), extensions=[GuardExtension()])
+    set_extension_profiler(lambda path, hook, elapsed: records.append((path, hook)))
+    try:
+        async with app.test_api() as ctx:
+            adapter = get_adapter(Adapter)
+            bot = ctx.create_bot(base=Bot, adapter=adapter)
+            event = fake_group_message_event_v11(message=Message("profiled"), user_id=123)
+            assert await rule(event, {}, bot)
+            event = fake_group_message_event_v11(message=Message("profiled"), user_id=456)
+            assert not await rule(event, {}, bot)
+    finally:
+        set_extension_profiler(None)
+    assert records == [("Alconna::profiled", "permission_check")] * 2
+
+
+@pytest.mark.asyncio()
+async def test_extension_metrics(app: App):
+    from nonebot_plugin_alconna.rule import AlconnaRule
+    from nonebot_plugin_alconna import Extension, ExtensionMetrics, set_extension_metrics
+
+    class FailingExtension(Extension):
+        @property
+        def priority(self) -> int:
+            return 1
+
+        @property
+        def id(self) -> str:
+            return "failing"
+
+        async def receive_wrapper(self, bot, event, command, receive):
+            if event.get_user_id() != "123":
+                raise ValueError("unexpected user")
+            return receive
+
+    metrics = ExtensionMetrics(buckets=(1.0,))
+    exported = []
+    metrics.add_exporter(lambda path, ext, hook, elapsed, error: exported.append((ext, hook, error)))
+    rule = AlconnaRule(Alconna("measured"), extensions=[FailingExtension()])
+    set_extension_metrics(metrics)
+    try:
+        async with app.test_api() as ctx:
+            adapter = get_adapter(Adapter)
+            bot = ctx.create_bot(base=Bot, adapter=adapter)
+            assert await rule(fake_group_message_event_v11(message=Message("measured"), user_id=123), {}, bot)
+            with pytest.raises(ValueError, match="unexpected user"):
+                await rule(fake_group_message_event_v11(message=Message("measured"), user_id=456), {}, bot)
+    finally:
+        set_extension_metrics(None)
+    snapshot = metrics.snapshot()["Alconna::measured"]
+    assert snapshot["failing"]["receive_wrapper"]["calls"] == 2
+    assert snapshot["failing"]["receive_wrapper"]["errors"] == 1
+    assert snapshot["failing"]["receive_wrapper"]["latency"]["buckets"][float("inf")] == 2
+    assert snapshot["failing"]["message_provider"]["calls"] == 2
+    assert ("failing", "receive_wrapper", True) in exported
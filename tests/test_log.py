@@ -0,0 +1,22 @@
+def test_log_lazy_and_sample():
+    from nonebot.log import logger
+
+    from nonebot_plugin_alconna.consts import log, apply_log_sample
+
+    records = []
+    handler = logger.add(lambda msg: records.append(msg.record["message"]), level="DEBUG")
+    try:
+        calls = []
+        log("TRACE", lambda: calls.append(1) or "trace")  # type: ignore
+        assert not calls
+
+        apply_log_sample(0.25)
+        for i in range(8):
+            log("DEBUG", f"sampled {i}", sample=True)
+        assert [r for r in records if "sampled" in r] == [
+            "Plugin-Alconna | sampled 3",
+            "Plugin-Alconna | sampled 7",
+        ]
+    finally:
+        apply_log_sample(1.0)
+        logger.remove(handler)
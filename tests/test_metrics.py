@@ -0,0 +1,34 @@
+import pytest
+from nonebug import App
+from nonebot import get_adapter
+from arclet.alconna import Args, Alconna
+from nonebot.adapters.onebot.v11 import Bot, Adapter, Message
+
+from tests.fake import fake_group_message_event_v11
+
+
+@pytest.mark.asyncio()
+async def test_command_metrics(app: App):
+    from nonebot_plugin_alconna.rule import AlconnaRule
+    from nonebot_plugin_alconna import CommandMetrics, render_prometheus, set_command_metrics
+
+    metrics = CommandMetrics(buckets=(1.0,))
+    rule = AlconnaRule(Alconna("metered", Args["a", int]))
+    set_command_metrics(metrics)
+    try:
+        async with app.test_api() as ctx:
+            adapter = get_adapter(Adapter)
+            bot = ctx.create_bot(base=Bot, adapter=adapter)
+            for text in ("metered 1", "metered x", "other"):
+                await rule(fake_group_message_event_v11(message=Message(text)), {}, bot)
+    finally:
+        set_command_metrics(None)
+    snapshot = metrics.snapshot()["Alconna::metered"]
+    assert (snapshot["seen"], snapshot["head_matched"], snapshot["matched"]) == (3, 2, 1)
+    assert snapshot["generate"]["count"] == 2
+    assert snapshot["permission"]["count"] == 1
+
+    text = render_prometheus(metrics, None)
+    assert "# TYPE alconna_command_parse_seconds histogram\n" in text
+    assert 'alconna_command_events_total{command="Alconna::metered"} 3\n' in text
+    assert 'alconna_command_parse_seconds_bucket{command="Alconna::metered",le="+Inf"} ' in text
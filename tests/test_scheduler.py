@@ -0,0 +1,155 @@
+import json
+import asyncio
+
+import pytest
+from nonebug import App
+from nonebot import get_adapter
+from nonebot.adapters.onebot.v11 import Bot, Adapter, Message, ActionFailed
+
+
+@pytest.mark.asyncio()
+async def test_scheduled_actions(app: App):
+    from nonebot_plugin_alconna import Target, UniMessage, action_scheduler
+
+    target = Target("10000")
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        ctx.should_call_api(
+            "send_msg", {"message_type": "group", "group_id": 10000, "message": Message("1")}, {"message_id": 1}
+        )
+        ctx.should_call_api(
+            "send_msg", {"message_type": "group", "group_id": 10000, "message": Message("2")}, {"message_id": 2}
+        )
+        receipt = await UniMessage("1").send(target, bot)
+        await receipt.send("2")
+
+        cancelled = receipt.recall_later(0.01, 0)
+        assert cancelled.cancel()
+        assert not cancelled.cancel()
+
+        ctx.should_call_api(
+            "send_msg", {"message_type": "group", "group_id": 10000, "message": Message("3")}, {"message_id": 3}
+        )
+        ctx.should_call_api("delete_msg", {"message_id": 1}, None)
+        ctx.should_call_api("delete_msg", {"message_id": 2}, None)
+        first = receipt.recall_later(0.02, 0)
+        second = receipt.recall_later(0.02, 1)
+        later = receipt.send_later("3", 0.01)
+        assert len(action_scheduler) == 3
+        assert await later is receipt
+        await asyncio.gather(first, second)
+        assert receipt.msg_ids == [{"message_id": 3}]
+        assert not len(action_scheduler)
+
+        # 带延时的 recall 同样由调度器执行, 等待者被取消时操作也随之取消
+        task = asyncio.create_task(receipt.recall(delay=60))
+        while not len(action_scheduler):
+            await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert not len(action_scheduler)
+
+        ctx.should_call_api("delete_msg", {"message_id": 3}, None)
+        assert await receipt.recall(delay=0.01) is receipt
+        assert not receipt.msg_ids
+
+
+@pytest.mark.asyncio()
+async def test_scheduled_recall_partial_failure(app: App):
+    from nonebot_plugin_alconna import Target, UniMessage, action_scheduler
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        for mid in (1, 2, 3):
+            ctx.should_call_api(
+                "send_msg",
+                {"message_type": "group", "group_id": 10000, "message": Message(str(mid))},
+                {"message_id": mid},
+            )
+        receipt = await UniMessage("1").send(Target("10000"), bot)
+        await receipt.send("2")
+        await receipt.send("3")
+
+        # 同一批撤回中某条失败时, 其余消息仍会被撤回, 各操作按各自的结果完成
+        ctx.should_call_api("delete_msg", {"message_id": 1}, None)
+        ctx.should_call_api("delete_msg", {"message_id": 2}, exception=ActionFailed(retcode=100))
+        ctx.should_call_api("delete_msg", {"message_id": 3}, None)
+        actions = [receipt.recall_later(0.01, index) for index in range(3)]
+        results = await asyncio.gather(*actions, return_exceptions=True)
+        assert results[0] is None
+        assert isinstance(results[1], ActionFailed)
+        assert results[2] is None
+        assert receipt.msg_ids == [{"message_id": 2}]
+        assert not len(action_scheduler)
+
+
+@pytest.mark.asyncio()
+async def test_scheduled_recall_persistence(app: App, tmp_path):
+    from nonebot_plugin_alconna import Target, UniMessage
+    from nonebot_plugin_alconna.uniseg.scheduler import ActionScheduler
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        ctx.should_call_api(
+            "send_msg", {"message_type": "group", "group_id": 10000, "message": Message("1")}, {"message_id": 1}
+        )
+        receipt = await UniMessage("1").send(Target("10000"), bot)
+
+        scheduler = ActionScheduler()
+        scheduler.schedule(60, "recall", receipt, receipt.msg_ids[0])
+        scheduler.schedule(60, "send", receipt, "2")
+        assert scheduler.save(tmp_path / "actions.json") == 1
+        data = json.loads((tmp_path / "actions.json").read_text(encoding="utf-8"))
+        assert data[0]["kind"] == "recall"
+        assert data[0]["message"] == {"message_id": 1}
+
+        restored = ActionScheduler()
+        assert restored.load(tmp_path / "actions.json") == 1
+        assert not (tmp_path / "actions.json").exists()
+        action = restored._heap[0][2]
+        assert action.receipt.context == Target("10000")
+        assert action.receipt.bot is bot
+        assert action.args == ({"message_id": 1},)
+        action.cancel()
+
+
+def test_scheduler_loop_change():
+    from nonebot_plugin_alconna.uniseg.scheduler import ActionScheduler
+
+    scheduler = ActionScheduler()
+
+    async def schedule():
+        return scheduler.schedule(60, "recall", None, 1)  # type: ignore
+
+    first_loop = asyncio.new_event_loop()
+    second_loop = asyncio.new_event_loop()
+    try:
+        first = first_loop.run_until_complete(schedule())
+        second = second_loop.run_until_complete(schedule())
+        assert first.future.cancelled()
+        assert not second.done
+        assert len(scheduler) == 1
+        second.cancel()
+    finally:
+        first_loop.close()
+        second_loop.close()
+
+
+@pytest.mark.asyncio()
+async def test_scheduled_recall_retry():
+    from nonebot_plugin_alconna import Target
+    from nonebot_plugin_alconna.uniseg.scheduler import ActionScheduler, _DetachedReceipt
+
+    scheduler = ActionScheduler()
+    receipt = _DetachedReceipt("OneBot V11", "missing", Target("10000"), {"message_id": 1})
+    action = scheduler.schedule(0, "recall", receipt, {"message_id": 1})  # type: ignore
+    while receipt.attempts == 0:
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert not action.done
+    assert len(scheduler) == 1
+    action.cancel()
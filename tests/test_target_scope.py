@@ -111,3 +111,83 @@ async def test_enable(app: App, mocker: MockerFixture):
     driver = get_driver()
     driver._bot_connection_hook.clear()
     driver._bot_disconnection_hook.clear()
+
+
+@pytest.mark.asyncio()
+async def test_fetcher_incremental():
+    from types import SimpleNamespace
+
+    from nonebot_plugin_alconna import Target, TargetFetcher, SupportAdapter
+
+    running = 0
+    peak = 0
+    guilds = {"1": ["11", "12"], "2": ["21"], "3": ["31"]}
+
+    class FakeFetcher(TargetFetcher):
+        concurrency = 2
+
+        @classmethod
+        def get_adapter(cls):
+            return SupportAdapter.satori
+
+        def fetch(self, bot, target=None):
+            return self._walk(self.fetch_tasks(bot, target))
+
+        def fetch_tasks(self, bot, target=None):
+            async def _channels(guild: str):
+                nonlocal running, peak
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+                for channel in guilds[guild]:
+                    yield Target(channel, guild, self_id=bot.self_id)
+
+            async def _guilds():
+                for guild in list(guilds):
+                    yield lambda guild=guild: _channels(guild)
+
+            return [_guilds]
+
+    fetcher = FakeFetcher()
+    bot = SimpleNamespace(self_id="1")
+    await fetcher.refresh(bot)  # type: ignore
+    assert {tg.id for tg in fetcher.cache["1"]} == {"11", "12", "21", "31"}
+    assert peak == 2
+    assert [tg.id async for tg in fetcher.fetch(bot)] == ["11", "12", "21", "31"]  # type: ignore
+
+    old = fetcher.cache["1"]
+    guilds["1"] = ["11"]
+    guilds["4"] = ["41"]
+    await fetcher.refresh(bot)  # type: ignore
+    assert fetcher.cache["1"] is old
+    assert {tg.id for tg in old} == {"11", "21", "31", "41"}
+
+    # 任务被外部取消时拉取以异常结束, 且不会据此移除缓存中的发送对象
+    guilds["1"] = []
+    channels = fetcher.fetch_tasks
+
+    def cancelled_tasks(bot, target=None):
+        async def _cancelled():
+            raise asyncio.CancelledError
+            yield
+
+        return [*channels(bot, target), _cancelled]
+
+    fetcher.fetch_tasks = cancelled_tasks  # type: ignore
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(fetcher.refresh(bot), 1)  # type: ignore
+    assert {tg.id for tg in old} == {"11", "21", "31", "41"}
+
+
+def test_fetch_lock_per_adapter():
+    from types import SimpleNamespace
+
+    from nonebot_plugin_alconna.uniseg import _fetch_lock
+
+    def make_bot(adapter: str, self_id: str):
+        return SimpleNamespace(adapter=SimpleNamespace(get_name=lambda: adapter), self_id=self_id)
+
+    lock = _fetch_lock(make_bot("OneBot V11", "1"))  # type: ignore
+    assert _fetch_lock(make_bot("OneBot V11", "1")) is lock  # type: ignore
+    assert _fetch_lock(make_bot("Satori", "1")) is not lock  # type: ignore
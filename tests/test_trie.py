@@ -0,0 +1,167 @@
+import pytest
+from nonebug import App
+from nonebot import get_adapter
+from arclet.alconna import Args, Option, Alconna, CommandMeta
+from nonebot.adapters.onebot.v11 import Bot, Adapter, Message, MessageSegment
+
+from tests.fake import fake_group_message_event_v11
+
+
+def test_literal_prefix():
+    from nonebot_plugin_alconna.trie import literal_prefix
+
+    assert literal_prefix("help") == "help"
+    assert literal_prefix(r"\/help\d+") == "/help"
+    assert literal_prefix("helps?") == "help"
+    assert literal_prefix("he.lp") == "he"
+    assert literal_prefix("a|b") == ""
+    assert literal_prefix("(?:/|!)help") == ""
+
+
+@pytest.mark.asyncio()
+async def test_trie_candidates(app: App):
+    from nonebot_plugin_alconna import UniMessage
+    from nonebot_plugin_alconna.rule import AlconnaRule
+    from nonebot_plugin_alconna.trie import first_text, command_trie
+
+    rule1 = AlconnaRule(Alconna(["/", "!"], "trie_help"))
+    rule2 = AlconnaRule(Alconna("re:trie_echo\\d+"))
+    rule3 = AlconnaRule(Alconna("trie_fuzzy", meta=CommandMeta(fuzzy_match=True)))
+    rule4 = AlconnaRule(Alconna("trie_alias"), _aliases={"trie_other"})
+
+    cands = command_trie.candidates(first_text(UniMessage("  /trie_help me")))
+    assert id(rule1) in cands
+    assert id(rule2) not in cands
+    assert id(rule3) in cands
+    assert id(rule4) not in cands
+
+    assert id(rule2) in command_trie.candidates("trie_echo12")
+    assert id(rule4) in command_trie.candidates("trie_other")
+    assert id(rule1) not in command_trie.candidates("trie_help")
+
+    rule4.command.shortcut("trie_short", {"command": "trie_alias"})
+    assert command_trie.match(rule4, UniMessage("trie_short"))
+    assert not command_trie.match(rule4, UniMessage.at("123") + "trie_alias")
+    assert command_trie.match(rule3, UniMessage.at("123"))
+
+
+@pytest.mark.asyncio()
+async def test_trie_dispatch(app: App):
+    from nonebot_plugin_alconna import on_alconna
+
+    test_cmd = on_alconna(Alconna("trie_add", Args["a", int]["b", int]))
+
+    @test_cmd.handle()
+    async def _(a: int, b: int):
+        await test_cmd.send(str(a + b))
+
+    async with app.test_matcher(test_cmd) as ctx:  # type: ignore
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        event = fake_group_message_event_v11(message=Message("trie_add 1 2"), user_id=123)
+        ctx.receive_event(bot, event)
+        ctx.should_call_send(event, "3")
+        event = fake_group_message_event_v11(message=Message("trie_sub 1 2"), user_id=123)
+        ctx.receive_event(bot, event)
+        ctx.should_not_pass_rule()
+        event = fake_group_message_event_v11(message=MessageSegment.at(1) + "trie_add 1 2", user_id=123)
+        ctx.receive_event(bot, event)
+        ctx.should_not_pass_rule()
+
+
+@pytest.mark.asyncio()
+async def test_trie_prefilter(app: App):
+    from nonebot_plugin_alconna.rule import AlconnaRule
+    from nonebot_plugin_alconna.trie import command_trie, raw_first_text
+    from nonebot_plugin_alconna.builtins.extensions.reply import ReplyRecordExtension
+
+    assert raw_first_text(Message("  trie_pre 1") + MessageSegment.at(1)) == "trie_pre 1"
+    assert raw_first_text(MessageSegment.at(1) + "trie_pre 1") is None
+
+    rule1 = AlconnaRule(Alconna("trie_pre", Args["a", int]))
+    rule2 = AlconnaRule(Alconna("re:trie_pre\\d"))
+    rule3 = AlconnaRule(Alconna("trie_pre_fuzzy", meta=CommandMeta(fuzzy_match=True)))
+    rule4 = AlconnaRule(Alconna("trie_pre_reply"), extensions=[ReplyRecordExtension()])
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        event = fake_group_message_event_v11(message=Message("hello trie_pre"))
+        assert rule1.executor.select(bot, event).transparent
+        assert not rule4.executor.select(bot, event).transparent
+        assert not command_trie.prefilter(rule1, event)
+        assert not command_trie.prefilter(rule2, event)
+        assert command_trie.prefilter(rule3, event)
+        assert not await rule1(event, {}, bot)
+        event = fake_group_message_event_v11(message=Message("trie_pre 1"))
+        assert command_trie.prefilter(rule1, event)
+        assert await rule1(event, {}, bot)
+        event = fake_group_message_event_v11(message=MessageSegment.at(1) + "trie_pre 1")
+        assert command_trie.prefilter(rule1, event)
+
+
+@pytest.mark.asyncio()
+async def test_parse_cache(app: App):
+    from io import BytesIO
+
+    from nonebot_plugin_alconna.rule import AlconnaRule
+    from nonebot_plugin_alconna.uniseg import Text, Image, UniMessage
+    from nonebot_plugin_alconna.argv import structural_token, context_dependent
+
+    assert structural_token(UniMessage("a 1")) == structural_token(UniMessage("a 1"))
+    assert structural_token(UniMessage("a 1")) != structural_token(UniMessage([Text("a 1").mark(0, 1, "bold")]))
+    assert context_dependent("bracket", "a {x}")
+    assert not context_dependent("bracket", "a 1")
+    assert not context_dependent(None, "a {x}")
+
+    rule = AlconnaRule(Alconna("parse_cache", Args["a", int]))
+    first = rule._parse(UniMessage("parse_cache 1"), {})
+    second = rule._parse(UniMessage("parse_cache 1"), {"x": 1})
+    assert first.matched
+    assert second.matched
+    assert second is not first
+    assert second.main_args == {"a": 1}
+    assert second.context == {"x": 1}
+    assert len(rule._parse_cache) == 1  # type: ignore
+    assert not rule._parse(UniMessage("parse_cache a"), {}).matched
+    assert len(rule._parse_cache) == 1  # type: ignore
+
+    assert structural_token(UniMessage([Text("a"), Image(raw=BytesIO(b"1"))])) is None
+    assert structural_token(UniMessage([Text("a"), Image(raw=b"1")])) is not None
+
+    rule = AlconnaRule(Alconna("parse_cache_opt", Option("-n", Args["n", int])))
+    first = rule._parse(UniMessage("parse_cache_opt -n 1"), {})
+    first.options["n"].args["n"] = 2
+    second = rule._parse(UniMessage("parse_cache_opt -n 1"), {})
+    assert second.options["n"] is not first.options["n"]
+    assert second.options["n"].args == {"n": 1}
+
+    rule = AlconnaRule(Alconna("parse_cache_ctx", Args["a", int], meta=CommandMeta(context_style="bracket")))
+    assert rule._parse(UniMessage("parse_cache_ctx {x}"), {"x": 2}).main_args == {"a": 2}
+    assert rule._parse(UniMessage("parse_cache_ctx {x}"), {"x": 3}).main_args == {"a": 3}
+    assert not len(rule._parse_cache)  # type: ignore
+
+
+@pytest.mark.asyncio()
+async def test_parse_cache_segment_origin(app: App):
+    from nonebot.message import handle_event
+
+    from nonebot_plugin_alconna import Image, on_alconna
+
+    matcher = on_alconna(Alconna("parse_cache_img", Args["img", Image]))
+    origins = []
+
+    @matcher.handle()
+    async def _(img: Image):
+        origins.append(img.origin)
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        for index, sub_type in enumerate((0, 1)):
+            image = MessageSegment("image", {"file": "a.png", "sub_type": sub_type})
+            message = MessageSegment.text("parse_cache_img ") + image
+            await handle_event(bot, fake_group_message_event_v11(message=message, message_id=index))
+
+    # 相同 id 的图片在两次事件中的 origin 不同, 处理器应拿到各自事件的消息段
+    assert [origin.data["sub_type"] for origin in origins] == [0, 1]
@@ -34,6 +34,14 @@ def test_unimsg():
     )
 
 
+def test_uniseg_adapter_registry():
+    from nonebot_plugin_alconna.uniseg.adapters import BUILDER_MAPPING, import_report
+
+    assert "OneBot V11" in BUILDER_MAPPING
+    assert BUILDER_MAPPING.get("Unknown Adapter") is None
+    assert "OneBot V11" in import_report()
+
+
 @pytest.mark.asyncio()
 async def test_unimsg_template(app: App):
     from nonebot_plugin_alconna.uniseg import FallbackSegment
@@ -97,6 +105,118 @@ async def test_uniseg_recv(app: App):
         assert msg[UniReply, 0].msg
 
 
+@pytest.mark.asyncio()
+async def test_uniseg_generate_cache(app: App):
+    from nonebot_plugin_alconna import Text, UniMessage
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        event = fake_group_message_event_v11(message=Message("hello") + MessageSegment.at(123), user_id=789)
+        msg1 = await UniMessage.generate(event=event, bot=bot)
+        msg1[Text, 0].text += " world"
+        msg1.append(Text("!"))
+        msg2 = await UniMessage.generate(event=event, bot=bot)
+        assert str(msg2) == "hello[at]"
+        assert msg1[1] is not msg2[1]
+        assert msg1[1] == msg2[1]
+        assert msg1 is not msg2
+
+        event.message[0].data["text"] = "hi"
+        msg3 = await UniMessage.generate(event=event, bot=bot)
+        assert str(msg3) == "hi[at]"
+
+
+@pytest.mark.asyncio()
+async def test_uniseg_export_concurrency(app: App):
+    import asyncio
+    from dataclasses import dataclass
+
+    from nonebot_plugin_alconna import Segment, UniMessage, custom_handler, apply_export_concurrency
+
+    @dataclass
+    class Slow(Segment):
+        name: str
+
+    running = []
+    peak = []
+
+    @custom_handler(Slow)
+    async def _(exporter, seg: Slow, bot, fallback):
+        running.append(seg)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(seg)
+        return MessageSegment.text(seg.name)
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        msg = UniMessage([Slow("a"), Slow("b"), Slow("c"), Slow("d")])
+        apply_export_concurrency(2)
+        try:
+            assert await msg.export(bot) == Message([MessageSegment.text(c) for c in "abcd"])
+            assert max(peak) == 2
+        finally:
+            apply_export_concurrency(1)
+        peak.clear()
+        assert await msg.export(bot) == Message([MessageSegment.text(c) for c in "abcd"])
+        assert max(peak) == 1
+
+
+def test_uniseg_text_styles():
+    from nonebot_plugin_alconna import Text
+
+    text = Text("hello world").mark(0, 5, "bold").mark(3, 8, "italic")
+    assert text.styles == {(0, 3): ["bold"], (3, 5): ["bold", "italic"], (5, 8): ["italic"]}
+    assert str(text) == "<bold>hel<italic>lo</italic></bold><italic> wo</italic>rld"
+
+    text = Text("hello world", {(6, 11): ["bold"], (0, 5): ["bold"], (5, 6): ["bold"]})
+    text.__merge__()
+    assert text.styles == {(0, 11): ["bold"]}
+    assert [seg.text for seg in Text("hello world").mark(0, 5, "bold").split()] == ["", "hello", " world"]
+
+
+@pytest.mark.asyncio()
+async def test_uniseg_media_stream(app: App, tmp_path):
+    from nonebot_plugin_alconna import Image, UniMessage, SerializeFailed
+
+    png = b"\x89PNG\r\n\x1a\n" + bytes(100)
+    path = tmp_path / "image"
+    path.write_bytes(png)
+    assert Image(path=path).read_header(8) == png[:8]
+    assert b"".join(Image(path=path).iter_chunks(16)) == png
+    assert await Image(path=path).aread() == png
+
+    seg = Image(raw=open(path, "rb"))
+    with seg.raw:  # type: ignore
+        assert seg.raw_bytes == png
+        assert seg.mimetype == "image/png"
+        assert seg.raw.tell() == 0  # type: ignore
+
+    seg = Image(raw=png)
+    assert seg.raw_bytes == png
+    assert seg.name == "raster-image.png"
+    seg.name = "cover.png"
+    assert seg.raw_bytes == png
+    assert seg.name == "cover.png"
+
+    async def chunks():
+        yield png[:50]
+        yield png[50:]
+
+    seg = Image(raw=chunks())
+    with pytest.raises(SerializeFailed, match="aread"):
+        seg.raw_bytes
+    assert await seg.aread() == png
+    assert seg.raw_bytes == png
+
+    async with app.test_api() as ctx:
+        bot = ctx.create_bot(base=Bot, adapter=get_adapter(Adapter))
+        msg = await UniMessage(Image(raw=chunks())).export(bot)
+        assert msg == Message(MessageSegment.image(png))
+
+
 @pytest.mark.asyncio()
 async def test_unimsg_send(app: App):
     from nonebot_plugin_alconna import MsgId, Target, UniMessage, on_alconna
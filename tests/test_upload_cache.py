@@ -0,0 +1,122 @@
+import pytest
+from nonebug import App
+from nonebot import get_adapter
+from nonebot.adapters.onebot.v12 import Bot, Adapter, Message, MessageSegment
+
+
+def test_memory_upload_cache():
+    from nonebot_plugin_alconna import MemoryUploadCache
+
+    cache = MemoryUploadCache(max_size=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+
+    cache = MemoryUploadCache(ttl=-1)
+    cache.set("a", "1")
+    assert cache.get("a") is None
+
+
+def test_sqlite_upload_cache(tmp_path):
+    from nonebot_plugin_alconna import SqliteUploadCache
+
+    cache = SqliteUploadCache(tmp_path / "cache.db", max_size=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert SqliteUploadCache(tmp_path / "cache.db").get("c") == "3"
+
+
+@pytest.mark.asyncio()
+async def test_sqlite_upload_cache_async(tmp_path):
+    from nonebot_plugin_alconna import SqliteUploadCache
+
+    cache = SqliteUploadCache(tmp_path / "cache.db")
+    await cache.aset("a", "1")
+    assert await cache.aget("a") == "1"
+    assert await cache.aget("b") is None
+
+
+@pytest.mark.asyncio()
+async def test_resource_key(app: App):
+    from io import BytesIO
+
+    from nonebot_plugin_alconna.uniseg.upload import resource_key
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter, platform="qq", impl="walle")
+        for data in (b"123", b"1" * (1024 * 1024)):
+            buffer = BytesIO(data)
+            key = await resource_key(data, bot)
+            assert await resource_key(buffer, bot) == key
+            buffer.write(b"more")
+            assert await resource_key(buffer, bot) != key
+            assert await resource_key(BytesIO(data), bot, "other") != key
+
+
+@pytest.mark.asyncio()
+async def test_upload_cache_export(app: App):
+    from nonebot_plugin_alconna import Image, UniMessage, MemoryUploadCache, apply_upload_cache
+
+    apply_upload_cache(MemoryUploadCache())
+    try:
+        async with app.test_api() as ctx:
+            adapter = get_adapter(Adapter)
+            bot = ctx.create_bot(base=Bot, adapter=adapter, platform="qq", impl="walle")
+            ctx.should_call_api("upload_file", {"type": "data", "data": b"123", "name": "image.png"}, {"file_id": "1"})
+            assert await UniMessage(Image(raw=b"123")).export(bot) == Message(MessageSegment.image("1"))
+            assert await UniMessage(Image(raw=b"123")).export(bot) == Message(MessageSegment.image("1"))
+    finally:
+        apply_upload_cache(None)
+
+
+@pytest.mark.asyncio()
+async def test_media_id_harvest():
+    from types import SimpleNamespace
+
+    from nonebot.adapters.telegram.model import Message as MessageModel
+
+    from nonebot_plugin_alconna.uniseg.adapters.telegram.exporter import TelegramMessageExporter
+    from nonebot_plugin_alconna import Text, Image, UniMessage, MemoryUploadCache, apply_upload_cache
+
+    bot = SimpleNamespace(adapter=SimpleNamespace(get_name=lambda: "Telegram"), self_id="1")
+    exporter = TelegramMessageExporter()
+    size = {"file_unique_id": "u", "width": 1, "height": 1}
+    receipt = MessageModel.model_validate(
+        {
+            "message_id": 1,
+            "date": 0,
+            "chat": {"id": 1, "type": "private"},
+            "photo": [{"file_id": "small", **size}, {"file_id": "big", **size}],
+        }
+    )
+    source = UniMessage([Text("caption"), Image(raw=b"123")])
+
+    await exporter.harvest(source, bot, [receipt])  # type: ignore
+    assert (await exporter.media(Image(raw=b"123"), bot)).data["file"] == b"123"  # type: ignore
+
+    apply_upload_cache(MemoryUploadCache())
+    try:
+        await exporter.harvest(source, bot, [receipt])  # type: ignore
+        assert (await exporter.media(Image(raw=b"123"), bot)).data["file"] == "big"  # type: ignore
+        assert (await exporter.media(Image(raw=b"456"), bot)).data["file"] == b"456"  # type: ignore
+        assert (await exporter.media(Image(id="other", raw=b"123"), bot)).data["file"] == "other"  # type: ignore
+    finally:
+        apply_upload_cache(None)
+
+    class BrokenCache(MemoryUploadCache):
+        def set(self, key: str, value: str) -> None:
+            raise OSError("disk full")
+
+    apply_upload_cache(BrokenCache())
+    try:
+        # 记录失败不应影响已经成功的发送
+        await exporter.harvest(source, bot, [receipt])  # type: ignore
+    finally:
+        apply_upload_cache(None)
@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+from nonebug import App
+from nonebot import get_adapter
+from arclet.alconna import Args, Alconna
+from nonebot.adapters.onebot.v11 import Bot, Adapter, Message
+
+from tests.fake import fake_group_message_event_v11
+
+
+@pytest.mark.asyncio()
+async def test_waiter_session(app: App):
+    from nonebot.message import handle_event
+
+    from nonebot_plugin_alconna.hub import waiter_hub
+    from nonebot_plugin_alconna import UniMsg, on_alconna
+
+    matcher = on_alconna(Alconna("test_waiter"))
+
+    @matcher.handle()
+    async def handle():
+        @matcher.waiter(session=True)
+        async def wait(msg: UniMsg):
+            return str(msg)
+
+        await matcher.send(f"got {await wait.wait(timeout=5)}")
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        task = asyncio.create_task(
+            handle_event(bot, fake_group_message_event_v11(message=Message("test_waiter"), user_id=123))
+        )
+        while not len(waiter_hub):
+            await asyncio.sleep(0)
+        assert not waiter_hub._global
+        await handle_event(bot, fake_group_message_event_v11(message=Message("other"), user_id=456))
+        ctx.should_call_api(
+            "send_msg", {"message_type": "group", "group_id": 10000, "message": Message("got answer")}, {}
+        )
+        await handle_event(bot, fake_group_message_event_v11(message=Message("answer"), user_id=123))
+        await asyncio.wait_for(task, 5)
+        assert not len(waiter_hub)
+
+
+@pytest.mark.asyncio()
+async def test_waiter_global(app: App):
+    from nonebot.message import handle_event
+
+    from nonebot_plugin_alconna.hub import waiter_hub
+    from nonebot_plugin_alconna import UniMsg, on_alconna
+
+    matcher = on_alconna(Alconna("test_waiter_global"))
+    results = []
+
+    @matcher.handle()
+    async def handle():
+        @matcher.waiter()
+        async def wait(msg: UniMsg):
+            return str(msg)
+
+        results.append(await wait.wait(timeout=5))
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        task = asyncio.create_task(
+            handle_event(bot, fake_group_message_event_v11(message=Message("test_waiter_global"), user_id=123))
+        )
+        while not len(waiter_hub):
+            await asyncio.sleep(0)
+        assert waiter_hub._global
+        await handle_event(bot, fake_group_message_event_v11(message=Message("other"), user_id=456))
+        await asyncio.wait_for(task, 5)
+        assert results == ["other"]
+        assert not len(waiter_hub)
+
+
+@pytest.mark.asyncio()
+async def test_waiter_type_mismatch(app: App):
+    from nonebot.message import handle_event
+    from nonebot.adapters.onebot.v11 import PrivateMessageEvent
+
+    from nonebot_plugin_alconna.hub import waiter_hub
+    from nonebot_plugin_alconna import UniMsg, on_alconna
+
+    matcher = on_alconna(Alconna("test_waiter_skip"))
+    results = []
+
+    @matcher.handle()
+    async def handle():
+        @matcher.waiter()
+        async def private(event: PrivateMessageEvent):
+            return "private"
+
+        @matcher.waiter()
+        async def any_msg(msg: UniMsg):
+            return str(msg)
+
+        results.extend(await asyncio.gather(private.wait(timeout=0.5), any_msg.wait(timeout=5)))
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        task = asyncio.create_task(
+            handle_event(bot, fake_group_message_event_v11(message=Message("test_waiter_skip"), user_id=123))
+        )
+        while len(waiter_hub) < 2:
+            await asyncio.sleep(0)
+        await handle_event(bot, fake_group_message_event_v11(message=Message("answer"), user_id=123))
+        await asyncio.wait_for(task, 5)
+        assert results == [None, "answer"]
+        assert not len(waiter_hub)
+
+
+@pytest.mark.asyncio()
+async def test_completion_session(app: App):
+    from nonebot.message import handle_event
+
+    from nonebot_plugin_alconna import on_alconna
+    from nonebot_plugin_alconna.hub import waiter_hub
+
+    matcher = on_alconna(Alconna("test_comp", Args["a", int]), comp_config={"lite": True})
+
+    @matcher.handle()
+    async def handle(a: int):
+        await matcher.send(f"a = {a}")
+
+    async with app.test_api() as ctx:
+        adapter = get_adapter(Adapter)
+        bot = ctx.create_bot(base=Bot, adapter=adapter)
+        event = fake_group_message_event_v11(message=Message("test_comp"), user_id=123)
+        ctx.should_call_send(event, "以下是建议的输入：\n>> <a: int>", None)
+        task = asyncio.create_task(handle_event(bot, event))
+        while not len(waiter_hub):
+            await asyncio.sleep(0)
+        assert not waiter_hub._check(bot, fake_group_message_event_v11(message=Message("1"), user_id=456))
+        ctx.should_call_send(event, "a = 1", None)
+        await handle_event(bot, fake_group_message_event_v11(message=Message("1"), user_id=123))
+        await asyncio.wait_for(task, 5)
+        assert not len(waiter_hub)
+
+
+@pytest.mark.asyncio()
+async def test_completion_store():
+    from arclet.alconna import CompSession
+
+    from nonebot_plugin_alconna.completion import CompletionStore, completion_metrics
+
+    alc = Alconna("test_comp_store", Args["a", int])
+    store = CompletionStore(max_sessions=2, ttl=0.05)
+    first = store.open(("1", "a"), CompSession(alc))
+    second = store.open(("1", "b"), CompSession(alc))
+    third = store.open(("1", "c"), CompSession(alc))
+    with pytest.raises(asyncio.TimeoutError):
+        await first.future
+    assert store.get(("1", "a")) is None
+    assert len(store) == 2
+
+    for session in (second, third):
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(session.future, 1)
+    assert len(store) == 0
+    assert store.metrics == {"live": 0, "created": 3, "expired": 2, "evicted": 1}
+    assert completion_metrics()["created"] >= 3
+    store.close(third)